@@ -71,6 +71,7 @@ if os.path.exists(models_path):
     model_subdirs = [
         ('models/det/ch/ch_PP-OCRv4_det_infer', 'models/det/ch/ch_PP-OCRv4_det_infer'),
         ('models/rec/ch/ch_PP-OCRv4_rec_infer', 'models/rec/ch/ch_PP-OCRv4_rec_infer'),
+        ('models/rec/en/en_PP-OCRv4_rec_infer', 'models/rec/en/en_PP-OCRv4_rec_infer'),
         ('models/cls/ch_ppocr_mobile_v2.0_cls_infer', 'models/cls/ch_ppocr_mobile_v2.0_cls_infer')
     ]
     
@@ -0,0 +1,540 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+无界面批量OCR工具
+接受PDF文件、目录或通配符，使用多进程并行识别，每个工作进程持有一个常驻的PaddleOCR引擎
+
+用法示例:
+  python batch_ocr.py scans/ -o output/ -j 4
+  python batch_ocr.py "archive/**/*.pdf" --recursive --zoom 2.5
+  python batch_ocr.py big_book.pdf -j 32 --shard-pages 20
+  python batch_ocr.py forms/ --pages 1 --regions form_template.json -f jsonl
+"""
+
+import os
+import sys
+import copy
+import glob
+import json
+import time
+import logging
+import argparse
+import collections
+import multiprocessing
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+
+import ocr_core
+import job_journal
+import job_metrics
+import page_regions
+import result_writers
+
+# 工作进程内的OCR引擎（由 _init_worker 创建，进程存活期间保持常驻）
+_WORKER_ENGINE = None
+_WORKER_OPTIONS = None
+# 分片模式下工作进程使用的参数（断点日志由父进程负责）
+_WORKER_SHARD_OPTIONS = None
+
+
+def collect_pdfs(inputs, recursive=False):
+    """展开输入的文件、目录和通配符，返回去重后的PDF路径列表"""
+    pdfs = []
+    seen = set()
+
+    def add(path):
+        key = os.path.normcase(os.path.abspath(path))
+        if key not in seen and path.lower().endswith('.pdf') and os.path.isfile(path):
+            seen.add(key)
+            pdfs.append(path)
+
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, '**', '*') if recursive else os.path.join(item, '*')
+            for path in sorted(glob.glob(pattern, recursive=recursive)):
+                add(path)
+        elif glob.has_magic(item):
+            for path in sorted(glob.glob(item, recursive=recursive)):
+                add(path)
+        elif os.path.isfile(item):
+            add(item)
+        else:
+            logging.warning(f"输入不存在，已跳过: {item}")
+    return pdfs
+
+
+def output_base_for(pdf_path, output_dir):
+    """计算识别结果的输出路径（不含扩展名）；未指定输出目录时写在PDF旁边"""
+    stem = os.path.splitext(os.path.basename(pdf_path))[0]
+    target_dir = output_dir or os.path.dirname(os.path.abspath(pdf_path))
+    return os.path.join(target_dir, stem)
+
+
+def _init_worker(base_path, options, engine_factory=None):
+    """工作进程初始化：构建一次OCR引擎并常驻；engine_factory(base_path, options) 可替换引擎的构建方式"""
+    global _WORKER_ENGINE, _WORKER_OPTIONS, _WORKER_SHARD_OPTIONS
+    logging.getLogger('ppocr').setLevel(logging.WARNING)
+    _WORKER_OPTIONS = options
+    _WORKER_SHARD_OPTIONS = copy.copy(options)
+    _WORKER_SHARD_OPTIONS.journal_dir = None
+    _WORKER_ENGINE = (engine_factory or ocr_core.build_ocr_engine)(base_path, options)
+    logging.info(f"工作进程 {os.getpid()} 的OCR引擎初始化成功。")
+
+
+# 工作进程被强制结束（内存不足被系统杀死、识别引擎崩溃）时，受影响任务的错误信息
+WORKER_DIED_ERROR = "工作进程意外退出（可能内存不足或识别引擎崩溃）"
+
+
+def create_worker_pool(workers, base_path, options, engine_factory=None):
+    """
+    创建识别进程池，每个工作进程初始化时构建一次引擎
+    工作进程意外退出时进程池不会挂起：未完成的任务抛出 BrokenProcessPool，进程池随之失效
+    """
+    return concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                  initargs=(base_path, options, engine_factory))
+
+
+def shutdown_pool(pool):
+    """结束进程池自己的工作进程（不影响宿主程序的其他子进程），未完成的任务随之失败，然后关闭进程池"""
+    # ProcessPoolExecutor 没有公开结束工作进程的接口（Python 3.14 之前），取其进程表的快照
+    for process in list((getattr(pool, '_processes', None) or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=True)
+
+
+def task_summary(future, pdf_path, out_base):
+    """取出单个PDF任务的处理摘要；工作进程意外退出时返回带错误信息的摘要"""
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        logging.error(f"识别失败: {pdf_path}: {WORKER_DIED_ERROR}")
+        return _summary(pdf_path, out_base, 0, 0, time.perf_counter(), WORKER_DIED_ERROR)
+
+
+def write_results(out_base, page_results, options, formats, pdf_path, metrics=None):
+    """
+    把按页码顺序产出的页面结果流式写入各格式的输出文件
+    返回 (总页数, 文本层页数)；给出 metrics 时记录每页的写出耗时
+    """
+    native_pages = 0
+    with result_writers.open_writers(out_base, formats, options, pdf_path) as writer:
+        for page_result in page_results:
+            if metrics is None:
+                writer.write(page_result)
+            else:
+                with metrics.timer('write', page_result['page']):
+                    writer.write(page_result)
+            if page_result['source'] == 'native':
+                native_pages += 1
+    return writer.pages, native_pages
+
+
+def _summary(pdf_path, out_base, pages, native_pages, start, error=None, metrics=None):
+    if metrics is not None:
+        metrics.finish()
+    return {'pdf': pdf_path, 'output': None if error else out_base, 'pages': pages,
+            'native_pages': native_pages, 'seconds': time.perf_counter() - start, 'error': error,
+            'metrics': metrics.to_dict() if metrics is not None else None}
+
+
+def _ocr_one_pdf(task):
+    """在工作进程中识别单个PDF并写出结果，返回处理摘要（包含分阶段耗时数据）"""
+    pdf_path, out_base, formats = task
+    start = time.perf_counter()
+    metrics = job_metrics.JobMetrics(pdf_path)
+    try:
+        page_results = ocr_core.iter_ocr_pages(_WORKER_ENGINE, pdf_path, _WORKER_OPTIONS, metrics=metrics)
+        pages, native_pages = write_results(out_base, page_results, _WORKER_OPTIONS, formats, pdf_path, metrics)
+        return _summary(pdf_path, out_base, pages, native_pages, start, metrics=metrics)
+    except Exception as e:
+        logging.error(f"识别失败: {pdf_path}: {e}", exc_info=True)
+        return _summary(pdf_path, out_base, 0, 0, start, str(e))
+
+
+def split_pages(page_numbers, shard_pages):
+    """把页码列表切分为每段最多 shard_pages 页的分片列表"""
+    return [page_numbers[i:i + shard_pages] for i in range(0, len(page_numbers), shard_pages)]
+
+
+def auto_shard_pages(total_pages, workers):
+    """自动选择分片大小：每个工作进程约分到4个分片以均衡负载，单片不超过50页"""
+    return max(1, min(50, -(-total_pages // (workers * 4))))
+
+
+def _detect_orientation(task):
+    """在工作进程中抽样检测整个文档的方向，返回 (旋转角度, 置信度)，引擎不支持时返回None"""
+    pdf_path, pages = task
+    return ocr_core.detect_document_orientation(_WORKER_ENGINE, pdf_path, pages, _WORKER_SHARD_OPTIONS)
+
+
+def _ocr_shard(task):
+    """
+    在工作进程中识别一个分片的页面，返回 (页码列表, 页面结果列表, 分阶段耗时数据)
+    orientation 为父进程检测出的文档方向，各分片按同一方向识别，不再各自检测
+    """
+    pdf_path, pages, orientation = task
+    metrics = job_metrics.JobMetrics(pdf_path)
+    options = _WORKER_SHARD_OPTIONS
+    if orientation is not None:
+        options = copy.copy(options)
+        options.orientation_decision = orientation
+    results = list(ocr_core.iter_ocr_pages(_WORKER_ENGINE, pdf_path, options, pages, metrics))
+    return pages, results, metrics.to_dict()
+
+
+def iter_sharded_pages(pool, pdf_path, options, shard_pages, workers, metrics=None):
+    """
+    把单个PDF按页码区间分片，分发给进程池中的各个工作进程（各自打开fitz文档、使用各自的引擎）
+    分片完成后立即合并，按页码顺序产出页面结果
+    断点日志由父进程统一读写：已完成的页面不再分发，新完成的页面随分片返回后追加记录
+    启用文档方向检测时先由一个工作进程对待识别的页面抽样检测一次，各分片使用同一结果
+    给出 metrics 时合并各分片的分阶段耗时
+    """
+    selected = ocr_core.selected_pages(pdf_path, options)
+    total_pages = len(selected)
+    journal = None
+    done = set()
+    if options.journal_dir:
+        journal = job_journal.open_journal(options.journal_dir, pdf_path, ocr_core.job_signature(options),
+                                           fsync=options.journal_fsync)
+        done = journal.completed_pages
+    futures = []
+    try:
+        missing = [p for p in selected if p not in done]
+        shard_pages = shard_pages or auto_shard_pages(len(missing), workers)
+        shards = split_pages(missing, shard_pages)
+        logging.info(f"{pdf_path}: 共选中 {total_pages} 页，待识别 {len(missing)} 页，"
+                     f"分为 {len(shards)} 个分片（每片最多 {shard_pages} 页）。")
+
+        orientation = None
+        if options.doc_orientation and missing:
+            detect_start = time.perf_counter()
+            orientation = pool.submit(_detect_orientation, (pdf_path, missing)).result()
+            if metrics is not None:
+                metrics.add('orientation', time.perf_counter() - detect_start)
+        futures = [pool.submit(_ocr_shard, (pdf_path, pages, orientation)) for pages in shards]
+        shard_results = concurrent.futures.as_completed(futures)
+        pending = {}
+        done_pages = total_pages - len(missing)
+        for next_page in selected:
+            if next_page in done:
+                page_result = journal.read_page(next_page)
+                page_result['resumed'] = True
+                if metrics is not None:
+                    metrics.set(next_page, source=page_result['source'],
+                                lines=len(page_result.get('lines', [])), cached=False, resumed=True)
+                yield page_result
+                continue
+            while next_page not in pending:
+                pages, results, shard_metrics = next(shard_results).result()
+                if metrics is not None:
+                    metrics.merge(shard_metrics)
+                done_pages += len(pages)
+                logging.info(f"分片 {pages[0]+1}-{pages[-1]+1} 页完成，进度 {done_pages}/{total_pages} 页。")
+                for page_result in results:
+                    pending[page_result['page']] = page_result
+                    if journal is not None:
+                        journal.append({k: v for k, v in page_result.items()
+                                        if k not in ocr_core.TRANSIENT_KEYS})
+            yield pending.pop(next_page)
+    finally:
+        for future in futures:
+            future.cancel()
+        if journal is not None:
+            journal.close()
+
+
+def _ocr_pdf_sharded(pool, pdf_path, out_base, formats, options, shard_pages, workers):
+    """在父进程中合并分片结果并写出，返回处理摘要"""
+    start = time.perf_counter()
+    metrics = job_metrics.JobMetrics(pdf_path)
+    try:
+        page_results = iter_sharded_pages(pool, pdf_path, options, shard_pages, workers, metrics)
+        pages, native_pages = write_results(out_base, page_results, options, formats, pdf_path, metrics)
+        return _summary(pdf_path, out_base, pages, native_pages, start, metrics=metrics)
+    except BrokenProcessPool:
+        logging.error(f"识别失败: {pdf_path}: {WORKER_DIED_ERROR}")
+        return _summary(pdf_path, out_base, 0, 0, start, WORKER_DIED_ERROR)
+    except Exception as e:
+        logging.error(f"识别失败: {pdf_path}: {e}", exc_info=True)
+        return _summary(pdf_path, out_base, 0, 0, start, str(e))
+
+
+def _log_summary(done, total, summary):
+    if summary['error']:
+        logging.error(f"[{done}/{total}] 失败: {summary['pdf']} ({summary['error']})")
+    else:
+        logging.info(f"[{done}/{total}] 完成: {summary['pdf']} "
+                     f"({summary['pages']} 页, 其中文本层 {summary['native_pages']} 页, "
+                     f"{summary['seconds']:.1f} 秒)")
+
+
+def run_batch(pdfs, output_dir, options, workers, base_path=None, overwrite=False, shard=None, shard_pages=0,
+              formats=('txt',), engine_factory=None):
+    """
+    用进程池识别一批PDF，返回每个文件的处理摘要列表
+    formats 为输出格式列表（见 result_writers.WRITERS）
+    engine_factory 为模块级函数 (base_path, options) -> 引擎，默认构建PaddleOCR引擎（基准测试用于替换为桩引擎）
+    shard 为真时逐个文档处理，每个文档按页码区间分片到所有工作进程；
+    为None时在PDF数量少于工作进程数时自动分片
+    """
+    tasks = []
+    for pdf_path in pdfs:
+        out_base = output_base_for(pdf_path, output_dir)
+        if not overwrite and all(os.path.exists(p) for p in result_writers.output_paths(out_base, formats)):
+            logging.info(f"结果已存在，跳过: {out_base}")
+            continue
+        tasks.append((pdf_path, out_base, formats))
+
+    if not tasks:
+        return []
+
+    if shard is None:
+        shard = len(tasks) < workers
+    if not shard:
+        workers = min(workers, len(tasks))
+    workers = max(1, workers)
+    logging.info(f"共 {len(tasks)} 个PDF，使用 {workers} 个工作进程"
+                 f"{'，单文档按页分片并行' if shard else ''}。")
+
+    summaries = []
+
+    def record(summary):
+        summaries.append(summary)
+        _log_summary(len(summaries), len(tasks), summary)
+        return summary['error'] == WORKER_DIED_ERROR
+
+    # 工作进程意外退出后进程池失效：只有当时正在处理的PDF失败，换用新的进程池继续处理其余PDF
+    pool = create_worker_pool(workers, base_path, options, engine_factory)
+    try:
+        if shard:
+            for pdf_path, out_base, formats in tasks:
+                if record(_ocr_pdf_sharded(pool, pdf_path, out_base, formats, options, shard_pages, workers)):
+                    shutdown_pool(pool)
+                    pool = create_worker_pool(workers, base_path, options, engine_factory)
+        else:
+            queued = collections.deque(tasks)
+            running = {}
+            while queued or running:
+                broken = False
+                while queued and len(running) < workers:
+                    try:
+                        future = pool.submit(_ocr_one_pdf, queued[0])
+                    except BrokenProcessPool:
+                        broken = True
+                        break
+                    running[future] = queued.popleft()
+                finished, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    broken |= record(task_summary(future, *running.pop(future)[:2]))
+                if broken:
+                    for future in concurrent.futures.wait(running)[0]:
+                        record(task_summary(future, *running.pop(future)[:2]))
+                    shutdown_pool(pool)
+                    pool = create_worker_pool(workers, base_path, options, engine_factory)
+    finally:
+        shutdown_pool(pool)
+    return summaries
+
+
+def add_ocr_arguments(parser):
+    """添加识别相关的命令行参数（批量识别与文件夹监视服务共用）"""
+    parser.add_argument('-f', '--format', default='txt',
+                        help=f"输出格式，多个用逗号分隔（可选: {', '.join(result_writers.WRITERS)}；默认 txt）")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1,
+                        help="工作进程数（默认等于CPU核数）")
+    parser.add_argument('--lang', default=ocr_core.OcrOptions.lang, choices=sorted(ocr_core.LANG_MODEL_SUBDIRS),
+                        help="识别语言: ch（中英文）或 en（英文，使用更小更快的英文识别模型，模型缺失时改用中英文模型并记录警告）")
+    parser.add_argument('--zoom', type=float, default=ocr_core.OcrOptions.zoom, help="图像缩放比例")
+    parser.add_argument('--adaptive-zoom', action='store_true',
+                        help="按页估计文字大小（文本层字号或扫描图像DPI），自动选择缩放比例")
+    parser.add_argument('--target-x-height', type=float, default=ocr_core.OcrOptions.target_x_height,
+                        help="自适应缩放的目标x高度（像素）")
+    parser.add_argument('--zoom-min', type=float, default=ocr_core.OcrOptions.zoom_min, help="自适应缩放下限")
+    parser.add_argument('--zoom-max', type=float, default=ocr_core.OcrOptions.zoom_max, help="自适应缩放上限")
+    parser.add_argument('--cpu-threads', type=int,
+                        help="每个引擎的推理线程数（默认按CPU核数/工作进程数分配）")
+    parser.add_argument('--prefetch-pages', type=int, default=ocr_core.OcrOptions.prefetch_pages,
+                        help="渲染流水线预取页数，0表示渲染与识别串行执行")
+    parser.add_argument('--prefetch-mb', type=float, default=ocr_core.OcrOptions.prefetch_mb,
+                        help="预取图像占用内存上限（MB）")
+    parser.add_argument('--png-handoff', action='store_true',
+                        help="把页面编码为PNG交给引擎（默认直接传递像素缓冲区）")
+    parser.add_argument('--hybrid', action='store_true',
+                        help="混合模式：页面自带可用文本层时直接提取，只对扫描页执行OCR")
+    parser.add_argument('--cache-dir', help="页面结果缓存目录（重复识别相同页面时直接复用结果）")
+    parser.add_argument('--cache-max-mb', type=float, default=ocr_core.OcrOptions.cache_max_mb,
+                        help="缓存总大小上限（MB），超出后淘汰最久未使用的条目")
+    parser.add_argument('--batch-pages', type=int, default=0,
+                        help="跨页批量识别：汇总多少页的文本行后统一识别（0表示逐页识别）")
+    parser.add_argument('--rec-batch-num', type=int,
+                        help="识别模型单次推理的批大小（启用跨页批量识别时默认32）")
+    parser.add_argument('--cls-batch-num', type=int,
+                        help="方向分类模型单次推理的批大小（启用跨页批量识别时默认32）")
+    parser.add_argument('--journal-dir',
+                        help="断点日志目录：每完成一页即记录，任务中断后重新运行同样的命令会从断点继续")
+    parser.add_argument('--no-journal-fsync', action='store_true',
+                        help="写断点记录后不调用fsync（更快，但断电时可能丢失最后几页）")
+    parser.add_argument('--doc-orientation', action='store_true',
+                        help="文档级方向检测：抽样判断文档方向，渲染时统一转正并关闭逐行方向分类（置信度不足时保持逐行分类）")
+    parser.add_argument('--orientation-pages', type=int, default=ocr_core.OcrOptions.orientation_pages,
+                        help="方向检测的抽样页数")
+    parser.add_argument('--orientation-min-confidence', type=float,
+                        default=ocr_core.OcrOptions.orientation_min_confidence,
+                        help="关闭逐行方向分类所需的最低置信度（0~1）")
+    parser.add_argument('--tile-max-mpx', type=float, default=ocr_core.OcrOptions.tile_max_mpx,
+                        help="渲染后超过该百万像素数的页面分块识别（0表示不分块）")
+    parser.add_argument('--tile-size', type=int, default=ocr_core.OcrOptions.tile_size,
+                        help="分块边长（像素）")
+    parser.add_argument('--tile-overlap', type=int, default=ocr_core.OcrOptions.tile_overlap,
+                        help="相邻分块的重叠宽度（像素），应大于最长文本行的高度")
+    parser.add_argument('--pages',
+                        help="只处理这些页（从1开始），如 \"1-3,10-40\"、\"50-\"；默认全部页面")
+    parser.add_argument('--regions',
+                        help="区域模板（JSON）：只渲染并识别页面上的指定区域，可按页码使用不同的区域")
+    parser.add_argument('--index',
+                        help="全文检索索引数据库（SQLite）：识别完成的页面逐页写入，用 search_index.py 检索")
+    parser.add_argument('--skip-blank', action='store_true', help="跳过空白页：墨迹比例过低的页面不做识别")
+    parser.add_argument('--blank-max-ink', type=float, default=ocr_core.OcrOptions.blank_max_ink,
+                        help="墨迹面积（平方pt，页边内的墨迹按一半计入）低于该值的页面视为空白页")
+    parser.add_argument('--dedup', action='store_true',
+                        help="重复页复用结果：与已识别页面（包括同一批次中的其他文档）几乎相同的页面不再识别")
+    parser.add_argument('--no-angle-cls', action='store_true', help="关闭文本方向分类")
+    parser.add_argument('--layout', action='store_true',
+                        help="版面还原：按阅读顺序排列多栏页面、合并被切开的行并分段（默认按检测顺序逐框输出文本）")
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="离线PDF-OCR批量识别工具")
+    parser.add_argument('inputs', nargs='+', help="PDF文件、目录或通配符")
+    parser.add_argument('-o', '--output', help="结果输出目录（默认写在PDF旁边）")
+    add_ocr_arguments(parser)
+    parser.add_argument('--metrics-json',
+                        help="把分阶段耗时统计（每个文档及整体的百分位）写入该JSON报告")
+    parser.add_argument('--metrics-prom',
+                        help="把整体统计写成Prometheus文本格式文件（供 node_exporter textfile 收集器抓取）")
+    parser.add_argument('--shard', dest='shard', action='store_true', default=None,
+                        help="单文档按页码区间分片到所有工作进程（默认在PDF数量少于工作进程数时自动启用）")
+    parser.add_argument('--no-shard', dest='shard', action='store_false', help="禁用单文档分片")
+    parser.add_argument('--shard-pages', type=int, default=0,
+                        help="每个分片的页数（默认自动选择）")
+    parser.add_argument('-r', '--recursive', action='store_true', help="递归搜索子目录")
+    parser.add_argument('--overwrite', action='store_true', help="覆盖已存在的结果文件")
+    return parser
+
+
+def parse_formats(args):
+    """解析 --format，返回输出格式列表；不支持的格式抛出ValueError"""
+    formats = [fmt.strip().lower() for fmt in args.format.split(',') if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in result_writers.WRITERS]
+    if unknown or not formats:
+        raise ValueError(f"不支持的输出格式: {', '.join(unknown) or args.format}")
+    return formats
+
+
+def options_from_args(args, workers):
+    """
+    由命令行参数构造识别参数（add_ocr_arguments 添加的参数）
+    页码范围或区域模板无效时抛出ValueError，区域模板无法读取时抛出OSError
+    """
+    page_regions.parse_page_ranges(args.pages, 0)
+    regions = page_regions.load_regions(args.regions) if args.regions else None
+    cpu_threads = args.cpu_threads or max(1, (os.cpu_count() or 1) // workers)
+    return ocr_core.OcrOptions(
+        zoom=args.zoom,
+        lang=args.lang,
+        adaptive_zoom=args.adaptive_zoom,
+        target_x_height=args.target_x_height,
+        zoom_min=args.zoom_min,
+        zoom_max=args.zoom_max,
+        use_angle_cls=not args.no_angle_cls,
+        layout=args.layout,
+        doc_orientation=args.doc_orientation,
+        orientation_pages=args.orientation_pages,
+        orientation_min_confidence=args.orientation_min_confidence,
+        tile_max_mpx=args.tile_max_mpx,
+        tile_size=args.tile_size,
+        tile_overlap=args.tile_overlap,
+        page_ranges=args.pages,
+        regions=regions,
+        cpu_threads=cpu_threads,
+        prefetch_pages=args.prefetch_pages,
+        prefetch_mb=args.prefetch_mb,
+        zero_copy=not args.png_handoff,
+        hybrid=args.hybrid,
+        cache_dir=args.cache_dir,
+        cache_max_mb=args.cache_max_mb,
+        batch_pages=args.batch_pages,
+        stage_timing=bool(getattr(args, 'metrics_json', None) or getattr(args, 'metrics_prom', None)),
+        journal_dir=args.journal_dir,
+        journal_fsync=not args.no_journal_fsync,
+        index_path=os.path.abspath(args.index) if args.index else None,
+        skip_blank=args.skip_blank,
+        blank_max_ink=args.blank_max_ink,
+        dedup_pages=args.dedup,
+        rec_batch_num=args.rec_batch_num or (32 if args.batch_pages > 1 else None),
+        cls_batch_num=args.cls_batch_num or (32 if args.batch_pages > 1 else None),
+    )
+
+
+def main(argv=None):
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - [%(processName)s] %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    args = build_arg_parser().parse_args(argv)
+
+    workers = max(1, args.workers)
+    try:
+        formats = parse_formats(args)
+        options = options_from_args(args, workers)
+    except (OSError, ValueError) as e:
+        logging.error(f"参数无效: {e}")
+        return 2
+
+    pdfs = collect_pdfs(args.inputs, recursive=args.recursive)
+    if not pdfs:
+        logging.error("未找到任何PDF文件。")
+        return 1
+
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+
+    start = time.perf_counter()
+    summaries = run_batch(pdfs, args.output, options, workers, overwrite=args.overwrite,
+                          shard=args.shard, shard_pages=args.shard_pages, formats=formats)
+    failed = [s for s in summaries if s['error']]
+    total_pages = sum(s['pages'] for s in summaries)
+    native_pages = sum(s['native_pages'] for s in summaries)
+    logging.info(f"全部完成: {len(summaries) - len(failed)} 个成功, {len(failed)} 个失败, "
+                 f"共 {total_pages} 页（文本层 {native_pages} 页, OCR {total_pages - native_pages} 页）, "
+                 f"用时 {time.perf_counter() - start:.1f} 秒。")
+    if args.metrics_json or args.metrics_prom:
+        write_metrics(summaries, options, workers, time.perf_counter() - start,
+                      args.metrics_json, args.metrics_prom)
+    return 1 if failed else 0
+
+
+def write_metrics(summaries, options, workers, wall_seconds, json_path=None, prom_path=None):
+    """汇总各文档的分阶段耗时，写出JSON报告和/或Prometheus文本文件"""
+    metrics_list = [job_metrics.JobMetrics.from_dict(s['metrics']) for s in summaries if s['metrics']]
+    total = job_metrics.combine(metrics_list, wall_seconds=wall_seconds)
+    job_metrics.log_summary(total)
+    try:
+        if json_path:
+            labels = {'workers': workers, 'batch_pages': options.batch_pages,
+                      'signature': json.loads(ocr_core.job_signature(options))}
+            job_metrics.write_json_report(json_path, job_metrics.build_report(metrics_list, total, labels))
+            logging.info(f"耗时统计报告已写入: {json_path}")
+        if prom_path:
+            job_metrics.write_prometheus(prom_path, total.summary())
+            logging.info(f"Prometheus指标已写入: {prom_path}")
+    except OSError as e:
+        logging.error(f"写出耗时统计失败: {e}")
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+"""
+跨页批量文本识别
+检测按页执行，多个页面的文本行切图汇总成大批次后统一做方向分类和识别，再按页拆分回去。
+CPU推理时批次越满吞吐越高，对于只有几行文字的稀疏页面效果尤其明显。
+
+直接使用PaddleOCR 2.x 引擎上的 text_detector / text_classifier / text_recognizer 三个预测器，
+返回与 engine.ocr() 相同结构的结果: [[ [box, (text, score)], ... ]]
+"""
+
+import time
+import inspect
+
+import numpy as np
+
+
+def supports_batching(engine):
+    """引擎是否暴露了分阶段的预测器（PaddleOCR 2.x 的 TextSystem 结构）"""
+    return all(hasattr(engine, name) for name in ('text_detector', 'text_recognizer'))
+
+
+def supports_stage_timing(engine):
+    """引擎是否为可直接调用的 TextSystem（PaddleOCR 2.x），其 __call__ 返回各阶段耗时"""
+    call = getattr(type(engine), '__call__', None)
+    if not supports_batching(engine) or call is None:
+        return False
+    try:
+        return 'cls' in inspect.signature(call).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def ocr_image_timed(engine, image, use_cls=True):
+    """
+    逐页识别单幅图像，返回 (与 engine.ocr() 结构相同的结果, {'det': 秒, 'cls': 秒, 'rec': 秒} 或None)
+    engine.ocr() 内部调用 TextSystem.__call__ 后丢弃了其返回的各阶段耗时，
+    引擎支持时直接调用 TextSystem.__call__ 以取得耗时；不支持（或版本较早、不返回耗时）时不给出分阶段耗时
+    直接调用跳过了 engine.ocr() 的输入检查，只用于需要分阶段耗时的场合（OcrOptions.stage_timing）
+    """
+    if not supports_stage_timing(engine):
+        return engine.ocr(image, cls=use_cls), None
+    output = engine(to_bgr(image), cls=use_cls)
+    dt_boxes, rec_res = output[0], output[1]
+    time_dict = output[2] if len(output) > 2 and isinstance(output[2], dict) else None
+    if dt_boxes is None or rec_res is None:
+        return [None], None
+    lines = [[np.asarray(box).tolist(), res] for box, res in zip(dt_boxes, rec_res)]
+    times = {stage: float(time_dict.get(stage, 0.0)) for stage in ('det', 'cls', 'rec')} if time_dict else None
+    return [lines] if lines else [None], times
+
+
+def to_bgr(image):
+    """
+    把任务项中的图像统一转换为三通道BGR数组（TextSystem 按BGR处理）
+    PNG字节按BGR解码；零拷贝数组由 ocr_core.pixmap_to_array 生成时已交换R/B通道，即为BGR，不再转换
+    """
+    import cv2
+    if isinstance(image, (bytes, bytearray)):
+        image = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR)
+    elif image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    return image
+
+
+def sorted_boxes(dt_boxes):
+    """按从上到下、从左到右排序文本框（与PaddleOCR的排序规则一致）"""
+    boxes = sorted(dt_boxes, key=lambda b: (b[0][1], b[0][0]))
+    for i in range(len(boxes) - 1):
+        for j in range(i, -1, -1):
+            if abs(boxes[j + 1][0][1] - boxes[j][0][1]) < 10 and boxes[j + 1][0][0] < boxes[j][0][0]:
+                boxes[j], boxes[j + 1] = boxes[j + 1], boxes[j]
+            else:
+                break
+    return boxes
+
+
+def crop_text_line(image, points):
+    """按四边形透视变换裁剪出一行文字，竖长的切图旋转为横向"""
+    import cv2
+    points = np.asarray(points, dtype=np.float32)
+    width = int(max(np.linalg.norm(points[0] - points[1]), np.linalg.norm(points[2] - points[3])))
+    height = int(max(np.linalg.norm(points[0] - points[3]), np.linalg.norm(points[1] - points[2])))
+    width, height = max(width, 1), max(height, 1)
+    target = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+    matrix = cv2.getPerspectiveTransform(points, target)
+    crop = cv2.warpPerspective(image, matrix, (width, height),
+                               borderMode=cv2.BORDER_REPLICATE, flags=cv2.INTER_CUBIC)
+    if height / width >= 1.5:
+        crop = np.rot90(crop)
+    return crop
+
+
+def detect_lines(engine, image):
+    """检测单页的文本框并裁剪，返回 (排序后的文本框列表, 切图列表)"""
+    dt_boxes, _elapse = engine.text_detector(image)
+    if dt_boxes is None or len(dt_boxes) == 0:
+        return [], []
+    boxes = sorted_boxes(dt_boxes)
+    return boxes, [crop_text_line(image, box) for box in boxes]
+
+
+def ocr_images_batched(engine, images, use_cls=True, stage_times=None):
+    """
+    对多页图像做批量识别：逐页检测，所有页面的切图合并后一次性分类和识别
+    返回列表，每个元素对应一页，结构与 engine.ocr() 的返回值相同
+    stage_times 为列表时，为每页追加 {'det': 秒, 'cls': 秒, 'rec': 秒}；
+    分类和识别按批次执行，耗时按各页文本行数分摊
+    """
+    page_boxes = []
+    all_crops = []
+    det_times = []
+    for image in images:
+        start = time.perf_counter()
+        boxes, crops = detect_lines(engine, to_bgr(image))
+        det_times.append(time.perf_counter() - start)
+        page_boxes.append(boxes)
+        all_crops.extend(crops)
+
+    rec_res = []
+    cls_time = rec_time = 0.0
+    if all_crops:
+        if use_cls and getattr(engine, 'text_classifier', None) is not None:
+            start = time.perf_counter()
+            all_crops, _cls_res, _elapse = engine.text_classifier(all_crops)
+            cls_time = time.perf_counter() - start
+        start = time.perf_counter()
+        rec_res, _elapse = engine.text_recognizer(all_crops)
+        rec_time = time.perf_counter() - start
+
+    if stage_times is not None:
+        for det_time, boxes in zip(det_times, page_boxes):
+            share = len(boxes) / len(all_crops) if all_crops else 0.0
+            stage_times.append({'det': det_time, 'cls': cls_time * share, 'rec': rec_time * share})
+
+    drop_score = getattr(engine, 'drop_score', 0.5)
+    results = []
+    offset = 0
+    for boxes in page_boxes:
+        lines = []
+        for box, (text, score) in zip(boxes, rec_res[offset:offset + len(boxes)]):
+            if score >= drop_score:
+                lines.append([np.asarray(box).tolist(), (text, float(score))])
+        offset += len(boxes)
+        results.append([lines] if lines else [None])
+    return results
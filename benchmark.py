@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+吞吐量基准测试
+用fitz按固定随机种子生成测试PDF（密集文本、稀疏文本、旋转页面、文本层与扫描页混排、超大幅面），
+在不同缩放比例和工作进程数下测量识别流水线的吞吐量（页/秒）和峰值内存，结果保存为JSON；
+compare 命令把新结果与基线对比，吞吐量下降或内存上涨超过阈值时以非零状态退出。
+
+引擎:
+  auto   - 模型齐全时使用真实的PaddleOCR引擎，否则使用桩引擎（默认）
+  paddle - 真实引擎
+  stub   - 桩引擎：只读取图像数据并返回固定结果，用于单独测量渲染/IO/调度的开销
+  模块:函数 - 自定义引擎工厂，签名为 factory(base_path, options)，须可在工作进程中导入
+
+用法示例:
+  python benchmark.py run -o bench.json
+  python benchmark.py run --engine stub --docs dense,large --zooms 1.0,2.0 --workers 1,4 -o stub.json
+  python benchmark.py compare baseline.json bench.json --threshold 0.1
+  python benchmark.py generate bench_data/
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import importlib
+import subprocess
+
+import fitz
+
+import ocr_core
+import batch_ocr
+import job_metrics
+
+BENCH_VERSION = 1
+
+# 生成测试文本用的词表（中英文混合）
+LATIN_WORDS = ("the quick brown fox jumps over lazy dog offline optical character recognition "
+               "document page scan archive invoice report table figure section chapter").split()
+CJK_WORDS = "离线 文字 识别 文档 页面 扫描 归档 发票 报告 表格 图表 章节 第一 数据 结果 处理".split()
+
+
+def _random_line(rng, chars):
+    words = []
+    length = 0
+    while length < chars:
+        word = rng.choice(CJK_WORDS) if rng.random() < 0.3 else rng.choice(LATIN_WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+
+def _write_text(page, rng, lines, fontsize, margin=36):
+    """在页面上按行写入随机文本（使用内置CJK字体，中英文均可显示）"""
+    line_height = fontsize * 1.4
+    chars = int((page.rect.width - 2 * margin) / (fontsize * 0.55))
+    y = margin + fontsize
+    for _ in range(lines):
+        if y > page.rect.height - margin:
+            break
+        page.insert_text((margin, y), _random_line(rng, chars), fontsize=fontsize, fontname="china-s")
+        y += line_height
+
+
+def _add_scanned_page(doc, rng, rect, lines, fontsize, dpi=150):
+    """生成没有文本层的“扫描页”：先写文本再渲染为灰度图像，插入到新页面中"""
+    tmp = fitz.open()
+    _write_text(tmp.new_page(width=rect.width, height=rect.height), rng, lines, fontsize)
+    pix = tmp[0].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+    page = doc.new_page(width=rect.width, height=rect.height)
+    page.insert_image(page.rect, pixmap=pix)
+    tmp.close()
+
+
+def _gen_dense(doc, rng, pages):
+    for _ in range(pages):
+        _write_text(doc.new_page(), rng, 60, 9)
+
+
+def _gen_sparse(doc, rng, pages):
+    for _ in range(pages):
+        page = doc.new_page()
+        for _ in range(3):
+            y = rng.uniform(72, page.rect.height - 72)
+            page.insert_text((72, y), _random_line(rng, 40), fontsize=12, fontname="china-s")
+
+
+def _gen_rotated(doc, rng, pages):
+    for i in range(pages):
+        page = doc.new_page()
+        _write_text(page, rng, 40, 10)
+        page.set_rotation((90, 180, 270, 0)[i % 4])
+
+
+def _gen_mixed(doc, rng, pages):
+    for i in range(pages):
+        if i % 2:
+            _add_scanned_page(doc, rng, fitz.paper_rect('a4'), 40, 10)
+        else:
+            _write_text(doc.new_page(), rng, 40, 10)
+
+
+def _gen_large(doc, rng, pages):
+    rect = fitz.paper_rect('a0')
+    for _ in range(pages):
+        _write_text(doc.new_page(width=rect.width, height=rect.height), rng, 120, 24)
+
+
+# 测试文档: 名称 -> (生成函数, 默认页数, 额外的识别参数)
+# 混排文档开启混合模式，测量文本层页面直接提取、扫描页OCR的实际效果
+DOCS = {
+    'dense': (_gen_dense, 20, {}),
+    'sparse': (_gen_sparse, 20, {}),
+    'rotated': (_gen_rotated, 8, {}),
+    'mixed': (_gen_mixed, 20, {'hybrid': True}),
+    'large': (_gen_large, 3, {}),
+}
+
+
+def generate_pdf(name, path, pages=None, seed=0):
+    """生成一个测试PDF；同样的名称、页数和种子总是得到同样的内容"""
+    generator, default_pages, _options = DOCS[name]
+    rng = random.Random(f"{name}:{seed}")
+    doc = fitz.open()
+    generator(doc, rng, pages or default_pages)
+    doc.set_metadata({})
+    doc.save(path, garbage=3, deflate=True, no_new_id=True)
+    doc.close()
+    return path
+
+
+def generate_all(out_dir, names=None, page_scale=1.0, seed=0):
+    """生成全部（或指定的）测试PDF，返回 名称 -> 路径"""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {}
+    for name in names or DOCS:
+        pages = max(1, round(DOCS[name][1] * page_scale))
+        paths[name] = generate_pdf(name, os.path.join(out_dir, f"{name}.pdf"), pages, seed)
+    return paths
+
+
+class StubEngine:
+    """
+    桩引擎：与 engine.ocr() 接口一致，读取整幅图像（保证像素数据确实被访问）后返回一行固定结果
+    用于在没有模型的机器上测量渲染、数据传递、结果写出和进程调度的开销
+    """
+
+    def ocr(self, img, cls=True):
+        if isinstance(img, (bytes, bytearray)):
+            height, width = 100, len(img) // 100
+        else:
+            img.sum(dtype='uint64')
+            height, width = img.shape[:2]
+        box = [[0, 0], [width - 1, 0], [width - 1, min(height - 1, 32)], [0, min(height - 1, 32)]]
+        return [[[box, ("stub", 1.0)]]]
+
+
+def build_stub_engine(base_path=None, options=None):
+    return StubEngine()
+
+
+def models_available(base_path=None):
+    try:
+        ocr_core.check_model_dirs(ocr_core.get_model_dirs(base_path))
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def resolve_engine_factory(spec, base_path=None):
+    """把 --engine 参数解析为 (引擎名称, 工厂函数)"""
+    if spec == 'auto':
+        spec = 'paddle' if models_available(base_path) else 'stub'
+    if spec == 'stub':
+        return spec, build_stub_engine
+    if spec == 'paddle':
+        return spec, ocr_core.build_ocr_engine
+    module_name, _, attr = spec.partition(':')
+    if not attr:
+        raise ValueError(f"无法识别的引擎: {spec}（应为 auto/paddle/stub 或 模块:函数）")
+    return spec, getattr(importlib.import_module(module_name), attr)
+
+
+def peak_rss_mb():
+    """返回 (本进程峰值内存, 已结束子进程中最大的峰值内存)，单位MB；无法获取时为None"""
+    try:
+        import resource
+    except ImportError:
+        return _windows_peak_rss_mb(), None
+    # Linux下 ru_maxrss 单位为KB，macOS下为字节
+    unit = 1 if sys.platform == 'darwin' else 1024
+    self_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / 1024 / 1024
+    child_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit / 1024 / 1024
+    return self_rss, child_rss or None
+
+
+def _windows_peak_rss_mb():
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+        return counters.PeakWorkingSetSize / 1024 / 1024
+    except (AttributeError, OSError):
+        return None
+
+
+def case_id(doc, zoom, workers):
+    return f"{doc}-z{zoom:g}-w{workers}"
+
+
+def run_case(spec):
+    """
+    在当前进程中执行一个测试用例，返回结果字典
+    单进程时与图形界面相同：iter_ocr_pages 流水线 + 逐页写出；多进程时使用 batch_ocr 的分片模式
+    """
+    _engine_name, factory = resolve_engine_factory(spec['engine'], spec.get('base_path'))
+    options = ocr_core.OcrOptions(zoom=spec['zoom'], stage_timing=True, **DOCS[spec['doc']][2])
+    pdf_path = spec['pdf']
+    out_dir = tempfile.mkdtemp(prefix='ocr-bench-')
+    try:
+        if spec['workers'] <= 1:
+            engine = factory(spec.get('base_path'), options)
+            start = time.perf_counter()
+            metrics = job_metrics.JobMetrics(pdf_path)
+            pages = ocr_core.iter_ocr_pages(engine, pdf_path, options, metrics=metrics)
+            page_count, _native = batch_ocr.write_results(os.path.join(out_dir, 'out'), pages, options,
+                                                          ['txt'], pdf_path, metrics)
+            seconds = time.perf_counter() - start
+            metrics.finish()
+        else:
+            # 进程池启动和引擎加载计入用时：这正是多进程方案的固定开销
+            start = time.perf_counter()
+            summaries = batch_ocr.run_batch([pdf_path], out_dir, options, spec['workers'], spec.get('base_path'),
+                                            overwrite=True, shard=True, engine_factory=factory)
+            seconds = time.perf_counter() - start
+            if summaries[0]['error']:
+                raise RuntimeError(summaries[0]['error'])
+            page_count = summaries[0]['pages']
+            metrics = job_metrics.JobMetrics.from_dict(summaries[0]['metrics'])
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    self_rss, child_rss = peak_rss_mb()
+    summary = metrics.summary()
+    return {
+        'id': case_id(spec['doc'], spec['zoom'], spec['workers']),
+        'doc': spec['doc'],
+        'zoom': spec['zoom'],
+        'workers': spec['workers'],
+        'pages': page_count,
+        'seconds': seconds,
+        'pages_per_second': page_count / seconds if seconds > 0 else 0.0,
+        'peak_rss_mb': self_rss,
+        'peak_worker_rss_mb': child_rss,
+        'stages': {stage: {k: s[k] for k in ('mean', 'p50', 'p90', 'p99')} for stage, s in summary['stages'].items()},
+        'pixels_p50': summary['pixels']['p50'],
+    }
+
+
+def run_case_subprocess(spec):
+    """在独立的子进程中执行用例，保证峰值内存互不影响"""
+    cmd = [sys.executable, os.path.abspath(__file__), '_case', json.dumps(spec)]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"用例 {case_id(spec['doc'], spec['zoom'], spec['workers'])} 执行失败:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run_suite(docs, zooms, workers_list, engine='auto', repeat=1, page_scale=1.0, seed=0,
+              data_dir=None, base_path=None):
+    """执行整个测试矩阵，返回结果报告；每个用例重复 repeat 次取吞吐量最好的一次"""
+    engine_name, _factory = resolve_engine_factory(engine, base_path)
+    own_dir = data_dir is None
+    data_dir = data_dir or tempfile.mkdtemp(prefix='ocr-bench-data-')
+    try:
+        paths = generate_all(data_dir, docs, page_scale, seed)
+        cases = []
+        for doc in docs:
+            for zoom in zooms:
+                for workers in workers_list:
+                    spec = {'doc': doc, 'pdf': paths[doc], 'zoom': zoom, 'workers': workers,
+                            'engine': engine_name, 'base_path': base_path}
+                    runs = [run_case_subprocess(spec) for _ in range(max(1, repeat))]
+                    best = max(runs, key=lambda r: r['pages_per_second'])
+                    best['runs'] = [round(r['pages_per_second'], 3) for r in runs]
+                    logging.info(f"{best['id']}: {best['pages']} 页, {best['pages_per_second']:.2f} 页/秒, "
+                                 f"峰值内存 {_format_mb(best['peak_rss_mb'])}"
+                                 f"{'（工作进程 ' + _format_mb(best['peak_worker_rss_mb']) + '）' if workers > 1 else ''}")
+                    cases.append(best)
+    finally:
+        if own_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    return {
+        'version': BENCH_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'engine': engine_name,
+        'seed': seed,
+        'page_scale': page_scale,
+        'environment': {
+            'host': platform.node(),
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'pymupdf': fitz.VersionBind,
+            'cpu_count': os.cpu_count(),
+        },
+        'cases': cases,
+    }
+
+
+def _format_mb(value):
+    return "-" if value is None else f"{value:.0f} MB"
+
+
+def compare_reports(baseline, current, threshold=0.1, rss_threshold=0.2):
+    """
+    按用例ID对比两份报告，返回 (对比行列表, 是否存在回退)
+    吞吐量下降超过 threshold 或峰值内存上涨超过 rss_threshold（比例）即视为回退
+    """
+    base_cases = {case['id']: case for case in baseline['cases']}
+    rows = []
+    regressed = False
+    for case in current['cases']:
+        base = base_cases.get(case['id'])
+        if base is None:
+            rows.append((case['id'], None, case['pages_per_second'], None, None, None, "新用例"))
+            continue
+        speed = case['pages_per_second'] / base['pages_per_second'] - 1 if base['pages_per_second'] else 0.0
+        rss = None
+        if base.get('peak_rss_mb') and case.get('peak_rss_mb'):
+            rss = case['peak_rss_mb'] / base['peak_rss_mb'] - 1
+        problems = []
+        if speed < -threshold:
+            problems.append("吞吐量下降")
+        if rss is not None and rss > rss_threshold:
+            problems.append("内存上涨")
+        regressed = regressed or bool(problems)
+        rows.append((case['id'], base['pages_per_second'], case['pages_per_second'], speed,
+                     base.get('peak_rss_mb'), rss, "、".join(problems) or "正常"))
+    return rows, regressed
+
+
+def print_comparison(rows):
+    print(f"{'用例':<22}{'基线 页/秒':>12}{'当前 页/秒':>12}{'变化':>9}{'基线内存':>10}{'内存变化':>9}  结论")
+    for case, base_pps, pps, speed, base_rss, rss, verdict in rows:
+        print(f"{case:<22}"
+              f"{'-' if base_pps is None else f'{base_pps:.2f}':>12}"
+              f"{pps:>12.2f}"
+              f"{'-' if speed is None else f'{speed:+.1%}':>9}"
+              f"{_format_mb(base_rss):>10}"
+              f"{'-' if rss is None else f'{rss:+.1%}':>9}  {verdict}")
+
+
+def _float_list(text):
+    return [float(v) for v in text.split(',') if v.strip()]
+
+
+def _int_list(text):
+    return [int(v) for v in text.split(',') if v.strip()]
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="离线PDF-OCR吞吐量基准测试")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help="执行基准测试")
+    run.add_argument('-o', '--output', help="结果JSON路径（默认只打印）")
+    run.add_argument('--engine', default='auto', help="auto / paddle / stub / 模块:函数（默认 auto）")
+    run.add_argument('--docs', default=','.join(DOCS), help=f"测试文档，逗号分隔（可选: {', '.join(DOCS)}）")
+    run.add_argument('--zooms', type=_float_list, default=[1.0, 2.0], help="缩放比例列表，逗号分隔")
+    run.add_argument('--workers', type=_int_list, default=[1, 2], help="工作进程数列表，逗号分隔")
+    run.add_argument('--repeat', type=int, default=1, help="每个用例重复次数，取最好的一次")
+    run.add_argument('--page-scale', type=float, default=1.0, help="按比例增减各测试文档的页数")
+    run.add_argument('--seed', type=int, default=0, help="生成测试文档的随机种子")
+    run.add_argument('--data-dir', help="测试文档的存放目录（默认使用临时目录，结束后删除）")
+    run.add_argument('--baseline', help="完成后与该基线对比，出现回退时以状态1退出")
+    run.add_argument('--threshold', type=float, default=0.1, help="吞吐量下降超过该比例视为回退")
+    run.add_argument('--rss-threshold', type=float, default=0.2, help="峰值内存上涨超过该比例视为回退")
+
+    compare = sub.add_parser('compare', help="与基线对比")
+    compare.add_argument('baseline', help="基线结果JSON")
+    compare.add_argument('current', help="当前结果JSON")
+    compare.add_argument('--threshold', type=float, default=0.1, help="吞吐量下降超过该比例视为回退")
+    compare.add_argument('--rss-threshold', type=float, default=0.2, help="峰值内存上涨超过该比例视为回退")
+
+    generate = sub.add_parser('generate', help="只生成测试PDF")
+    generate.add_argument('output_dir', help="输出目录")
+    generate.add_argument('--docs', default=','.join(DOCS), help="测试文档，逗号分隔")
+    generate.add_argument('--page-scale', type=float, default=1.0, help="按比例增减各测试文档的页数")
+    generate.add_argument('--seed', type=int, default=0, help="随机种子")
+
+    case = sub.add_parser('_case', help=argparse.SUPPRESS)
+    case.add_argument('spec')
+    return parser
+
+
+def _load_report(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _compare_and_print(baseline, current, threshold, rss_threshold):
+    if baseline.get('engine') != current.get('engine'):
+        logging.warning(f"两份结果使用的引擎不同: {baseline.get('engine')} / {current.get('engine')}")
+    if baseline.get('environment', {}).get('host') != current.get('environment', {}).get('host'):
+        logging.warning("两份结果来自不同的机器，对比结果仅供参考")
+    rows, regressed = compare_reports(baseline, current, threshold, rss_threshold)
+    print_comparison(rows)
+    return 1 if regressed else 0
+
+
+def _check_docs(names):
+    unknown = [name for name in names if name not in DOCS]
+    if unknown:
+        logging.error(f"未知的测试文档: {', '.join(unknown)}")
+        return False
+    return True
+
+
+def main(argv=None):
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stderr)]
+    )
+    args = build_arg_parser().parse_args(argv)
+
+    if args.command == '_case':
+        logging.getLogger().setLevel(logging.WARNING)
+        print(json.dumps(run_case(json.loads(args.spec))))
+        return 0
+
+    if args.command == 'compare':
+        return _compare_and_print(_load_report(args.baseline), _load_report(args.current),
+                                  args.threshold, args.rss_threshold)
+
+    docs = [name.strip() for name in args.docs.split(',') if name.strip()]
+    if not _check_docs(docs):
+        return 2
+
+    if args.command == 'generate':
+        for name, path in generate_all(args.output_dir, docs, args.page_scale, args.seed).items():
+            logging.info(f"已生成 {name}: {path}")
+        return 0
+
+    report = run_suite(docs, args.zooms, args.workers, args.engine, args.repeat, args.page_scale,
+                       args.seed, args.data_dir)
+    if args.output:
+        job_metrics.write_json_report(args.output, report)
+        logging.info(f"基准测试结果已写入: {args.output}")
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.baseline:
+        return _compare_and_print(_load_report(args.baseline), report, args.threshold, args.rss_threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,6 +19,13 @@ def check_models():
         else:
             print(f"✓ 找到模型目录: {model_dir}")
     
+    # 英文识别模型是可选的，缺失时打包的程序中“英文”选项不可用
+    optional_model = 'models/rec/en/en_PP-OCRv4_rec_infer'
+    if os.path.exists(optional_model):
+        print(f"✓ 找到模型目录: {optional_model}")
+    else:
+        print(f"! 缺少可选的英文识别模型: {optional_model}（运行 python setup_models.py 下载）")
+    
     if missing_models:
         print("✗ 以下模型文件缺失:")
         for model in missing_models:
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+"""
+文档级方向检测
+抽样几页做低分辨率渲染，用检测模型找出文本行，再用方向分类模型判断各行是否倒置，
+按置信度加权投票得出整个文档需要的旋转角度。
+置信度足够时，渲染时通过fitz矩阵一次性把页面转正，并关闭逐行方向分类（省去一整个模型阶段）；
+置信度不足时保持逐行分类，不做旋转。
+"""
+
+import logging
+
+import fitz
+import numpy as np
+
+import batch_recognition
+
+# (文本行走向, 方向分类结果) -> 渲染时需要的旋转角度（fitz Matrix.prerotate 的角度，正值为顺时针）
+# 竖向文本行的切图会先逆时针转90度再分类：结果为'0'说明内容被顺时针转了90度，需要转回270度
+ROTATIONS = {
+    ('h', '0'): 0,
+    ('h', '180'): 180,
+    ('v', '0'): 270,
+    ('v', '180'): 90,
+}
+
+# 长宽比至少达到该值的文本行才参与投票（接近正方形的短行无法判断走向）
+MIN_ASPECT = 1.5
+
+
+def sample_page_numbers(page_numbers, count):
+    """从页码列表中均匀抽取最多 count 页"""
+    page_numbers = list(page_numbers)
+    if len(page_numbers) <= count:
+        return page_numbers
+    step = len(page_numbers) / count
+    return [page_numbers[int(i * step + step / 2)] for i in range(count)]
+
+
+def _line_direction(box):
+    xs = [p[0] for p in box]
+    ys = [p[1] for p in box]
+    width = max(xs) - min(xs)
+    height = max(ys) - min(ys)
+    if width >= height * MIN_ASPECT:
+        return 'h'
+    if height >= width * MIN_ASPECT:
+        return 'v'
+    return None
+
+
+def line_votes(engine, image):
+    """对一页图像做检测和方向分类，返回 [(旋转角度, 权重), ...]"""
+    boxes, crops = batch_recognition.detect_lines(engine, batch_recognition.to_bgr(image))
+    directions = [_line_direction(box) for box in boxes]
+    crops = [crop for crop, d in zip(crops, directions) if d]
+    directions = [d for d in directions if d]
+    if not crops:
+        return []
+    classifier = getattr(engine, 'text_classifier', None)
+    if classifier is None:
+        # 没有方向分类模型时只能区分横竖，无法判断是否倒置，以低权重投票
+        return [(ROTATIONS[(d, '0')], 0.5) for d in directions]
+    _crops, cls_res, _elapse = classifier(crops)
+    return [(ROTATIONS[(d, label)], float(score)) for d, (label, score) in zip(directions, cls_res)]
+
+
+def detect_orientation(engine, pdf_path, pages, sample_pages=3, zoom=1.0, min_lines=8):
+    """
+    抽样检测文档方向，返回 (旋转角度, 置信度, 参与投票的文本行数)
+    置信度为获胜角度的权重占总权重的比例；参与投票的文本行太少时置信度为0
+    """
+    weights = {}
+    lines = 0
+    with fitz.open(pdf_path) as doc:
+        for pno in sample_page_numbers(pages, sample_pages):
+            pix = doc[pno].get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            rgb = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w, pix.n)
+            for angle, weight in line_votes(engine, np.ascontiguousarray(rgb[:, :, ::-1])):
+                weights[angle] = weights.get(angle, 0.0) + weight
+                lines += 1
+    if not weights or lines < min_lines:
+        return 0, 0.0, lines
+    angle = max(weights, key=weights.get)
+    return angle, weights[angle] / sum(weights.values()), lines
+
+
+def log_decision(pdf_path, angle, confidence, lines, min_confidence):
+    if confidence >= min_confidence:
+        logging.info(f"文档方向: {pdf_path} 旋转 {angle} 度（置信度 {confidence:.0%}，{lines} 行），"
+                     f"关闭逐行方向分类")
+    else:
+        logging.info(f"文档方向置信度不足: {pdf_path}（{confidence:.0%}，{lines} 行），保持逐行方向分类")
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+"""
+OCR引擎池
+按 (语言, 模型组, 构建参数) 缓存引擎：首次使用时才加载，之后常驻内存；
+常驻引擎的估算内存超过预算时，按最近使用顺序淘汰当前没有被使用的引擎。
+"""
+
+import os
+import gc
+import logging
+import threading
+import contextlib
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import ocr_core
+
+# 引擎内存估算：推理框架的固定开销 + 模型参数文件大小的若干倍（推理时的中间张量和工作区）
+ENGINE_BASE_MB = 120
+ENGINE_MODEL_FACTOR = 8
+
+
+def engine_key(options, base_path=None):
+    """引擎的缓存键：实际使用的语言、模型目录以及影响引擎构建的参数"""
+    lang, model_dirs = ocr_core.resolve_model_set(base_path or options.model_root, options.lang)
+    return (lang, tuple(sorted(model_dirs.items())), options.use_angle_cls,
+            options.cpu_threads, options.rec_batch_num, options.cls_batch_num)
+
+
+def estimate_engine_mb(key):
+    """按模型文件大小估算一个引擎常驻时占用的内存（MB）"""
+    model_bytes = 0
+    for _name, model_dir in key[1]:
+        try:
+            for entry in os.scandir(model_dir):
+                if entry.is_file():
+                    model_bytes += entry.stat().st_size
+        except OSError:
+            pass
+    return ENGINE_BASE_MB + ENGINE_MODEL_FACTOR * model_bytes / 1024 / 1024
+
+
+class _PoolEntry:
+    def __init__(self):
+        self.future = Future()
+        self.users = 0
+        self.size_mb = 0.0
+
+
+class EnginePool:
+    """
+    线程安全的引擎池
+    同一键的引擎只会构建一次，并发请求会等待同一个构建结果；构建失败的条目会被移除，下次请求时重试
+    """
+
+    def __init__(self, base_path=None, budget_mb=1024, factory=None):
+        self.base_path = base_path
+        self.budget_mb = budget_mb
+        self.factory = factory or ocr_core.build_ocr_engine
+        self._lock = threading.Lock()
+        # 键 -> _PoolEntry，按最近使用时间从旧到新排列
+        self._entries = OrderedDict()
+
+    def is_loaded(self, options):
+        """该参数对应的引擎是否已加载完成"""
+        key = engine_key(options, self.base_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry.future.done() and entry.future.exception() is None
+
+    def _acquire(self, options):
+        """取得（必要时构建）引擎并登记使用者，返回 (键, 条目, 是否需要由本线程构建)"""
+        key = engine_key(options, self.base_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            build = entry is None
+            if build:
+                entry = self._entries[key] = _PoolEntry()
+                entry.size_mb = estimate_engine_mb(key)
+            self._entries.move_to_end(key)
+            entry.users += 1
+        return key, entry, build
+
+    def _release(self, key, entry):
+        with self._lock:
+            entry.users -= 1
+            self._evict()
+
+    def _build(self, key, entry, options):
+        if not entry.future.set_running_or_notify_cancel():
+            return
+        logging.info(f"加载OCR引擎: 语言 {key[0]}（估计占用 {entry.size_mb:.0f} MB）")
+        try:
+            engine = self.factory(self.base_path, options)
+        except BaseException as e:
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            entry.future.set_exception(e)
+            raise
+        entry.future.set_result(engine)
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        """超出预算时淘汰最久未使用、且当前没有使用者的已加载引擎（调用方持有锁）"""
+        total = sum(e.size_mb for e in self._entries.values())
+        evicted = False
+        for key in list(self._entries):
+            if total <= self.budget_mb:
+                break
+            entry = self._entries[key]
+            if entry.users > 0 or not entry.future.done():
+                continue
+            del self._entries[key]
+            total -= entry.size_mb
+            evicted = True
+            logging.info(f"引擎池超出内存预算，卸载OCR引擎: 语言 {key[0]}")
+        if evicted:
+            gc.collect()
+
+    @contextlib.contextmanager
+    def engine(self, options):
+        """
+        取得对应参数的引擎（首次使用时在当前线程中加载），使用期间不会被淘汰
+        用法: with pool.engine(options) as engine: ...
+        """
+        key, entry, build = self._acquire(options)
+        try:
+            if build:
+                self._build(key, entry, options)
+            yield entry.future.result()
+        finally:
+            self._release(key, entry)
+
+    def warmup(self, options):
+        """在后台线程中预先加载引擎，返回可等待的Future"""
+        key, entry, build = self._acquire(options)
+        if not build:
+            self._release(key, entry)
+            return entry.future
+
+        def run():
+            try:
+                self._build(key, entry, options)
+            except Exception as e:
+                logging.error(f"OCR引擎预热失败: {e}", exc_info=True)
+            finally:
+                self._release(key, entry)
+
+        thread = threading.Thread(target=run, name="ocr-warmup", daemon=True)
+        thread.start()
+        return entry.future
+
+    def stats(self):
+        """已加载的引擎和估算内存"""
+        with self._lock:
+            loaded = [(key[0], entry.size_mb, entry.users) for key, entry in self._entries.items()
+                      if entry.future.done() and entry.future.exception() is None]
+        return {'engines': len(loaded), 'mb': sum(size for _lang, size, _users in loaded),
+                'langs': [lang for lang, _size, _users in loaded]}
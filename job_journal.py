@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+
+"""
+任务断点日志（只追加的JSON Lines文件）
+每识别完一页就追加一行记录并落盘；进程崩溃或被关闭后，再次提交同一任务时只处理缺失的页面。
+内存中只保存 页码 -> 文件偏移 的索引，页面结果按需从文件读取。
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+
+
+def job_id(pdf_path, signature):
+    """由PDF路径、大小、修改时间和识别参数签名生成任务ID，文件或参数变化后视为新任务"""
+    st = os.stat(pdf_path)
+    h = hashlib.sha256()
+    h.update(os.path.normcase(os.path.abspath(pdf_path)).encode('utf-8'))
+    h.update(repr((st.st_size, st.st_mtime_ns)).encode())
+    h.update(signature.encode('utf-8'))
+    return h.hexdigest()[:32]
+
+
+def _scan_records(f):
+    """
+    从文件当前位置开始逐行解析记录，产出 (行首偏移, 行尾偏移, 记录)
+    遇到写了一半（无换行或JSON不完整）的行即停止
+    """
+    while True:
+        offset = f.tell()
+        line = f.readline()
+        if not line or not line.endswith(b'\n'):
+            return
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return
+        yield offset, f.tell(), record
+
+
+def _fsync(f):
+    f.flush()
+    if hasattr(os, 'fdatasync'):
+        os.fdatasync(f.fileno())
+    else:
+        os.fsync(f.fileno())
+
+
+class JobJournal:
+    """
+    单个任务的断点日志，线程安全
+    第一行为任务头记录，之后每行是一页的结果: {"page": 页码, ...}
+    """
+
+    def __init__(self, path, header=None, fsync=True):
+        self.path = path
+        self.fsync = fsync
+        self._offsets = {}
+        self._lock = threading.Lock()
+        self._load()
+        self._writer = open(path, 'ab')
+        if os.path.getsize(path) == 0:
+            self._write_record(dict(header or {}, type='header', created=time.time()))
+        self._reader = open(path, 'rb')
+
+    def _load(self):
+        """读取已有记录建立索引；末尾因崩溃而写了一半的记录会被截掉"""
+        if not os.path.exists(self.path):
+            return
+        good_end = 0
+        with open(self.path, 'rb') as f:
+            for offset, good_end, record in _scan_records(f):
+                if 'page' in record:
+                    self._offsets[record['page']] = offset
+        if good_end < os.path.getsize(self.path):
+            logging.warning(f"断点日志末尾记录不完整，已截断: {self.path}")
+            with open(self.path, 'r+b') as f:
+                f.truncate(good_end)
+
+    def _write_record(self, record):
+        offset = self._writer.tell()
+        self._writer.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+        if self.fsync:
+            _fsync(self._writer)
+        else:
+            self._writer.flush()
+        return offset
+
+    def __contains__(self, page):
+        with self._lock:
+            return page in self._offsets
+
+    @property
+    def completed_pages(self):
+        """已完成的页码集合"""
+        with self._lock:
+            return set(self._offsets)
+
+    def read_page(self, page):
+        """读取某一页的结果，不存在时返回None"""
+        with self._lock:
+            offset = self._offsets.get(page)
+            if offset is None:
+                return None
+            self._reader.seek(offset)
+            return json.loads(self._reader.readline())
+
+    def append(self, result):
+        """追加一页结果并落盘"""
+        with self._lock:
+            self._offsets[result['page']] = self._write_record(result)
+
+    def close(self):
+        with self._lock:
+            self._writer.close()
+            self._reader.close()
+
+
+class JournalReader:
+    """
+    只读方式打开断点日志，供界面等按需读取页面结果
+    refresh() 增量索引其他线程或进程新追加的记录，不会重复读取已索引的部分
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._offsets = {}
+        self._end = 0
+        self._f = None
+        self.refresh()
+
+    def refresh(self):
+        """索引新追加的记录，返回新增的页数"""
+        if self._f is None:
+            if not os.path.exists(self.path):
+                return 0
+            self._f = open(self.path, 'rb')
+        before = len(self._offsets)
+        self._f.seek(self._end)
+        for offset, self._end, record in _scan_records(self._f):
+            if 'page' in record:
+                self._offsets[record['page']] = offset
+        return len(self._offsets) - before
+
+    @property
+    def pages(self):
+        """已记录的页码（升序）"""
+        return sorted(self._offsets)
+
+    def read_page(self, page):
+        """读取某一页的结果，不存在时返回None"""
+        offset = self._offsets.get(page)
+        if offset is None:
+            return None
+        self._f.seek(offset)
+        return json.loads(self._f.readline())
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+
+def journal_path(journal_dir, pdf_path, signature):
+    """某个PDF在给定参数下的断点日志路径"""
+    return os.path.join(journal_dir, job_id(pdf_path, signature) + '.jsonl')
+
+
+def mark_finished(path):
+    """
+    在断点日志末尾追加完成记录：任务已全部完成，不再需要续传
+    该记录没有页码，读取页面结果时会被忽略；日志被再次打开并追加页面后不再视为已完成
+    """
+    with open(path, 'ab') as f:
+        f.write(json.dumps({'type': 'finished', 'finished': time.time()}).encode('utf-8') + b'\n')
+
+
+def is_finished(path):
+    """断点日志的最后一条记录是否为完成记录"""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 256))
+            last = f.read().rstrip(b'\n').rsplit(b'\n', 1)[-1]
+        return json.loads(last).get('type') == 'finished'
+    except (OSError, ValueError, AttributeError):
+        return False
+
+
+def remove_finished(journal_dir):
+    """删除目录中已完成任务的断点日志（未完成的保留，以便续传），返回删除的个数"""
+    removed = 0
+    try:
+        entries = list(os.scandir(journal_dir))
+    except OSError:
+        return 0
+    for entry in entries:
+        if entry.name.endswith('.jsonl') and is_finished(entry.path):
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except OSError as e:
+                logging.warning(f"无法删除已完成的断点日志 {entry.path}: {e}")
+    return removed
+
+
+def open_journal(journal_dir, pdf_path, signature, fsync=True):
+    """打开（或新建）某个PDF在给定参数下的断点日志"""
+    os.makedirs(journal_dir, exist_ok=True)
+    path = journal_path(journal_dir, pdf_path, signature)
+    journal = JobJournal(path, header={'pdf': os.path.abspath(pdf_path)}, fsync=fsync)
+    done = len(journal.completed_pages)
+    if done:
+        logging.info(f"发现断点日志，已完成 {done} 页，将从断点继续: {pdf_path}")
+    return journal
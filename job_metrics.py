@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+
+"""
+识别任务的分阶段计时与指标导出
+每页记录各阶段耗时、像素数和文本行数，按任务汇总为百分位统计；
+可导出为JSON报告，或导出为Prometheus文本格式文件供 node_exporter 的 textfile 收集器抓取。
+
+阶段名称:
+  orientation - 文档级方向检测（不属于某一页）
+  native - 混合模式下检查/提取文本层
+  cache  - 计算页面指纹并查询结果缓存
+  render - page.get_pixmap 渲染
+  encode - 像素缓冲区转换为数组或编码为PNG
+  screen - 识别前的空白页/重复页筛查（计算特征、查找重复页）
+  det / cls / rec - 检测、方向分类、识别；跨页批量识别时批次耗时按文本行数分摊到各页，
+                  逐页识别时取自 TextSystem 返回的各阶段耗时（只在开启 OcrOptions.stage_timing 时记录）
+  ocr    - 逐页识别时整个识别调用的耗时（包含 det/cls/rec 以及切图、排序等前后处理）
+  write  - 写出结果文件
+  ui     - 图形界面每帧处理进度事件的耗时（不属于某一页）
+"""
+
+import os
+import json
+import time
+import socket
+import logging
+import threading
+import contextlib
+from collections import defaultdict
+
+STAGES = ('orientation', 'native', 'cache', 'render', 'encode', 'screen', 'det', 'cls', 'rec', 'ocr', 'write', 'ui')
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+REPORT_VERSION = 1
+PROMETHEUS_PREFIX = 'offlineocr'
+
+
+def percentile(sorted_values, q):
+    """已排序数据的分位数（线性插值，与 numpy.percentile 默认方式一致）"""
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q
+    low = int(pos)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (pos - low)
+
+
+def summarize(values):
+    """数值序列的统计摘要: count/sum/mean/max 以及各分位数"""
+    values = sorted(values)
+    total = sum(values)
+    summary = {
+        'count': len(values),
+        'sum': total,
+        'mean': total / len(values) if values else 0.0,
+        'max': values[-1] if values else 0.0,
+    }
+    for q in QUANTILES:
+        summary[f'p{int(q * 100)}'] = percentile(values, q)
+    return summary
+
+
+class JobMetrics:
+    """
+    单个任务（或多个任务合并后）的指标，线程安全
+    渲染线程和识别线程会同时写入同一页的不同阶段
+    """
+
+    def __init__(self, name=None):
+        self.name = name
+        self.started = time.time()
+        self.wall_seconds = None
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        # 页面键 -> {'page': 页码, 'stages': {阶段: 秒}, 以及 pixels/lines/source 等字段}
+        self._pages = {}
+        # 不属于某一页的耗时样本
+        self._samples = defaultdict(list)
+
+    def _page(self, page):
+        record = self._pages.get(page)
+        if record is None:
+            record = self._pages[page] = {'page': page, 'stages': {}}
+        return record
+
+    def add(self, stage, seconds, page=None):
+        """累加某页某阶段的耗时；page 为None时作为任务级样本记录"""
+        with self._lock:
+            if page is None:
+                self._samples[stage].append(seconds)
+            else:
+                stages = self._page(page)['stages']
+                stages[stage] = stages.get(stage, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def timer(self, stage, page=None):
+        """计时上下文管理器"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start, page)
+
+    def set(self, page, **values):
+        """记录某页的计数或属性（像素数、文本行数、来源等）"""
+        with self._lock:
+            self._page(page).update(values)
+
+    def finish(self):
+        """记录任务总耗时"""
+        self.wall_seconds = time.perf_counter() - self._t0
+
+    def to_dict(self):
+        """可序列化的原始数据（用于从工作进程传回父进程）"""
+        with self._lock:
+            return {
+                'name': self.name,
+                'started': self.started,
+                'wall_seconds': self.wall_seconds,
+                'pages': [dict(r, stages=dict(r['stages'])) for r in self._pages.values()],
+                'samples': {stage: list(v) for stage, v in self._samples.items()},
+            }
+
+    def merge(self, data, key=None):
+        """
+        合并 to_dict() 产出的数据
+        key 非空时以 (key, 页码) 作为页面键，用于把多个文档的指标合并到一起而不互相覆盖
+        """
+        with self._lock:
+            for record in data['pages']:
+                page_key = record['page'] if key is None else (key, record['page'])
+                target = self._page(page_key)
+                for stage, seconds in record['stages'].items():
+                    target['stages'][stage] = target['stages'].get(stage, 0.0) + seconds
+                target.update({k: v for k, v in record.items() if k not in ('page', 'stages')})
+            for stage, values in data['samples'].items():
+                self._samples[stage].extend(values)
+
+    @classmethod
+    def from_dict(cls, data):
+        """由 to_dict() 的数据重建指标对象"""
+        metrics = cls(data['name'])
+        metrics.merge(data)
+        metrics.started = data['started']
+        metrics.wall_seconds = data['wall_seconds']
+        return metrics
+
+    def summary(self):
+        """按阶段汇总的统计结果"""
+        with self._lock:
+            records = list(self._pages.values())
+            samples = {stage: list(v) for stage, v in self._samples.items()}
+        stage_values = defaultdict(list)
+        for record in records:
+            for stage, seconds in record['stages'].items():
+                stage_values[stage].append(seconds)
+        for stage, values in samples.items():
+            stage_values[stage].extend(values)
+
+        sources = defaultdict(int)
+        for record in records:
+            if 'source' in record:
+                sources[record['source']] += 1
+            for flag in ('cached', 'resumed', 'duplicate'):
+                if record.get(flag):
+                    sources[flag] += 1
+
+        order = {stage: i for i, stage in enumerate(STAGES)}
+        wall = self.wall_seconds if self.wall_seconds is not None else time.perf_counter() - self._t0
+        return {
+            'name': self.name,
+            'pages': len(records),
+            'wall_seconds': wall,
+            'pages_per_second': len(records) / wall if wall > 0 else 0.0,
+            'sources': dict(sources),
+            'stages': {stage: summarize(stage_values[stage])
+                       for stage in sorted(stage_values, key=lambda s: (order.get(s, len(order)), s))},
+            'pixels': summarize([r['pixels'] for r in records if 'pixels' in r]),
+            'lines': summarize([r['lines'] for r in records if 'lines' in r]),
+        }
+
+
+def combine(metrics_list, name='total', wall_seconds=None):
+    """把多个任务的指标合并为一个整体（wall_seconds 为整批的实际用时）"""
+    total = JobMetrics(name)
+    for i, metrics in enumerate(metrics_list):
+        total.merge(metrics.to_dict(), key=i)
+    if metrics_list:
+        total.started = min(m.started for m in metrics_list)
+    total.wall_seconds = wall_seconds
+    return total
+
+
+def build_report(metrics_list, total=None, labels=None):
+    """生成JSON报告: 整体汇总 + 每个任务的汇总；labels 记录参数、模型等便于对比的信息"""
+    total = total or combine(metrics_list)
+    return {
+        'version': REPORT_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'host': socket.gethostname(),
+        'labels': labels or {},
+        'total': total.summary(),
+        'jobs': [m.summary() for m in metrics_list],
+    }
+
+
+def _atomic_write(path, text):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def write_json_report(path, report):
+    _atomic_write(path, json.dumps(report, ensure_ascii=False, indent=2) + '\n')
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    escaped = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')
+                                        .replace('\n', '\\n'))
+                       for k, v in labels.items())
+    return '{' + escaped + '}'
+
+
+def _summary_lines(name, help_text, series):
+    """series 为 [(标签字典, 统计摘要)]，生成Prometheus summary类型的样本行"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} summary"]
+    for labels, summary in series:
+        for q in QUANTILES:
+            lines.append(f"{name}{_label_text(dict(labels, quantile=str(q)))} {summary[f'p{int(q * 100)}']:.6g}")
+        lines.append(f"{name}_sum{_label_text(labels)} {summary['sum']:.6g}")
+        lines.append(f"{name}_count{_label_text(labels)} {summary['count']}")
+    return lines
+
+
+def _gauge_lines(name, help_text, series):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for labels, value in series:
+        lines.append(f"{name}{_label_text(labels)} {value:.6g}")
+    return lines
+
+
+def prometheus_text(summary, labels=None):
+    """把一份汇总转换为Prometheus文本格式（描述最近一次运行的情况）"""
+    labels = labels or {}
+    p = PROMETHEUS_PREFIX
+    lines = []
+    lines += _summary_lines(f"{p}_stage_seconds", "各阶段每页耗时（秒）",
+                            [(dict(labels, stage=stage), s) for stage, s in summary['stages'].items()])
+    lines += _summary_lines(f"{p}_page_pixels", "每页渲染像素数", [(labels, summary['pixels'])])
+    lines += _summary_lines(f"{p}_page_lines", "每页识别出的文本行数", [(labels, summary['lines'])])
+    lines += _gauge_lines(f"{p}_last_run_pages", "最近一次运行处理的页数（按来源）",
+                          [(labels, summary['pages'])] +
+                          [(dict(labels, source=k), v) for k, v in sorted(summary['sources'].items())])
+    lines += _gauge_lines(f"{p}_last_run_seconds", "最近一次运行的总用时（秒）",
+                          [(labels, summary['wall_seconds'])])
+    lines += _gauge_lines(f"{p}_last_run_pages_per_second", "最近一次运行的吞吐量（页/秒）",
+                          [(labels, summary['pages_per_second'])])
+    lines += _gauge_lines(f"{p}_last_run_timestamp_seconds", "最近一次运行完成的时间",
+                          [(labels, time.time())])
+    return '\n'.join(lines) + '\n'
+
+
+def write_prometheus(path, summary, labels=None):
+    """写出Prometheus文本文件（先写临时文件再替换，避免收集器读到一半的内容）"""
+    _atomic_write(path, prometheus_text(summary, labels))
+
+
+def format_summary(summary):
+    """生成便于写入日志的多行摘要"""
+    lines = [f"{summary['name'] or '任务'}: {summary['pages']} 页, 用时 {summary['wall_seconds']:.1f} 秒, "
+             f"{summary['pages_per_second']:.2f} 页/秒"]
+    for stage, s in summary['stages'].items():
+        lines.append(f"  {stage:<7} 合计 {s['sum']:8.2f}s  平均 {s['mean'] * 1000:8.1f}ms  "
+                     f"p50 {s['p50'] * 1000:8.1f}ms  p90 {s['p90'] * 1000:8.1f}ms  "
+                     f"p99 {s['p99'] * 1000:8.1f}ms  ({s['count']})")
+    return '\n'.join(lines)
+
+
+def log_summary(metrics):
+    logging.info("分阶段耗时统计:\n" + format_summary(metrics.summary()))
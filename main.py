@@ -36,9 +36,16 @@ try:
     logging.info("开始导入核心模块...")
     import customtkinter as ctk
     from tkinter import filedialog, Menu
-    import fitz
-    from paddleocr import PaddleOCR
+    import time
+    import queue
     import threading
+    import contextlib
+    import ocr_core
+    import job_journal
+    import job_metrics
+    import page_regions
+    import engine_pool
+    import result_writers
     logging.info("所有核心模块导入成功。")
 except ImportError as e:
     logging.error(f"模块导入失败: {e}", exc_info=True)
@@ -50,47 +57,52 @@ except ImportError as e:
 ctk.set_appearance_mode("System")
 ctk.set_default_color_theme("blue")
 
-# 禁用PaddleOCR的日志输出
-logging.getLogger('ppocr').setLevel(logging.WARNING)
+# 缩放选项中表示“按页自适应”的取值
+ADAPTIVE_ZOOM_LABEL = "自适应"
 
+# 结果保存格式（显示名称 -> result_writers 中的格式名），结果逐页写在PDF旁边
+NO_SAVE_LABEL = "不保存"
+SAVE_FORMATS = {
+    NO_SAVE_LABEL: None,
+    "TXT": "txt",
+    "JSONL": "jsonl",
+    "Markdown": "md",
+    "可搜索PDF": "pdf",
+}
 
-# --- OCR引擎初始化 ---
-def init_ocr_engine():
-    """初始化OCR引擎"""
-    try:
-        logging.info("开始初始化OCR引擎...")
-        det_model_path = os.path.join(base_path, 'models/det/ch/ch_PP-OCRv4_det_infer')
-        rec_model_path = os.path.join(base_path, 'models/rec/ch/ch_PP-OCRv4_rec_infer')
-        cls_model_path = os.path.join(base_path, 'models/cls/ch_ppocr_mobile_v2.0_cls_infer')
-        
-        logging.info(f"检测模型路径: {det_model_path}")
-        logging.info(f"识别模型路径: {rec_model_path}")
-        logging.info(f"分类模型路径: {cls_model_path}")
-        
-        if not os.path.exists(os.path.join(det_model_path, 'inference.pdiparams')):
-            raise FileNotFoundError(f"检测模型文件不存在: {det_model_path}")
-        if not os.path.exists(os.path.join(rec_model_path, 'inference.pdiparams')):
-            raise FileNotFoundError(f"识别模型文件不存在: {rec_model_path}")
-        if not os.path.exists(os.path.join(cls_model_path, 'inference.pdiparams')):
-            raise FileNotFoundError(f"方向分类模型文件不存在: {cls_model_path}")
-            
-        ocr_engine = PaddleOCR(
-            use_angle_cls=True, 
-            lang='ch',
-            det_model_dir=det_model_path,
-            rec_model_dir=rec_model_path,
-            cls_model_dir=cls_model_path,
-            show_log=False
-        )
-        logging.info("OCR引擎初始化成功。")
-        return ocr_engine
-    except Exception as e:
-        logging.error(f"OCR引擎初始化失败: {e}", exc_info=True)
-        messagebox.showerror("OCR引擎错误", f"OCR引擎初始化失败，程序无法继续。\n\n错误: {e}\n\n请确保 'models' 文件夹完整并位于程序根目录，然后重启程序。")
-        return None
+# 图形界面的任务日志目录：已完成任务的日志在关闭查看器（开始新任务、清空结果、退出程序）时删除
+JOURNAL_DIR = os.path.join(base_path, 'jobs')
+
+# 界面刷新间隔（毫秒）：识别线程只往队列里投递事件，主线程按固定帧率取出并合并后统一更新控件
+UI_FRAME_MS = 33
+
+# 语言选项（显示名称 -> 模型语言）；中文与中英文使用同一套模型，共用同一个引擎
+LANG_CODES = {
+    "中英文": "ch",
+    "英文": "en",
+    "中文": "ch",
+}
 
-# 立即调用函数以创建全局变量
-OCR_ENGINE = init_ocr_engine()
+# 渲染后超过该百万像素数的页面（工程图纸、大幅地图）分块识别，避免一次性渲染整页占用数GB内存
+TILE_MAX_MPX = 30
+
+# --- OCR引擎池（后台预热） ---
+# 各语言的引擎在首次使用时加载并常驻，估算内存超过预算时淘汰最久未使用的引擎
+ENGINE_POOL_MB = 1024
+ENGINE_POOL = engine_pool.EnginePool(base_path, ENGINE_POOL_MB)
+# 默认语言引擎的预热结果；窗口无需等待模型加载即可显示
+WARMUP_FUTURE = None
+
+
+def start_engine_warmup():
+    """在后台线程中预热默认语言的引擎"""
+    global WARMUP_FUTURE
+    logging.info("开始初始化OCR引擎...")
+    WARMUP_FUTURE = ENGINE_POOL.warmup(ocr_core.OcrOptions())
+
+
+def show_engine_error(error):
+    messagebox.showerror("OCR引擎错误", f"OCR引擎初始化失败，无法进行识别。\n\n错误: {error}\n\n请确保 'models' 文件夹完整并位于程序根目录，然后重启程序。")
 
 class App(ctk.CTk):
     def __init__(self):
@@ -130,7 +142,7 @@ class App(ctk.CTk):
         self.zoom_label.pack(side="left", padx=(10, 5), pady=10)
         
         self.zoom_var = ctk.StringVar(value="2.0")
-        self.zoom_option = ctk.CTkOptionMenu(self.options_frame, values=["1.0", "1.5", "2.0", "2.5", "3.0"], 
+        self.zoom_option = ctk.CTkOptionMenu(self.options_frame, values=[ADAPTIVE_ZOOM_LABEL, "1.0", "1.5", "2.0", "2.5", "3.0"], 
                                              variable=self.zoom_var)
         self.zoom_option.pack(side="left", padx=5, pady=10)
         
@@ -138,12 +150,80 @@ class App(ctk.CTk):
         self.lang_label.pack(side="left", padx=(20, 5), pady=10)
         
         self.lang_var = ctk.StringVar(value="中英文")
-        self.lang_option = ctk.CTkOptionMenu(self.options_frame, values=["中英文", "英文", "中文"], 
+        # 只列出模型齐全的语言；打包时没有带上英文识别模型的版本不显示“英文”，而不是悄悄改用中英文模型
+        langs = ocr_core.available_langs(base_path)
+        lang_labels = [label for label, code in LANG_CODES.items() if code in langs]
+        if len(lang_labels) < len(LANG_CODES):
+            logging.warning(f"部分语言的模型缺失，可选语言: {', '.join(lang_labels)}")
+        self.lang_option = ctk.CTkOptionMenu(self.options_frame, values=lang_labels, 
                                              variable=self.lang_var)
         self.lang_option.pack(side="left", padx=5, pady=10)
 
+        self.save_label = ctk.CTkLabel(self.options_frame, text="保存结果:")
+        self.save_label.pack(side="left", padx=(20, 5), pady=10)
+
+        self.save_var = ctk.StringVar(value=NO_SAVE_LABEL)
+        self.save_option = ctk.CTkOptionMenu(self.options_frame, values=list(SAVE_FORMATS),
+                                             variable=self.save_var, width=110)
+        self.save_option.pack(side="left", padx=5, pady=10)
+
+        self.hybrid_var = ctk.BooleanVar(value=False)
+        self.hybrid_check = ctk.CTkCheckBox(self.options_frame, text="混合模式(优先使用文本层)",
+                                            variable=self.hybrid_var)
+        self.hybrid_check.pack(side="left", padx=(20, 5), pady=10)
+
+        self.orientation_var = ctk.BooleanVar(value=False)
+        self.orientation_check = ctk.CTkCheckBox(self.options_frame, text="统一页面方向",
+                                                 variable=self.orientation_var)
+        self.orientation_check.pack(side="left", padx=(10, 5), pady=10)
+
+        self.layout_var = ctk.BooleanVar(value=False)
+        self.layout_check = ctk.CTkCheckBox(self.options_frame, text="版面还原",
+                                            variable=self.layout_var)
+        self.layout_check.pack(side="left", padx=(10, 5), pady=10)
+
+        self.screen_var = ctk.BooleanVar(value=False)
+        self.screen_check = ctk.CTkCheckBox(self.options_frame, text="跳过空白页",
+                                            variable=self.screen_var)
+        self.screen_check.pack(side="left", padx=(10, 5), pady=10)
+
+        # 重复页复用结果只适合内容确实相同的批次（分隔页、封面、信笺），默认关闭
+        self.dedup_var = ctk.BooleanVar(value=False)
+        self.dedup_check = ctk.CTkCheckBox(self.options_frame, text="复用重复页",
+                                           variable=self.dedup_var)
+        self.dedup_check.pack(side="left", padx=(10, 5), pady=10)
+
+        self.pages_label = ctk.CTkLabel(self.options_frame, text="页码:")
+        self.pages_label.pack(side="left", padx=(10, 5), pady=10)
+
+        self.pages_entry = ctk.CTkEntry(self.options_frame, width=90, placeholder_text="全部")
+        self.pages_entry.pack(side="left", padx=5, pady=10)
+
+        # 结果区每次只显示一页，页面文本按需从任务的断点日志中读取，页数再多也不会拖慢界面
         self.result_textbox = ctk.CTkTextbox(self.middle_frame, wrap="word", font=("Microsoft YaHei", 12))
-        self.result_textbox.grid(row=1, column=0, padx=10, pady=(0, 10), sticky="nsew")
+        self.result_textbox.grid(row=1, column=0, padx=10, pady=(0, 5), sticky="nsew")
+
+        self.nav_frame = ctk.CTkFrame(self.middle_frame)
+        self.nav_frame.grid(row=2, column=0, padx=10, pady=(0, 10), sticky="ew")
+
+        self.prev_button = ctk.CTkButton(self.nav_frame, text="上一页", width=80,
+                                         command=lambda: self.show_page(self.view_page - 1))
+        self.prev_button.pack(side="left", padx=(10, 5), pady=5)
+
+        self.page_entry = ctk.CTkEntry(self.nav_frame, width=70)
+        self.page_entry.pack(side="left", padx=5, pady=5)
+        self.page_entry.bind("<Return>", self.goto_page)
+
+        self.page_label = ctk.CTkLabel(self.nav_frame, text="/ 0 页")
+        self.page_label.pack(side="left", padx=5, pady=5)
+
+        self.next_button = ctk.CTkButton(self.nav_frame, text="下一页", width=80,
+                                         command=lambda: self.show_page(self.view_page + 1))
+        self.next_button.pack(side="left", padx=5, pady=5)
+
+        self.follow_var = ctk.BooleanVar(value=True)
+        self.follow_check = ctk.CTkCheckBox(self.nav_frame, text="跟随最新页", variable=self.follow_var)
+        self.follow_check.pack(side="left", padx=(20, 5), pady=5)
 
         self.bottom_frame = ctk.CTkFrame(self, height=30)
         self.bottom_frame.grid(row=2, column=0, padx=10, pady=5, sticky="ew")
@@ -159,6 +239,43 @@ class App(ctk.CTk):
         self.pdf_path = None
         self.is_processing = False
 
+        # 识别线程 -> 主线程的事件队列，以及分页查看器的状态
+        self.ui_queue = queue.Queue()
+        self.result_reader = None
+        self.result_hybrid = False
+        self.view_total = 0
+        self.view_page = 0
+        self.latest_page = None
+        self.update_nav()
+        # 当前任务的分阶段耗时（识别线程创建，主线程记录界面刷新耗时）
+        self.job_metrics = None
+
+        # 上次运行遗留的已完成任务日志（如程序被强制结束）在启动时清理，未完成的保留以便续传
+        job_journal.remove_finished(JOURNAL_DIR)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        self.status_label.configure(text="OCR引擎预热中...")
+        self.after(200, self.check_engine_ready)
+        self.after(UI_FRAME_MS, self.drain_ui_queue)
+
+    def on_close(self):
+        """关闭窗口：先关闭查看器（删除已完成任务的日志）再退出"""
+        self.close_viewer()
+        self.destroy()
+
+    def check_engine_ready(self):
+        """在主线程中轮询引擎预热状态"""
+        if WARMUP_FUTURE is None:
+            return
+        if not WARMUP_FUTURE.done():
+            self.after(200, self.check_engine_ready)
+            return
+        if WARMUP_FUTURE.exception() is not None:
+            self.status_label.configure(text="OCR引擎加载失败")
+            show_engine_error(WARMUP_FUTURE.exception())
+        elif not self.is_processing:
+            self.status_label.configure(text="准备就绪")
+
     def create_menu(self):
         menubar = Menu(self)
         self.config(menu=menubar)
@@ -167,7 +284,7 @@ class App(ctk.CTk):
         menubar.add_cascade(label="文件", menu=file_menu)
         file_menu.add_command(label="打开PDF", command=self.select_pdf)
         file_menu.add_separator()
-        file_menu.add_command(label="退出", command=self.quit)
+        file_menu.add_command(label="退出", command=self.on_close)
         
         edit_menu = Menu(menubar, tearoff=0)
         menubar.add_cascade(label="编辑", menu=edit_menu)
@@ -192,15 +309,135 @@ class App(ctk.CTk):
             self.start_button.configure(state="disabled")
 
     def clear_results(self):
-        self.result_textbox.delete("1.0", "end")
+        self.close_viewer()
         self.status_label.configure(text="结果已清空")
 
     def copy_all(self):
-        content = self.result_textbox.get("1.0", "end")
+        if self.result_reader is None:
+            return
+        self.result_reader.refresh()
+        content = "".join(self.page_text(i) for i in self.result_reader.pages)
         self.clipboard_clear()
         self.clipboard_append(content)
         self.status_label.configure(text="已复制到剪贴板")
 
+    # --- 分页查看器 ---
+
+    def open_viewer(self, path, total_pages, hybrid):
+        """开始显示一个任务的结果（断点日志可能尚未创建，读取器会在刷新时再打开）"""
+        self.close_viewer()
+        self.result_reader = job_journal.JournalReader(path)
+        self.result_hybrid = hybrid
+        self.view_total = total_pages
+        self.latest_page = None
+        self.show_page(0)
+
+    def close_viewer(self):
+        """停止显示当前任务的结果；任务已完成时其断点日志不再需要，一并删除"""
+        if self.result_reader is not None:
+            self.result_reader.close()
+            if job_journal.is_finished(self.result_reader.path):
+                try:
+                    os.remove(self.result_reader.path)
+                except OSError as e:
+                    logging.warning(f"无法删除已完成的断点日志: {e}")
+            self.result_reader = None
+        self.view_total = 0
+        self.view_page = 0
+        self.latest_page = None
+        self.result_textbox.delete("1.0", "end")
+        self.update_nav()
+
+    def page_text(self, page_index):
+        result = self.result_reader.read_page(page_index) if self.result_reader else None
+        if result is None:
+            return ""
+        return ocr_core.format_page_text(page_index, result['text'],
+                                         result['source'] if self.result_hybrid or result['source'] == 'blank'
+                                         else None)
+
+    def show_page(self, page_index):
+        if not self.view_total:
+            return
+        self.view_page = max(0, min(page_index, self.view_total - 1))
+        text = self.page_text(self.view_page)
+        self.result_textbox.delete("1.0", "end")
+        self.result_textbox.insert("end", text or f"第 {self.view_page + 1} 页尚未识别")
+        self.update_nav()
+
+    def goto_page(self, _event=None):
+        try:
+            page_index = int(self.page_entry.get()) - 1
+        except ValueError:
+            self.update_nav()
+            return
+        self.follow_var.set(False)
+        self.show_page(page_index)
+
+    def update_nav(self):
+        self.page_entry.delete(0, "end")
+        if self.view_total:
+            self.page_entry.insert(0, str(self.view_page + 1))
+        self.page_label.configure(text=f"/ {self.view_total} 页")
+        self.prev_button.configure(state="normal" if self.view_page > 0 else "disabled")
+        self.next_button.configure(state="normal" if self.view_page < self.view_total - 1 else "disabled")
+
+    # --- 识别线程与界面之间的事件队列 ---
+
+    def post(self, *event):
+        """供识别线程调用：投递界面事件，不直接操作任何控件"""
+        self.ui_queue.put(event)
+
+    def drain_ui_queue(self):
+        """按固定帧率在主线程中处理事件；同一帧内的多次进度更新只保留最后一次"""
+        start = time.perf_counter()
+        handled = False
+        progress = None
+        status = None
+        try:
+            while True:
+                event = self.ui_queue.get_nowait()
+                handled = True
+                kind = event[0]
+                if kind == 'progress':
+                    progress = event[1:]
+                elif kind == 'status':
+                    status = event[1]
+                elif kind == 'job':
+                    self.open_viewer(*event[1:])
+                elif kind == 'info':
+                    messagebox.showinfo(*event[1:])
+                elif kind == 'error':
+                    messagebox.showerror(*event[1:])
+                elif kind == 'engine_error':
+                    show_engine_error(event[1])
+                elif kind == 'reset':
+                    if progress is not None:
+                        self.update_progress(*progress)
+                        progress = None
+                    self.reset_ui()
+                    status = None
+        except queue.Empty:
+            pass
+        if progress is not None:
+            self.update_progress(*progress)
+        if status is not None:
+            self.status_label.configure(text=status)
+        metrics = self.job_metrics
+        if handled and metrics is not None:
+            metrics.add('ui', time.perf_counter() - start)
+        self.after(UI_FRAME_MS, self.drain_ui_queue)
+
+    def update_progress(self, done, total, latest_page):
+        self.progress_bar.set(done / total if total else 0)
+        self.status_label.configure(text=f"已完成 {done}/{total} 页")
+        if self.result_reader is None:
+            return
+        self.result_reader.refresh()
+        self.latest_page = latest_page
+        if self.follow_var.get() or self.view_page == latest_page:
+            self.show_page(latest_page)
+
     def show_about(self):
         messagebox.showinfo("关于", "离线PDF-OCR工具\n版本: 1.0\n\n一个基于PaddleOCR的离线PDF文本识别工具")
 
@@ -208,68 +445,104 @@ class App(ctk.CTk):
         if not self.pdf_path:
             messagebox.showwarning("提示", "请先选择一个PDF文件！")
             return
-        if not OCR_ENGINE:
-            messagebox.showerror("错误", "OCR引擎未能成功初始化，无法进行识别。\n请检查模型文件是否存在。")
-            return
         if self.is_processing:
             messagebox.showwarning("提示", "正在处理中，请稍候...")
             return
+        try:
+            page_regions.parse_page_ranges(self.pages_entry.get(), 0)
+        except ValueError as e:
+            messagebox.showwarning("提示", f"页码范围无效: {e}\n示例: 1-3,10-40")
+            return
             
         self.is_processing = True
         self.start_button.configure(state="disabled")
         self.select_button.configure(state="disabled")
-        self.result_textbox.delete("1.0", "end")
+        self.close_viewer()
         
-        ocr_thread = threading.Thread(target=self.run_ocr_process)
+        ocr_thread = threading.Thread(target=self.run_ocr_process, args=self.job_params())
         ocr_thread.daemon = True
         ocr_thread.start()
 
-    def run_ocr_process(self):
+    def job_params(self):
+        """
+        在主线程中读取界面上的各项设置，返回识别线程所需的参数
+        Tkinter不是线程安全的，识别线程只使用这里得到的快照，不再访问任何控件和变量
+        """
+        zoom_value = self.zoom_var.get()
+        adaptive = zoom_value == ADAPTIVE_ZOOM_LABEL
+        lang_label = self.lang_var.get()
+        options = ocr_core.OcrOptions(zoom=ocr_core.OcrOptions.zoom if adaptive else float(zoom_value),
+                                      adaptive_zoom=adaptive, hybrid=self.hybrid_var.get(),
+                                      lang=LANG_CODES[lang_label],
+                                      doc_orientation=self.orientation_var.get(),
+                                      layout=self.layout_var.get(),
+                                      skip_blank=self.screen_var.get(),
+                                      dedup_pages=self.dedup_var.get(),
+                                      tile_max_mpx=TILE_MAX_MPX,
+                                      page_ranges=self.pages_entry.get().strip() or None,
+                                      cache_dir=os.path.join(base_path, 'cache'),
+                                      journal_dir=JOURNAL_DIR,
+                                      index_path=os.path.join(base_path, 'index.db'))
+        return self.pdf_path, options, lang_label, SAVE_FORMATS[self.save_var.get()]
+
+    def run_ocr_process(self, pdf_path, options, lang_label, save_format):
+        engine_ready = False
         try:
-            doc = fitz.open(self.pdf_path)
-            total_pages = len(doc)
-            self.status_label.configure(text=f"共 {total_pages} 页, 处理中...")
-            self.progress_bar.set(0)
-            
-            zoom = float(self.zoom_var.get())
-            
-            full_text = ""
-            for i, page in enumerate(doc):
-                if not self.is_processing:
-                    break
-                    
-                mat = fitz.Matrix(zoom, zoom)
-                pix = page.get_pixmap(matrix=mat)
-                img_bytes = pix.tobytes("png")
-
-                result = OCR_ENGINE.ocr(img_bytes, cls=True)
-                
-                page_text = ""
-                if result and result[0]:
-                    txts = [line[1][0] for line in result[0]]
-                    page_text = "\n".join(txts)
-
-                full_text += f"--- 第 {i+1} 页 --- \n{page_text}\n\n"
-                
-                self.after(0, self.update_ui, f"--- 第 {i+1} 页 --- \n{page_text}\n\n", (i + 1) / total_pages, f"已完成 {i+1}/{total_pages} 页")
-
-            doc.close()
-            
-            if self.is_processing:
-                self.after(0, lambda: messagebox.showinfo("完成", f"所有 {total_pages} 页均已识别完毕！"))
-            else:
-                self.after(0, lambda: self.status_label.configure(text="操作已取消"))
+            if not ENGINE_POOL.is_loaded(options):
+                self.post('status', f"等待{lang_label}OCR引擎加载...")
+            with ENGINE_POOL.engine(options) as engine:
+                engine_ready = True
+                self.ocr_document(engine, pdf_path, options, save_format)
 
         except Exception as e:
-            self.after(0, lambda: messagebox.showerror("OCR处理失败", f"处理过程中发生错误:\n{str(e)}"))
-        finally:
+            logging.error(f"OCR处理失败: {e}", exc_info=True)
             self.is_processing = False
-            self.after(0, self.reset_ui)
+            self.post('reset')
+            if engine_ready:
+                self.post('error', "OCR处理失败", f"处理过程中发生错误:\n{str(e)}")
+            else:
+                self.post('engine_error', e)
+
+    def ocr_document(self, engine, pdf_path, options, save_format):
+        """在识别线程中逐页识别PDF，只通过事件队列与界面通信"""
+        page_count = ocr_core.count_pages(pdf_path)
+        selected = ocr_core.selected_pages(pdf_path, options)
+        total_pages = len(selected)
+        self.post('progress', 0, total_pages, selected[0] if selected else 0)
+        self.post('status', f"共 {total_pages} 页, 处理中...")
+
+        # 查看器按文档页码翻页，未选中的页面显示为尚未识别
+        journal = job_journal.journal_path(options.journal_dir, pdf_path, ocr_core.job_signature(options))
+        self.post('job', journal, page_count, options.hybrid)
+
+        out_base = os.path.splitext(pdf_path)[0]
+        writer = result_writers.open_writers(out_base, [save_format] if save_format else [], options, pdf_path)
+
+        # 页面文本已由断点日志保存，这里只投递进度，界面按需从日志读取
+        metrics = job_metrics.JobMetrics(pdf_path)
+        self.job_metrics = metrics
+        with writer, contextlib.closing(ocr_core.iter_ocr_pages(engine, pdf_path, options,
+                                                                metrics=metrics)) as pages:
+            for done, page_result in enumerate(pages, 1):
+                with metrics.timer('write', page_result['page']):
+                    writer.write(page_result)
+                self.post('progress', done, total_pages, page_result['page'])
 
-    def update_ui(self, text, progress, status):
-        self.result_textbox.insert("end", text)
-        self.progress_bar.set(progress)
-        self.status_label.configure(text=status)
+                if not self.is_processing:
+                    break
+        metrics.finish()
+        job_metrics.log_summary(metrics)
+        
+        cancelled = not self.is_processing
+        if not cancelled and os.path.exists(journal):
+            # 查看器仍从日志读取结果，标记为已完成，关闭查看器时再删除
+            job_journal.mark_finished(journal)
+        self.is_processing = False
+        self.post('reset')
+        if cancelled:
+            self.post('status', "操作已取消")
+        else:
+            self.post('info', "完成", f"所有 {total_pages} 页均已识别完毕！")
 
     def reset_ui(self):
         self.start_button.configure(state="normal" if self.pdf_path else "disabled")
@@ -280,10 +553,8 @@ if __name__ == "__main__":
     try:
         logging.info("开始主程序")
         
-        if not OCR_ENGINE:
-            logging.error("OCR引擎初始化失败，主程序退出。")
-            # 错误信息已在 init_ocr_engine 中通过 messagebox 显示，这里直接退出即可
-            sys.exit(1)
+        logging.info("后台预热OCR引擎")
+        start_engine_warmup()
         
         logging.info("创建应用程序")
         app = App()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+本机OCR服务的客户端（只依赖标准库，不导入Paddle或PyMuPDF，启动开销可以忽略）
+
+用法示例:
+  python ocr_client.py submit scan.pdf --wait --lang en --pages 1-3
+  python ocr_client.py submit scan.pdf --stream > scan.jsonl
+  python ocr_client.py status 3
+  python ocr_client.py cancel 3
+  python ocr_client.py --unix /tmp/offlineocr.sock health
+
+在代码中使用:
+  client = OcrClient()
+  job = client.submit('scan.pdf', hybrid=True)
+  for page in client.pages(job['id']):
+      print(page['page'], page['text'])
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import http.client
+from urllib.parse import urlencode, urlsplit
+
+DEFAULT_URL = 'http://127.0.0.1:8765'
+
+# 上传文件的块大小
+UPLOAD_CHUNK = 1024 * 1024
+
+
+class OcrServiceError(Exception):
+    """服务返回错误状态码"""
+
+    def __init__(self, status, message):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.message = message
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """通过Unix套接字连接的HTTP连接"""
+
+    def __init__(self, path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class OcrClient:
+    """
+    OCR服务客户端，每个请求使用一个新连接（流式读取结果时连接保持到任务结束）
+    url 为服务地址；给出 unix_socket 时改用Unix套接字
+    """
+
+    def __init__(self, url=DEFAULT_URL, unix_socket=None, timeout=60):
+        self.url = urlsplit(url)
+        self.unix_socket = unix_socket
+        self.timeout = timeout
+
+    def _connection(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        if self.unix_socket:
+            return UnixHTTPConnection(self.unix_socket, timeout)
+        return http.client.HTTPConnection(self.url.hostname, self.url.port or 80, timeout=timeout)
+
+    def _request(self, method, path, body=None, headers=None):
+        conn = self._connection()
+        try:
+            conn.request(method, path, body=body, headers=headers or {})
+            response = conn.getresponse()
+            data = json.loads(response.read() or b'{}')
+        finally:
+            conn.close()
+        if response.status >= 400:
+            raise OcrServiceError(response.status, data.get('error', response.reason))
+        return data
+
+    def health(self):
+        return self._request('GET', '/health')
+
+    def submit(self, pdf_path, upload=True, **options):
+        """
+        提交PDF，返回任务状态字典（含 'id'）
+        upload 为真时上传文件内容（服务以其他用户运行时也可用），否则只传路径，由服务直接读取本机文件
+        options 为识别参数（lang, zoom, hybrid, pages, regions 等，见 ocr_service.REQUEST_OPTIONS）
+        """
+        if not upload:
+            body = json.dumps({'path': os.path.abspath(pdf_path), 'options': options}).encode('utf-8')
+            return self._request('POST', '/jobs', body, {'Content-Type': 'application/json'})
+        query = {name: json.dumps(value, ensure_ascii=False) if isinstance(value, (list, dict)) else value
+                 for name, value in options.items() if value is not None}
+        path = '/jobs' + (f"?{urlencode(query)}" if query else '')
+        with open(pdf_path, 'rb') as f:
+            headers = {'Content-Type': 'application/pdf', 'Content-Length': str(os.fstat(f.fileno()).st_size)}
+            return self._request('POST', path, _iter_file(f), headers)
+
+    def status(self, job_id):
+        return self._request('GET', f"/jobs/{job_id}")
+
+    def jobs(self):
+        return self._request('GET', '/jobs')['jobs']
+
+    def page(self, job_id, page_number):
+        """读取单页结果（页码从1开始）"""
+        return self._request('GET', f"/jobs/{job_id}/pages/{page_number}")
+
+    def cancel(self, job_id):
+        return self._request('DELETE', f"/jobs/{job_id}")
+
+    def pages(self, job_id, start=0):
+        """逐页产出识别结果（边识别边返回），任务结束后结束"""
+        conn = self._connection(timeout=None)
+        try:
+            conn.request('GET', f"/jobs/{job_id}/pages?from={start}")
+            response = conn.getresponse()
+            if response.status >= 400:
+                data = json.loads(response.read() or b'{}')
+                raise OcrServiceError(response.status, data.get('error', response.reason))
+            for line in response:
+                if line.strip():
+                    yield json.loads(line)
+        finally:
+            conn.close()
+
+    def wait(self, job_id, poll_seconds=0.5):
+        """等待任务结束，返回最终状态"""
+        while True:
+            status = self.status(job_id)
+            if status['state'] in ('done', 'failed', 'cancelled'):
+                return status
+            time.sleep(poll_seconds)
+
+
+def _iter_file(f):
+    while True:
+        chunk = f.read(UPLOAD_CHUNK)
+        if not chunk:
+            return
+        yield chunk
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="离线PDF-OCR本机服务客户端")
+    parser.add_argument('--url', default=DEFAULT_URL, help="服务地址")
+    parser.add_argument('--unix', help="通过该Unix套接字连接服务")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    submit = commands.add_parser('submit', help="提交PDF")
+    submit.add_argument('pdf')
+    submit.add_argument('--no-upload', action='store_true', help="只传文件路径，由服务直接读取本机文件")
+    submit.add_argument('--lang')
+    submit.add_argument('--zoom', type=float)
+    submit.add_argument('--pages', help="页码范围，如 1-3,10-40")
+    submit.add_argument('--regions', help="区域模板（JSON文件）")
+    submit.add_argument('--hybrid', action='store_true', default=None)
+    submit.add_argument('--doc-orientation', action='store_true', default=None)
+    submit.add_argument('--wait', action='store_true', help="等待任务结束后输出全部文本")
+    submit.add_argument('--stream', action='store_true', help="逐页输出识别结果（JSON Lines）")
+
+    for name, help_text in (('status', "查询任务状态"), ('cancel', "取消任务")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('job')
+    commands.add_parser('jobs', help="列出所有任务")
+    commands.add_parser('health', help="服务状态")
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    client = OcrClient(args.url, args.unix)
+    try:
+        if args.command == 'submit':
+            regions = None
+            if args.regions:
+                with open(args.regions, 'r', encoding='utf-8') as f:
+                    regions = json.load(f)
+            options = {'lang': args.lang, 'zoom': args.zoom, 'pages': args.pages, 'regions': regions,
+                       'hybrid': args.hybrid, 'doc_orientation': args.doc_orientation}
+            job = client.submit(args.pdf, upload=not args.no_upload,
+                                **{k: v for k, v in options.items() if v is not None})
+            if args.stream or args.wait:
+                for page in client.pages(job['id']):
+                    if args.stream:
+                        print(json.dumps(page, ensure_ascii=False), flush=True)
+                    else:
+                        print(f"--- 第 {page['page'] + 1} 页 --- \n{page['text']}\n")
+                status = client.status(job['id'])
+                if status['state'] != 'done':
+                    print(json.dumps(status, ensure_ascii=False), file=sys.stderr)
+                    return 1
+            else:
+                print(json.dumps(job, ensure_ascii=False))
+        elif args.command == 'status':
+            print(json.dumps(client.status(args.job), ensure_ascii=False, indent=2))
+        elif args.command == 'cancel':
+            print(json.dumps(client.cancel(args.job), ensure_ascii=False, indent=2))
+        elif args.command == 'jobs':
+            print(json.dumps(client.jobs(), ensure_ascii=False, indent=2))
+        else:
+            print(json.dumps(client.health(), ensure_ascii=False, indent=2))
+    except (OSError, OcrServiceError) as e:
+        print(f"请求失败: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,958 @@
+# -*- coding: utf-8 -*-
+
+"""
+OCR核心逻辑（与界面无关）
+负责模型路径检查、PaddleOCR引擎构建以及逐页识别PDF，GUI与批处理命令行共用
+"""
+
+import os
+import sys
+import copy
+import json
+import time
+import queue
+import hashlib
+import logging
+import threading
+
+import fitz
+import numpy as np
+
+import page_cache
+import page_columns
+import page_layout
+import page_screen
+import job_journal
+import job_metrics
+import tiling
+import page_regions
+import doc_orientation
+import batch_recognition
+
+# 禁用PaddleOCR的日志输出
+logging.getLogger('ppocr').setLevel(logging.WARNING)
+
+# 模型目录（相对于程序根目录）
+MODEL_SUBDIRS = {
+    'det': 'models/det/ch/ch_PP-OCRv4_det_infer',
+    'rec': 'models/rec/ch/ch_PP-OCRv4_rec_infer',
+    'cls': 'models/cls/ch_ppocr_mobile_v2.0_cls_infer',
+}
+
+# 各语言的模型组：英文使用体积更小、速度更快的英文识别模型，检测和方向分类模型与中英文共用
+# 缺少某语言的模型时回退到中英文模型（中英文模型同样能识别英文）
+DEFAULT_LANG = 'ch'
+LANG_MODEL_SUBDIRS = {
+    'ch': MODEL_SUBDIRS,
+    'en': dict(MODEL_SUBDIRS, rec='models/rec/en/en_PP-OCRv4_rec_infer'),
+}
+
+MODEL_NAMES = {
+    'det': '检测模型',
+    'rec': '识别模型',
+    'cls': '方向分类模型',
+}
+
+
+def get_base_path():
+    """获取程序根目录（打包后为exe所在目录）"""
+    if hasattr(sys, 'frozen'):
+        return os.path.dirname(os.path.abspath(sys.executable))
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+class OcrOptions:
+    """
+    一次识别任务的参数
+    所有字段都有默认值，可通过关键字参数覆盖；对象可被pickle，以便传给工作进程
+    """
+
+    # 渲染缩放比例
+    zoom = 2.0
+    # 是否启用文本方向分类
+    use_angle_cls = True
+    # 识别语言: 'ch'（中英文）或 'en'（英文），决定使用的模型组
+    lang = 'ch'
+    # 每个引擎的CPU推理线程数，None表示使用PaddleOCR默认值
+    cpu_threads = None
+    # 渲染流水线的预取页数（队列深度），0表示不预取、渲染与识别串行执行
+    prefetch_pages = 4
+    # 预取图像占用内存上限（MB）
+    prefetch_mb = 512
+    # 直接把像素缓冲区包装为NumPy数组交给引擎；关闭时回退为PNG编码
+    zero_copy = True
+    # 混合模式：页面自带可用文本层时直接提取文本，只对纯图像页面执行渲染+识别
+    hybrid = False
+    # 文本层至少包含的字符数
+    hybrid_min_chars = 20
+    # 图像覆盖率达到该值时视为扫描页，除非文本块覆盖率也足够高（例如已带OCR隐藏文本层）
+    hybrid_max_image_coverage = 0.5
+    hybrid_min_text_coverage = 0.15
+    # 模型根目录，None表示程序根目录
+    model_root = None
+    # 页面结果磁盘缓存目录，None表示不使用缓存
+    cache_dir = None
+    # 缓存总大小上限（MB），超出后按LRU淘汰
+    cache_max_mb = 1024
+    # 跨页批量识别：汇总多少页的文本行切图后统一识别，0或1表示逐页识别
+    batch_pages = 0
+    # 识别/方向分类模型单次推理的批大小，None表示使用PaddleOCR默认值
+    rec_batch_num = None
+    cls_batch_num = None
+    # 逐页识别时记录检测/分类/识别各阶段的耗时：绕过 engine.ocr() 直接调用 TextSystem，
+    # 只在需要分阶段耗时统计时开启（命令行给出 --metrics-json/--metrics-prom、性能基准测试）
+    stage_timing = False
+    # 自适应缩放：按页估计文字大小，选择使x高度达到目标像素数的最小缩放比例
+    adaptive_zoom = False
+    # 目标x高度（像素）
+    target_x_height = 14
+    # 自适应缩放的上下限
+    zoom_min = 1.0
+    zoom_max = 3.0
+    # 断点日志目录：每识别完一页即追加记录，任务中断后再次提交时只处理缺失页面；None表示不记录
+    journal_dir = None
+    # 每条断点记录写入后是否fsync
+    journal_fsync = True
+    # 输出可搜索PDF时每写完多少页做一次增量保存
+    pdf_save_pages = 10
+    # 文档级方向检测：抽样判断整个文档的方向，渲染时统一转正并关闭逐行方向分类
+    doc_orientation = False
+    # 抽样页数、抽样渲染的缩放比例，以及关闭逐行分类所需的最低置信度
+    orientation_pages = 3
+    orientation_zoom = 1.0
+    orientation_min_confidence = 0.85
+    # 调用方已确定的文档方向 (旋转角度, 置信度)，给出时不再抽样检测（分片识别时由父进程检测一次后传给各分片）
+    orientation_decision = None
+    # 分块模式：按缩放比例渲染后超过多少百万像素的页面切成重叠的小块分别识别，0表示不分块
+    tile_max_mpx = 0
+    # 每块的边长和相邻块的重叠宽度（像素），重叠宽度应大于最长文本行的高度
+    tile_size = 2048
+    tile_overlap = 256
+    # 页码范围（从1开始，如 "1-3,10-40"），None或空字符串表示全部页面
+    page_ranges = None
+    # 区域模板（page_regions.check_regions 的结果）：只渲染并识别页面上的这些区域，None表示整页识别
+    regions = None
+    # 版面还原：按阅读顺序排列多栏页面的文本行，合并被切开的行并分段（见 page_layout）；
+    # 会改变输出文本的行序和空行，默认关闭，保持按检测顺序每框一行的原有输出
+    layout = False
+    # 全文检索索引（search_index）的数据库路径：识别完成的页面逐页写入索引，None表示不建索引
+    index_path = None
+    # 识别前筛查（见 page_screen）：跳过墨迹面积低于 blank_max_ink（平方pt）的空白页
+    skip_blank = False
+    blank_max_ink = 64.0
+    # 与已识别页面（同一进程内，包括其他文档）几乎相同的页面直接复用其结果；最多保留多少页的特征
+    dedup_pages = False
+    dedup_max_pages = 500
+
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            if not hasattr(type(self), key):
+                raise TypeError(f"未知的识别参数: {key}")
+            setattr(self, key, value)
+
+    def __repr__(self):
+        return f"OcrOptions({self.__dict__!r})"
+
+
+# 已警告过模型回退的 (模型根目录, 语言)，避免每页、每个任务重复记录
+_FALLBACK_WARNED = set()
+
+
+def get_model_dirs(base_path=None, lang=DEFAULT_LANG):
+    """返回某语言各模型目录的绝对路径"""
+    base_path = base_path or get_base_path()
+    subdirs = LANG_MODEL_SUBDIRS.get(lang, MODEL_SUBDIRS)
+    return {key: os.path.join(base_path, sub) for key, sub in subdirs.items()}
+
+
+def check_model_dirs(model_dirs):
+    """检查模型文件是否齐全，缺失时抛出FileNotFoundError"""
+    for key in ('det', 'rec', 'cls'):
+        if not os.path.exists(os.path.join(model_dirs[key], 'inference.pdiparams')):
+            raise FileNotFoundError(f"{MODEL_NAMES[key]}文件不存在: {model_dirs[key]}")
+
+
+def resolve_model_set(base_path=None, lang=DEFAULT_LANG):
+    """
+    返回 (实际使用的语言, 模型目录)
+    不认识的语言或该语言的模型不完整时回退到中英文模型，并记录一次警告
+    """
+    if lang != DEFAULT_LANG:
+        model_dirs = get_model_dirs(base_path, lang)
+        try:
+            if lang not in LANG_MODEL_SUBDIRS:
+                raise FileNotFoundError(f"没有为语言 {lang} 配置模型")
+            check_model_dirs(model_dirs)
+            return lang, model_dirs
+        except FileNotFoundError as e:
+            key = (base_path, lang)
+            if key not in _FALLBACK_WARNED:
+                _FALLBACK_WARNED.add(key)
+                logging.warning(f"语言 {lang} 的模型不可用（{e}），改用中英文模型；"
+                                f"运行 setup_models.py 下载该语言的模型")
+    return DEFAULT_LANG, get_model_dirs(base_path, DEFAULT_LANG)
+
+
+def available_langs(base_path=None):
+    """返回模型齐全、可以使用的语言列表（中英文模型总在其中）"""
+    langs = [DEFAULT_LANG]
+    for lang in LANG_MODEL_SUBDIRS:
+        if lang == DEFAULT_LANG:
+            continue
+        try:
+            check_model_dirs(get_model_dirs(base_path, lang))
+            langs.append(lang)
+        except FileNotFoundError:
+            pass
+    return langs
+
+
+def build_ocr_engine(base_path=None, options=None):
+    """
+    构建PaddleOCR引擎，按 options.lang 选择模型组
+    失败时直接抛出异常，由调用方决定如何提示（GUI弹窗或命令行日志）
+    """
+    options = options or OcrOptions()
+    lang, model_dirs = resolve_model_set(base_path or options.model_root, options.lang)
+
+    logging.info(f"检测模型路径: {model_dirs['det']}")
+    logging.info(f"识别模型路径: {model_dirs['rec']}")
+    logging.info(f"分类模型路径: {model_dirs['cls']}")
+
+    check_model_dirs(model_dirs)
+
+    engine_kwargs = dict(
+        use_angle_cls=options.use_angle_cls,
+        lang=lang,
+        det_model_dir=model_dirs['det'],
+        rec_model_dir=model_dirs['rec'],
+        cls_model_dir=model_dirs['cls'],
+        show_log=False
+    )
+    if options.cpu_threads:
+        engine_kwargs['cpu_threads'] = options.cpu_threads
+    if options.rec_batch_num:
+        engine_kwargs['rec_batch_num'] = options.rec_batch_num
+    if options.cls_batch_num:
+        engine_kwargs['cls_batch_num'] = options.cls_batch_num
+
+    from paddleocr import PaddleOCR
+    return PaddleOCR(**engine_kwargs)
+
+
+# 页面结果结构的版本号，结构变化时递增，使旧的缓存条目失效
+RESULT_VERSION = 2
+
+# 会影响识别结果的参数，参与页面缓存键的计算
+RESULT_OPTIONS = ('zoom', 'use_angle_cls', 'lang', 'layout')
+
+
+def result_signature(options):
+    """
+    生成识别结果的“配置签名”：相关参数 + 模型目录及模型文件的大小和修改时间
+    模型升级或参数变化后签名随之改变，旧的缓存条目自然失效
+    """
+    signature = {name: getattr(options, name) for name in RESULT_OPTIONS}
+    signature['result_version'] = RESULT_VERSION
+    models = {}
+    for key, model_dir in resolve_model_set(options.model_root, options.lang)[1].items():
+        try:
+            st = os.stat(os.path.join(model_dir, 'inference.pdiparams'))
+            models[key] = [model_dir, st.st_size, st.st_mtime_ns]
+        except OSError:
+            models[key] = [model_dir, None, None]
+    signature['models'] = models
+    return json.dumps(signature, sort_keys=True)
+
+
+# 只影响整个任务（而非单页识别结果）的参数，与 RESULT_OPTIONS 一起构成任务签名
+JOB_OPTIONS = ('hybrid', 'hybrid_min_chars', 'hybrid_max_image_coverage', 'hybrid_min_text_coverage',
+               'adaptive_zoom', 'target_x_height', 'zoom_min', 'zoom_max', 'doc_orientation',
+               'tile_max_mpx', 'tile_size', 'tile_overlap', 'regions', 'skip_blank', 'blank_max_ink',
+               'dedup_pages')
+
+
+def job_signature(options):
+    """任务签名：参数变化后断点日志不再复用"""
+    signature = json.loads(result_signature(options))
+    signature.update({name: getattr(options, name) for name in JOB_OPTIONS})
+    return json.dumps(signature, sort_keys=True)
+
+
+# 页面结果中只在运行期使用、不写入断点日志和缓存的标记
+TRANSIENT_KEYS = ('cached', 'resumed', 'duplicate')
+
+
+def result_to_text(result):
+    """把PaddleOCR的返回结果拼接为纯文本"""
+    if result and result[0]:
+        return "\n".join(line[1][0] for line in result[0])
+    return ""
+
+
+def pixmap_to_array(pix):
+    """
+    把Pixmap的像素缓冲区直接包装为NumPy数组（BGR通道顺序，供PaddleOCR使用），不做压缩和解码
+    - 灰度图返回二维数组，由引擎自行扩展通道
+    - 带alpha通道时按预乘alpha合成到白色背景上
+    - 缓冲区可写时原地交换R/B通道，不额外复制整幅图像
+    返回的数组与Pixmap共享内存，使用期间必须保持Pixmap存活
+    """
+    buf = pix.samples_mv if hasattr(pix, 'samples_mv') else pix.samples
+    flat = np.frombuffer(buf, dtype=np.uint8)
+    arr = np.lib.stride_tricks.as_strided(
+        flat, shape=(pix.height, pix.width, pix.n), strides=(pix.stride, pix.n, 1),
+        writeable=flat.flags.writeable
+    )
+
+    if pix.n == 1:
+        return arr[:, :, 0]
+
+    if pix.alpha:
+        # MuPDF使用预乘alpha，合成到白色背景: c + (255 - a)
+        alpha = arr[:, :, -1:].astype(np.uint16)
+        color = arr[:, :, :-1].astype(np.uint16) + (255 - alpha)
+        arr = np.minimum(color, 255).astype(np.uint8)
+        if arr.shape[2] == 1:
+            return arr[:, :, 0]
+
+    if arr.flags.writeable:
+        red = arr[:, :, 0].copy()
+        arr[:, :, 0] = arr[:, :, 2]
+        arr[:, :, 2] = red
+        return arr
+    return np.ascontiguousarray(arr[:, :, ::-1])
+
+
+def _rect_coverage(rects, page_rect):
+    """计算矩形集合在页面上的覆盖率（按面积求和，裁剪到页面内，上限为1）"""
+    page_area = abs(page_rect)
+    if not page_area:
+        return 0.0
+    covered = sum(abs(fitz.Rect(r) & page_rect) for r in rects)
+    return min(1.0, covered / page_area)
+
+
+def extract_native_text(page, options):
+    """
+    检查页面自带的文本层，返回 (文本, 是否可直接使用)
+    判断依据: 字符数、乱码比例、文本块与图像的覆盖率
+    """
+    text = page.get_text("text").strip()
+    if len(text) < options.hybrid_min_chars:
+        return text, False
+    # 字体缺少编码映射时提取出的多为替换字符，不可用
+    if text.count('\ufffd') > len(text) * 0.1:
+        return text, False
+
+    # 文本块和图像的位置都是未旋转页面上的坐标
+    text_rects = [b[:4] for b in page.get_text("blocks") if b[6] == 0]
+    image_rects = [info['bbox'] for info in page.get_image_info()]
+    unrotated = page.rect * page.derotation_matrix
+    text_coverage = _rect_coverage(text_rects, unrotated)
+    image_coverage = _rect_coverage(image_rects, unrotated)
+    if image_coverage >= options.hybrid_max_image_coverage and text_coverage < options.hybrid_min_text_coverage:
+        return text, False
+    return text, True
+
+
+def native_lines(page, clip=None):
+    """
+    提取文本层中的文本行，box为页面坐标（pt）下的四边形，文本层没有置信度，score为None
+    给出 clip（页面坐标）时只提取该区域内的文字
+    get_text 给出的是未旋转页面上的坐标，带 /Rotate 的页面需换算到显示方向，与识别结果的坐标一致
+    """
+    if clip is not None:
+        clip = fitz.Rect(clip) * page.derotation_matrix
+    lines = []
+    for block in page.get_text("dict", clip=clip)['blocks']:
+        for line in block.get('lines', ()):
+            text = "".join(span['text'] for span in line['spans']).strip()
+            if not text:
+                continue
+            x0, y0, x1, y1 = (round(v, 2) for v in fitz.Rect(line['bbox']) * page.rotation_matrix)
+            lines.append({'box': [[x0, y0], [x1, y0], [x1, y1], [x0, y1]], 'text': text, 'score': None})
+    return lines
+
+
+def native_item(page, options, regions=None):
+    """
+    混合模式下，文本层可用时返回已完成的任务项，否则返回None
+    给出 regions（page_regions.regions_for_page 的结果）时只提取这些区域内的文字
+    """
+    if not options.hybrid:
+        return None
+    text, usable = extract_native_text(page, options)
+    if not usable:
+        return None
+    if regions is not None:
+        parts = [(name, rect, native_lines(page, rect)) for name, rect in regions]
+        return {'page': page.number, 'nbytes': 0, 'result': page_regions.region_result(page.number, 'native', parts)}
+    return {'page': page.number, 'nbytes': 0,
+            'result': {'page': page.number, 'text': text, 'source': 'native', 'lines': native_lines(page)}}
+
+
+# 拉丁字体的x高度约为字号的一半；中文字符高度更大，按此估计偏保守
+X_HEIGHT_RATIO = 0.5
+
+
+def estimate_text_size(page):
+    """
+    根据文本层估计页面上较小文字的字号（pt），没有文本层时返回None
+    取按字符数加权的第5百分位，保证脚注等小字也能被清晰渲染
+    """
+    sizes = []
+    counts = []
+    for block in page.get_text("dict")['blocks']:
+        for line in block.get('lines', ()):
+            for span in line['spans']:
+                n = len(span['text'].strip())
+                if n and span['size'] >= 3:
+                    sizes.append(span['size'])
+                    counts.append(n)
+    if not sizes:
+        return None
+    return float(np.percentile(np.repeat(sizes, counts), 5))
+
+
+def estimate_image_zoom(page):
+    """
+    根据页面中最大图像的分辨率估计缩放比例（扫描页）
+    渲染分辨率超过扫描图像本身的分辨率不会带来更多细节，返回与原始DPI对应的缩放比例
+    """
+    best = None
+    unrotated = page.rect * page.derotation_matrix
+    for info in page.get_image_info():
+        bbox = fitz.Rect(info['bbox']) & unrotated
+        if bbox.is_empty or not info['width']:
+            continue
+        if best is None or abs(bbox) > abs(best[0]):
+            best = (bbox, info['width'])
+    if best is None:
+        return None
+    bbox, width_px = best
+    dpi = width_px / (bbox.width / 72)
+    return dpi / 72
+
+
+def page_zoom(page, options):
+    """确定页面的渲染缩放比例：固定模式直接使用 zoom，自适应模式按文字大小或扫描分辨率估计"""
+    if not options.adaptive_zoom:
+        return options.zoom
+    text_size = estimate_text_size(page)
+    if text_size is not None:
+        zoom = options.target_x_height / (text_size * X_HEIGHT_RATIO)
+    else:
+        zoom = estimate_image_zoom(page) or options.zoom
+    return round(min(options.zoom_max, max(options.zoom_min, zoom)), 2)
+
+
+def render_page(page, options, zoom=None, metrics=None, rotate=0, clip=None):
+    """
+    渲染单页，返回渲染任务项
+    任务项为字典: {'page': 页码, 'image': 交给引擎的图像数据, 'zoom': 缩放比例, 'nbytes': 占用内存字节数}
+    zero_copy 为真时 image 是直接包装像素缓冲区的NumPy数组，否则为PNG字节
+    给出 metrics 时记录渲染、编码耗时和像素数
+    rotate 为渲染时额外的顺时针旋转角度，clip 为只渲染的页面区域（分块模式）；
+    两者之一给出时任务项带有 'to_page'：把像素坐标换算回页面坐标的矩阵
+    整页渲染且开启了空白页/重复页筛查时，任务项带有 'screen'：由像素计算的筛查特征（page_screen）
+    """
+    zoom = zoom or page_zoom(page, options)
+    mat = fitz.Matrix(zoom, zoom)
+    if rotate:
+        mat.prerotate(rotate)
+    start = time.perf_counter()
+    pix = page.get_pixmap(matrix=mat, alpha=False, clip=clip)
+    rendered = time.perf_counter()
+    if options.zero_copy:
+        image = pixmap_to_array(pix)
+        # 保留Pixmap引用，保证数组所指向的缓冲区在识别完成前不被释放
+        item = {'page': page.number, 'image': image, 'pixmap': pix, 'zoom': zoom, 'nbytes': image.nbytes}
+    else:
+        img_bytes = pix.tobytes("png")
+        item = {'page': page.number, 'image': img_bytes, 'zoom': zoom, 'nbytes': len(img_bytes)}
+    if rotate or clip is not None:
+        # 旋转或裁剪后像素坐标的原点是变换后区域的左上角 (pix.x, pix.y)
+        item['to_page'] = tuple(~(mat * fitz.Matrix(1, 0, 0, 1, -pix.x, -pix.y)))
+    if metrics is not None:
+        metrics.add('render', rendered - start, page.number)
+        metrics.add('encode', time.perf_counter() - rendered, page.number)
+        if clip is None:
+            metrics.set(page.number, pixels=pix.width * pix.height, zoom=zoom)
+    if clip is None and (options.skip_blank or options.dedup_pages):
+        start = time.perf_counter()
+        item['screen'] = page_screen.page_signature(pix, (page.rect.width, page.rect.height),
+                                                    full_ink=options.dedup_pages)
+        if metrics is not None:
+            metrics.add('screen', time.perf_counter() - start, page.number)
+    return item
+
+
+def prepare_page(page, options):
+    """渲染阶段的默认处理：混合模式下优先使用文本层，否则渲染页面"""
+    return native_item(page, options) or render_page(page, options)
+
+
+def result_to_lines(result, zoom, to_page=None):
+    """
+    把PaddleOCR的返回结果转换为文本行列表: [{'box': 四个角点, 'text': 文本, 'score': 置信度}, ...]
+    box 从渲染图像的像素坐标换算回页面坐标（pt）；渲染时旋转过的页面用 to_page 矩阵换算
+    换算对所有角点一次完成（见 page_columns.PageColumns.from_raw）
+    """
+    return page_columns.PageColumns.from_raw(None, result, zoom, to_page).to_lines()
+
+
+def ocr_result(item, raw, layout=False):
+    """
+    由任务项和引擎原始输出构造页面结果字典
+    layout 为真时先做版面还原（阅读顺序、合并行、分段，见 page_layout），在渲染图像的像素坐标中进行，
+    文字总是横排的，之后再换算回页面坐标
+    """
+    boxes, texts, scores = page_columns.raw_arrays(raw)
+    if layout:
+        boxes, texts, scores, rows, paragraphs = page_layout.assemble(boxes, texts, scores)
+        text = page_layout.layout_text(texts, rows, paragraphs)
+    else:
+        text = "\n".join(texts)
+    columns = page_columns.PageColumns.from_arrays(
+        item['page'], 'ocr', np.round(page_columns.to_page_coords(boxes, item['zoom'], item.get('to_page')), 2),
+        np.round(scores, 4), texts)
+    return {'page': item['page'], 'text': text, 'source': 'ocr', 'lines': columns.to_lines()}
+
+
+def ocr_item(engine, item, options, metrics=None):
+    """
+    识别一个渲染任务项，返回页面结果字典；已有结果的任务项（文本层、缓存）直接返回
+    开启 stage_timing、给出 metrics 且引擎能给出分阶段耗时时，记录该页的检测/分类/识别耗时
+    """
+    if 'result' in item:
+        return item['result']
+    if metrics is None or not options.stage_timing:
+        return ocr_result(item, engine.ocr(item['image'], cls=options.use_angle_cls), options.layout)
+    raw, stage_times = batch_recognition.ocr_image_timed(engine, item['image'], options.use_angle_cls)
+    if stage_times:
+        for stage, seconds in stage_times.items():
+            metrics.add(stage, seconds, item['page'])
+    return ocr_result(item, raw, options.layout)
+
+
+def ocr_items_batched(engine, items, options, metrics=None):
+    """跨页批量识别一组任务项，返回与之一一对应的页面结果列表；给出 metrics 时记录各页检测/分类/识别耗时"""
+    pending = [item for item in items if 'result' not in item]
+    stage_times = [] if metrics is not None else None
+    raw_results = batch_recognition.ocr_images_batched(
+        engine, [item['image'] for item in pending], options.use_angle_cls, stage_times)
+    if metrics is not None:
+        for item, times in zip(pending, stage_times):
+            for stage, seconds in times.items():
+                metrics.add(stage, seconds, item['page'])
+    recognized = {id(item): raw for item, raw in zip(pending, raw_results)}
+    results = []
+    for item in items:
+        if 'result' in item:
+            results.append(item['result'])
+        else:
+            results.append(ocr_result(item, recognized[id(item)], options.layout))
+    return results
+
+
+def use_batched_recognition(engine, options):
+    """是否启用跨页批量识别（需要引擎支持分阶段预测）"""
+    return options.batch_pages > 1 and batch_recognition.supports_batching(engine)
+
+
+def iter_item_batches(items, options, engine):
+    """
+    按批次分组任务项：开启跨页批量识别时，攒够 batch_pages 个需要识别的页面为一批，
+    否则每个任务项单独成批
+    """
+    if not use_batched_recognition(engine, options):
+        for item in items:
+            yield [item]
+        return
+
+    batch = []
+    need_ocr = 0
+    for item in items:
+        batch.append(item)
+        if 'result' not in item:
+            need_ocr += 1
+        if need_ocr >= options.batch_pages:
+            yield batch
+            batch = []
+            need_ocr = 0
+    if batch:
+        yield batch
+
+
+def detect_document_orientation(engine, pdf_path, pages, options):
+    """
+    在给定页面中抽样检测文档方向并记录判断结果，返回 (旋转角度, 置信度)
+    引擎不支持分阶段预测时返回None
+    """
+    if not batch_recognition.supports_batching(engine):
+        logging.warning("当前引擎不支持分阶段预测，跳过文档方向检测")
+        return None
+    angle, confidence, lines = doc_orientation.detect_orientation(
+        engine, pdf_path, pages, options.orientation_pages, options.orientation_zoom)
+    doc_orientation.log_decision(pdf_path, angle, confidence, lines, options.orientation_min_confidence)
+    return angle, confidence
+
+
+class OcrJob:
+    """
+    单个文档识别任务的运行期状态
+    prepare 在渲染线程中调用，finish 在识别线程中调用；各阶段耗时记录在 metrics 中
+    ocr_options 为实际识别使用的参数（文档方向确定后会关闭逐行方向分类），rotate 为渲染时的旋转角度
+    """
+
+    def __init__(self, pdf_path, options, metrics=None):
+        self.pdf_path = pdf_path
+        self.options = options
+        self.ocr_options = options
+        self.rotate = 0
+        self.metrics = metrics if metrics is not None else job_metrics.JobMetrics(pdf_path)
+        self.cache = None
+        self.cache_signature = None
+        if options.cache_dir:
+            try:
+                self.cache = page_cache.open_cache(options.cache_dir, options.cache_max_mb)
+                self.cache_signature = result_signature(options)
+            except OSError as e:
+                logging.warning(f"无法打开页面缓存目录 {options.cache_dir}，本次不使用缓存: {e}")
+                self.cache = None
+        self.duplicates = None
+        self.journal = None
+        if options.journal_dir:
+            self.journal = job_journal.open_journal(options.journal_dir, pdf_path, job_signature(options),
+                                                    fsync=options.journal_fsync)
+
+    def cache_key(self, page, zoom, tiled=False, regions=None):
+        h = hashlib.sha256()
+        h.update(page_cache.page_fingerprint(page).encode())
+        h.update(self.cache_signature.encode())
+        h.update(repr((zoom, self.rotate)).encode())
+        if tiled:
+            h.update(repr((self.options.tile_size, self.options.tile_overlap)).encode())
+        if regions is not None:
+            h.update(repr([(name, tuple(rect)) for name, rect in regions]).encode())
+        return h.hexdigest()
+
+    def detect_orientation(self, engine, pages=None):
+        """
+        抽样检测文档方向（只看尚未完成的页面）；置信度足够时记录旋转角度并关闭逐行方向分类
+        引擎不支持分阶段预测时保持原有参数
+        """
+        if pages is None:
+            pages = range(count_pages(self.pdf_path))
+        pending = [p for p in pages if self.journal is None or p not in self.journal]
+        if not pending:
+            return
+        with self.metrics.timer('orientation'):
+            decision = detect_document_orientation(engine, self.pdf_path, pending, self.options)
+        if decision is not None:
+            self.apply_orientation(*decision)
+
+    def apply_orientation(self, angle, confidence):
+        """采用已确定的文档方向：置信度足够时按该角度渲染并关闭逐行方向分类"""
+        if confidence < self.options.orientation_min_confidence:
+            return
+        self.rotate = angle
+        self.ocr_options = copy.copy(self.options)
+        self.ocr_options.use_angle_cls = False
+        if self.cache is not None:
+            self.cache_signature = result_signature(self.ocr_options)
+
+    def prepare(self, page):
+        """
+        渲染阶段：断点日志 -> 文本层 -> 缓存 -> 渲染
+        指定了区域的页面返回逐区域渲染的生成器（每个区域一个带 'region': (序号, 区域数) 的任务项），
+        超大页面返回逐块渲染的生成器（每块一个带 'tile': (序号, 块数) 的任务项），其余情况返回单个任务项
+        """
+        if self.journal is not None and page.number in self.journal:
+            result = self.journal.read_page(page.number)
+            result['resumed'] = True
+            return {'page': page.number, 'nbytes': 0, 'result': result}
+
+        regions = page_regions.regions_for_page(self.options.regions, page)
+        if self.options.hybrid:
+            with self.metrics.timer('native', page.number):
+                item = native_item(page, self.options, regions)
+            if item is not None:
+                return item
+        if regions is not None and not regions:
+            # 适用的区域全部落在页面之外
+            return {'page': page.number, 'nbytes': 0, 'result': page_regions.region_result(page.number, 'ocr', [])}
+
+        zoom = page_zoom(page, self.options)
+        tiled = regions is None and tiling.needs_tiling(page, zoom, self.options)
+        key = None
+        if self.cache is not None:
+            with self.metrics.timer('cache', page.number):
+                key = self.cache_key(page, zoom, tiled, regions)
+                cached = self.cache.get(key)
+            if cached is not None:
+                cached.update(page=page.number, cached=True)
+                return {'page': page.number, 'nbytes': 0, 'result': cached}
+
+        if regions is not None:
+            return self._render_regions(page, zoom, key, regions)
+        if tiled:
+            return self._render_tiles(page, zoom, key)
+        item = render_page(page, self.options, zoom, self.metrics, self.rotate)
+        if self.options.skip_blank and page_screen.is_blank(item['screen'], self.options.blank_max_ink):
+            # 空白页不进入识别，也不写入缓存
+            return {'page': page.number, 'nbytes': 0,
+                    'result': {'page': page.number, 'text': '', 'source': 'blank', 'lines': []}}
+        item['cache_key'] = key
+        return item
+
+    def _render_regions(self, page, zoom, key, regions):
+        """逐个渲染页面上的指定区域，只处理区域内的像素"""
+        self.metrics.set(page.number, pixels=round(sum(abs(rect) for _name, rect in regions) * zoom * zoom),
+                         zoom=zoom, regions=len(regions))
+        for index, (name, rect) in enumerate(regions):
+            item = render_page(page, self.options, zoom, self.metrics, self.rotate, rect)
+            item.update(region=(index, len(regions)), region_name=name, clip=tuple(rect), cache_key=key)
+            yield item
+
+    def _render_tiles(self, page, zoom, key):
+        """逐块渲染超大页面；生成器按需渲染，积压在队列中的只有少数几块"""
+        clips = tiling.tile_clips(page.rect, zoom, self.options.tile_size, self.options.tile_overlap)
+        self.metrics.set(page.number, pixels=round(abs(page.rect) * zoom * zoom), zoom=zoom, tiles=len(clips))
+        for index, clip in enumerate(clips):
+            item = render_page(page, self.options, zoom, self.metrics, self.rotate, clip)
+            item.update(tile=(index, len(clips)), clip=tuple(clip), cache_key=key)
+            yield item
+
+    def reuse_duplicates(self, items):
+        """
+        识别阶段：在推理之前为与已识别页面重复的任务项填入复用的结果（带 'duplicate': True）
+        只在识别线程中调用，此时之前的页面都已识别完成并登记到重复页索引
+        """
+        if not self.options.dedup_pages:
+            return
+        if self.duplicates is None:
+            self.duplicates = page_screen.shared_index(result_signature(self.ocr_options),
+                                                       self.options.dedup_max_pages)
+        for item in items:
+            if 'screen' not in item or 'result' in item:
+                continue
+            with self.metrics.timer('screen', item['page']):
+                found = self.duplicates.find(item['screen'])
+            if found is not None:
+                result, (path, page) = found
+                logging.info(f"{os.path.basename(self.pdf_path)} 第 {item['page'] + 1} 页与 "
+                             f"{os.path.basename(path)} 第 {page + 1} 页重复，复用其识别结果")
+                result.update(page=item['page'], duplicate=True)
+                item['result'] = result
+
+    def finish(self, item, result):
+        """识别阶段：保存新识别的结果，并把本页结果追加到断点日志"""
+        self.metrics.set(result['page'], source=result['source'], lines=len(result.get('lines', [])),
+                         cached=bool(result.get('cached')), resumed=bool(result.get('resumed')),
+                         duplicate=bool(result.get('duplicate')))
+        if self.duplicates is not None and 'screen' in item and not result.get('duplicate'):
+            self.duplicates.add(item['screen'],
+                                {k: v for k, v in result.items() if k != 'page' and k not in TRANSIENT_KEYS},
+                                (self.pdf_path, result['page']))
+        if item.get('cache_key') and not result.get('duplicate'):
+            self.cache.put(item['cache_key'],
+                           {k: v for k, v in result.items() if k != 'page' and k not in TRANSIENT_KEYS})
+        if self.journal is not None and not result.get('resumed'):
+            self.journal.append({k: v for k, v in result.items() if k not in TRANSIENT_KEYS})
+
+    def close(self):
+        self.metrics.finish()
+        if self.journal is not None:
+            self.journal.close()
+        if self.cache is not None:
+            stats = self.cache.stats()
+            logging.info(f"页面缓存: 命中 {stats['hits']} 次, 未命中 {stats['misses']} 次, "
+                         f"命中率 {stats['hit_rate']:.0%}")
+
+
+class _PrefetchBudget:
+    """预取内存预算：渲染阶段在队列中积压的图像总字节数不超过上限"""
+
+    def __init__(self, limit_bytes, stop_event):
+        self.limit = limit_bytes
+        self.used = 0
+        self.stop_event = stop_event
+        self.cond = threading.Condition()
+
+    def acquire(self, nbytes):
+        """占用预算，超出上限时阻塞；队列为空时总是放行，保证超大页面也能处理"""
+        with self.cond:
+            while self.used > 0 and self.used + nbytes > self.limit:
+                if self.stop_event.is_set():
+                    return False
+                self.cond.wait(0.1)
+            self.used += nbytes
+            return not self.stop_event.is_set()
+
+    def release(self, nbytes):
+        with self.cond:
+            self.used -= nbytes
+            self.cond.notify_all()
+
+
+_RENDER_DONE = object()
+
+
+def _iter_doc_pages(doc, pages):
+    """按给定页码（None表示全部页面）遍历文档"""
+    if pages is None:
+        yield from doc
+    else:
+        for pno in pages:
+            yield doc[pno]
+
+
+def _iter_prepared(prepare, page):
+    """prepare 返回单个任务项或任务项生成器（分块页面），统一按任务项逐个产出"""
+    prepared = prepare(page)
+    if isinstance(prepared, dict):
+        yield prepared
+    else:
+        yield from prepared
+
+
+def _render_worker(pdf_path, pages, prepare, out_queue, budget, stop_event):
+    """渲染线程：使用独立的fitz文档对象提前渲染页面，放入有界队列"""
+    try:
+        with fitz.open(pdf_path) as doc:
+            for page in _iter_doc_pages(doc, pages):
+                for item in _iter_prepared(prepare, page):
+                    if stop_event.is_set():
+                        return
+                    # 分块页面按块占用预算，整页的像素不会同时驻留在内存中
+                    if not budget.acquire(item['nbytes']):
+                        return
+                    out_queue.put(item)
+        out_queue.put(_RENDER_DONE)
+    except Exception as e:
+        logging.error(f"页面渲染失败: {e}", exc_info=True)
+        out_queue.put(e)
+
+
+def iter_rendered_pages(pdf_path, options, prepare=None, pages=None):
+    """
+    按页码顺序产出渲染任务项，prepare(page) 负责把页面转换为任务项或任务项生成器（默认 prepare_page）
+    pages 为要处理的页码序列（从0开始），None表示全部页面
+    prefetch_pages > 0 时在后台线程中提前渲染（生产者/消费者流水线），让渲染与识别同时进行；
+    队列深度由 prefetch_pages 限制，积压图像的内存由 prefetch_mb 限制
+    """
+    if prepare is None:
+        prepare = lambda page: prepare_page(page, options)
+
+    if options.prefetch_pages <= 0:
+        with fitz.open(pdf_path) as doc:
+            for page in _iter_doc_pages(doc, pages):
+                yield from _iter_prepared(prepare, page)
+        return
+
+    stop_event = threading.Event()
+    budget = _PrefetchBudget(int(options.prefetch_mb * 1024 * 1024), stop_event)
+    render_queue = queue.Queue(maxsize=options.prefetch_pages)
+    render_thread = threading.Thread(
+        target=_render_worker,
+        args=(pdf_path, pages, prepare, render_queue, budget, stop_event),
+        name="ocr-render",
+        daemon=True
+    )
+    render_thread.start()
+    try:
+        while True:
+            item = render_queue.get()
+            if item is _RENDER_DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            try:
+                yield item
+            finally:
+                budget.release(item['nbytes'])
+    finally:
+        stop_event.set()
+        # 清空队列，让可能阻塞在 put 上的渲染线程退出
+        while render_thread.is_alive():
+            try:
+                render_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        render_thread.join()
+
+
+def iter_ocr_pages(engine, pdf_path, options=None, pages=None, metrics=None):
+    """
+    逐页识别PDF，按页码顺序产出页面结果；pages 可指定只处理部分页码
+    每个结果为字典: {'page': 从0开始的页码, 'text': 识别文本, 'source': 文本来源, 'lines': 文本行列表}
+    lines 中每行为 {'box': 页面坐标（pt）下的四个角点, 'text': 文本, 'score': 置信度}
+    页面坐标指页面按显示方向（已应用 /Rotate）摆放时、以左上角为原点的坐标，与渲染出的图像方向一致；
+    OCR识别和文本层提取的结果都使用这一坐标系
+    source 为 'ocr'（渲染并识别）、'native'（混合模式下直接使用的文本层）或 'blank'（跳过的空白页）；
+    来自缓存的结果额外带有 'cached': True，从断点日志恢复的结果额外带有 'resumed': True，
+    复用重复页结果的额外带有 'duplicate': True
+    pages 为None时按 options.page_ranges 选择页面；指定了区域模板的页面结果额外带有 'regions'（见 page_regions）
+    调用方可随时停止迭代以取消任务；给出 metrics（job_metrics.JobMetrics）时记录分阶段耗时
+    """
+    options = options or OcrOptions()
+    if pages is None and options.page_ranges:
+        pages = selected_pages(pdf_path, options)
+    job = OcrJob(pdf_path, options, metrics)
+    try:
+        if options.doc_orientation and options.orientation_decision is not None:
+            job.apply_orientation(*options.orientation_decision)
+        elif options.doc_orientation:
+            job.detect_orientation(engine, pages)
+        batched = use_batched_recognition(engine, options)
+        items = iter_rendered_pages(pdf_path, options, job.prepare, pages)
+        tiles = tiling.TileAssembler(options.layout)
+        regions = page_regions.RegionAssembler()
+        for batch in iter_item_batches(items, options, engine):
+            job.reuse_duplicates(batch)
+            if batched:
+                results = ocr_items_batched(engine, batch, job.ocr_options, job.metrics)
+            elif 'result' in batch[0]:
+                results = [batch[0]['result']]
+            else:
+                with job.metrics.timer('ocr', batch[0]['page']):
+                    results = [ocr_item(engine, batch[0], job.ocr_options, job.metrics)]
+            for item, result in zip(batch, results):
+                if 'tile' in item or 'region' in item:
+                    # 分块、分区域识别的页面收齐所有部分后合并为整页结果
+                    assembler = tiles if 'tile' in item else regions
+                    result = assembler.add(item, result)
+                    if result is None:
+                        continue
+                job.finish(item, result)
+                yield result
+    finally:
+        job.close()
+
+
+def count_pages(pdf_path):
+    """返回PDF的页数"""
+    with fitz.open(pdf_path) as doc:
+        return len(doc)
+
+
+def selected_pages(pdf_path, options):
+    """按 options.page_ranges 返回要处理的页码列表（从0开始）"""
+    return page_regions.parse_page_ranges(options.page_ranges, count_pages(pdf_path))
+
+
+# 页面文本来源的显示名称
+SOURCE_LABELS = {
+    'ocr': 'OCR识别',
+    'native': '文本层',
+    'blank': '空白页',
+}
+
+
+def format_page_text(page_index, text, source=None):
+    """生成与界面显示一致的单页文本块；给出来源时在页眉中标注"""
+    if source:
+        return f"--- 第 {page_index+1} 页 [{SOURCE_LABELS.get(source, source)}] --- \n{text}\n\n"
+    return f"--- 第 {page_index+1} 页 --- \n{text}\n\n"
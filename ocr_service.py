@@ -0,0 +1,603 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+本机OCR服务
+常驻进程，只监听本机回环地址或Unix套接字；OCR引擎在服务启动时加载一次，之后每个请求都不再重复导入Paddle和加载模型。
+内部工具通过HTTP提交PDF、查询任务状态、逐页流式读取结果或取消任务（客户端见 ocr_client.py）。
+
+接口:
+  GET    /health                   服务状态、已加载的引擎和各状态的任务数
+  POST   /jobs                     提交任务：请求体为PDF文件（Content-Type: application/pdf，识别参数放在查询字符串中），
+                                   或JSON {"path": 本机PDF路径, "options": {...}}；返回 202 和任务状态
+  GET    /jobs                     所有任务的状态
+  GET    /jobs/<id>                任务状态
+  GET    /jobs/<id>/pages          逐页流式返回识别结果（JSON Lines，分块传输），任务结束后结束；?from=N 从第N个结果开始
+  GET    /jobs/<id>/pages/<页码>   单页结果（页码从1开始）
+  DELETE /jobs/<id>                取消任务
+
+用法示例:
+  python ocr_service.py --port 8765 -j 2
+  python ocr_service.py --unix /tmp/offlineocr.sock --preload ch,en
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import socket
+import logging
+import argparse
+import ipaddress
+import threading
+import contextlib
+import tempfile
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import ocr_core
+import job_journal
+import job_metrics
+import engine_pool
+import page_regions
+
+DEFAULT_PORT = 8765
+
+# 允许通过请求设置的识别参数: 请求中的名称 -> (OcrOptions属性, 类型)
+REQUEST_OPTIONS = {
+    'lang': ('lang', str),
+    'zoom': ('zoom', float),
+    'adaptive_zoom': ('adaptive_zoom', bool),
+    'hybrid': ('hybrid', bool),
+    'use_angle_cls': ('use_angle_cls', bool),
+    'layout': ('layout', bool),
+    'skip_blank': ('skip_blank', bool),
+    'blank_max_ink': ('blank_max_ink', float),
+    'dedup_pages': ('dedup_pages', bool),
+    'doc_orientation': ('doc_orientation', bool),
+    'batch_pages': ('batch_pages', int),
+    'tile_max_mpx': ('tile_max_mpx', float),
+    'pages': ('page_ranges', str),
+    'regions': ('regions', list),
+}
+
+# 任务的终止状态
+FINISHED_STATES = ('done', 'failed', 'cancelled')
+
+# 流式读取结果时等待新页面的最长间隔（秒），超时后重新检查任务状态
+STREAM_WAIT_SECONDS = 1.0
+
+# 上传文件读取的块大小
+UPLOAD_CHUNK = 1024 * 1024
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def request_options(values, defaults):
+    """
+    由请求中的参数构造识别参数（以服务的默认参数为基础），只接受 REQUEST_OPTIONS 中的参数
+    参数名未知或取值无效时抛出ValueError
+    """
+    options = ocr_core.OcrOptions(**vars(defaults))
+    for name, value in values.items():
+        if name not in REQUEST_OPTIONS:
+            raise ValueError(f"不支持的识别参数: {name}")
+        attr, kind = REQUEST_OPTIONS[name]
+        if name == 'regions':
+            if isinstance(value, str):
+                value = json.loads(value)
+            value = page_regions.check_regions(value)
+        elif kind is bool:
+            value = _parse_bool(value)
+        else:
+            value = kind(value)
+        setattr(options, attr, value)
+    if options.lang not in ocr_core.LANG_MODEL_SUBDIRS:
+        raise ValueError(f"不支持的语言: {options.lang}")
+    page_regions.parse_page_ranges(options.page_ranges, 0)
+    return options
+
+
+class ServiceJob:
+    """服务中的一个识别任务；状态: queued -> running -> done / failed / cancelled"""
+
+    def __init__(self, job_id, pdf_path, options, uploaded=False):
+        self.id = job_id
+        self.pdf_path = pdf_path
+        self.options = options
+        self.uploaded = uploaded
+        self.journal = job_journal.journal_path(options.journal_dir, pdf_path, ocr_core.job_signature(options))
+        self.state = 'queued'
+        # 要处理的页码（开始识别时确定）和已完成的页数
+        self.pages = None
+        self.done = 0
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_event = threading.Event()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'state': self.state,
+            'pdf': os.path.basename(self.pdf_path),
+            'pages': len(self.pages) if self.pages is not None else None,
+            'done': self.done,
+            'error': self.error,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'seconds': round((self.finished or time.time()) - self.started, 3) if self.started else None,
+        }
+
+
+class OcrService:
+    """
+    任务表 + 识别线程
+    每个识别线程持有自己的引擎池（engine_pool.EnginePool），线程之间不共享引擎实例（PaddleOCR的预测器不是线程安全的）；
+    页面结果写入断点日志，状态查询和流式读取都从日志中按需读取，内存占用与文档长度无关
+    """
+
+    def __init__(self, state_dir, base_path=None, workers=1, engine_mb=1024, defaults=None,
+                 engine_factory=None, retention_seconds=3600):
+        self.state_dir = os.path.abspath(state_dir)
+        self.upload_dir = os.path.join(self.state_dir, 'uploads')
+        self.base_path = base_path
+        self.workers = max(1, workers)
+        self.engine_mb = engine_mb
+        self.engine_factory = engine_factory
+        self.retention_seconds = retention_seconds
+        self.defaults = defaults or ocr_core.OcrOptions()
+        self.defaults.journal_dir = os.path.join(self.state_dir, 'jobs')
+        # 日志在这里是结果存储而不是崩溃恢复手段，逐页fsync没有必要
+        self.defaults.journal_fsync = False
+        self._jobs = {}
+        self._next_id = 1
+        self._changed = threading.Condition()
+        self._queue = queue.Queue()
+        self._pools = []
+        self._threads = []
+
+    def start(self, preload=()):
+        """启动识别线程；preload 为需要预先加载引擎的语言列表"""
+        os.makedirs(self.upload_dir, exist_ok=True)
+        os.makedirs(self.defaults.journal_dir, exist_ok=True)
+        for index in range(self.workers):
+            pool = engine_pool.EnginePool(self.base_path, self.engine_mb, self.engine_factory)
+            for lang in preload:
+                options = ocr_core.OcrOptions(**vars(self.defaults))
+                options.lang = lang
+                pool.warmup(options)
+            thread = threading.Thread(target=self._worker, args=(pool,), name=f"ocr-service-{index}", daemon=True)
+            thread.start()
+            self._pools.append(pool)
+            self._threads.append(thread)
+
+    def shutdown(self):
+        """取消所有未完成的任务并等待识别线程退出"""
+        with self._changed:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancel_event.set()
+        for _thread in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    # --- 任务表 ---
+
+    def new_upload_path(self):
+        fd, path = tempfile.mkstemp(suffix='.pdf', dir=self.upload_dir)
+        os.close(fd)
+        return path
+
+    def submit(self, pdf_path, options, uploaded=False):
+        """登记任务并放入识别队列，返回任务"""
+        self._purge()
+        with self._changed:
+            job = ServiceJob(str(self._next_id), pdf_path, options, uploaded)
+            self._next_id += 1
+            self._jobs[job.id] = job
+        self._queue.put(job)
+        logging.info(f"任务 {job.id} 已提交: {pdf_path}")
+        return job
+
+    def get(self, job_id):
+        with self._changed:
+            return self._jobs.get(job_id)
+
+    def status(self, job):
+        with self._changed:
+            return job.to_dict()
+
+    def list(self):
+        with self._changed:
+            return [job.to_dict() for job in self._jobs.values()]
+
+    def counts(self):
+        counts = {}
+        with self._changed:
+            for job in self._jobs.values():
+                counts[job.state] = counts.get(job.state, 0) + 1
+        return counts
+
+    def engine_stats(self):
+        return [pool.stats() for pool in self._pools]
+
+    def cancel(self, job):
+        """取消任务：排队中的任务直接标记为已取消，正在识别的任务在当前页完成后停止"""
+        job.cancel_event.set()
+        with self._changed:
+            if job.state == 'queued':
+                self._set_finished(job, 'cancelled')
+
+    def _set_finished(self, job, state, error=None):
+        """调用方持有 self._changed"""
+        job.state = state
+        job.error = error
+        job.finished = time.time()
+        self._changed.notify_all()
+
+    def _purge(self):
+        """清理超过保留时间的已结束任务：删除上传的文件和不再被其他任务使用的断点日志"""
+        now = time.time()
+        with self._changed:
+            expired = [job for job in self._jobs.values()
+                       if job.state in FINISHED_STATES and now - job.finished > self.retention_seconds]
+            for job in expired:
+                del self._jobs[job.id]
+            in_use = {job.journal for job in self._jobs.values()}
+        for job in expired:
+            paths = [job.pdf_path] if job.uploaded else []
+            if job.journal not in in_use:
+                paths.append(job.journal)
+            for path in paths:
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+
+    # --- 识别线程 ---
+
+    def _worker(self, pool):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._changed:
+                if job.state != 'queued':
+                    continue
+                job.state = 'running'
+                job.started = time.time()
+                self._changed.notify_all()
+            try:
+                self._run(job, pool)
+            except Exception as e:
+                logging.error(f"任务 {job.id} 失败: {e}", exc_info=True)
+                with self._changed:
+                    self._set_finished(job, 'failed', str(e))
+
+    def _run(self, job, pool):
+        pages = ocr_core.selected_pages(job.pdf_path, job.options)
+        with self._changed:
+            job.pages = pages
+            self._changed.notify_all()
+        metrics = job_metrics.JobMetrics(job.pdf_path)
+        with pool.engine(job.options) as engine, \
+                contextlib.closing(ocr_core.iter_ocr_pages(engine, job.pdf_path, job.options, pages,
+                                                           metrics)) as results:
+            for _result in results:
+                with self._changed:
+                    job.done += 1
+                    self._changed.notify_all()
+                if job.cancel_event.is_set():
+                    break
+        job_metrics.log_summary(metrics)
+        with self._changed:
+            cancelled = job.cancel_event.is_set() and job.done < len(pages)
+            self._set_finished(job, 'cancelled' if cancelled else 'done')
+        logging.info(f"任务 {job.id} {'已取消' if cancelled else '完成'}: {job.done}/{len(pages)} 页")
+
+    # --- 结果读取 ---
+
+    def iter_results(self, job, start=0):
+        """
+        按页码顺序产出任务的页面结果（从第 start 个结果开始），任务结束（状态已更新）后结束
+        结果来自断点日志，正在识别的任务每完成一页就能读到
+        """
+        reader = job_journal.JournalReader(job.journal)
+        try:
+            index = start
+            while True:
+                with self._changed:
+                    pages = job.pages
+                    done = job.done
+                    finished = job.state in FINISHED_STATES
+                # 页面先写入日志再计入 done，先取状态再读日志就不会漏掉结束前的最后几页
+                if pages is not None:
+                    reader.refresh()
+                    while index < len(pages):
+                        result = reader.read_page(pages[index])
+                        if result is None:
+                            break
+                        yield result
+                        index += 1
+                if finished:
+                    return
+                with self._changed:
+                    if job.done == done and job.pages is pages and job.state not in FINISHED_STATES:
+                        self._changed.wait(STREAM_WAIT_SECONDS)
+        finally:
+            reader.close()
+
+    def read_page(self, job, page):
+        """读取任务中某一页（从0开始）的结果，尚未识别时返回None"""
+        reader = job_journal.JournalReader(job.journal)
+        try:
+            return reader.read_page(page)
+        finally:
+            reader.close()
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """HTTP请求处理；service 由服务器对象提供"""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'OfflineOCR'
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def address_string(self):
+        # Unix套接字没有客户端地址
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        logging.debug(f"{self.address_string()} {format % args}")
+
+    def _send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        self._send_json(status, {'error': message})
+
+    def _route(self):
+        """解析路径，返回 (路径片段列表, 查询参数)"""
+        url = urlsplit(self.path)
+        parts = [p for p in url.path.split('/') if p]
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        return parts, query
+
+    def _job(self, job_id):
+        job = self.service.get(job_id)
+        if job is None:
+            self._send_error(404, f"任务不存在: {job_id}")
+        return job
+
+    def _discard_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        while length > 0:
+            chunk = self.rfile.read(min(length, UPLOAD_CHUNK))
+            if not chunk:
+                break
+            length -= len(chunk)
+
+    def do_GET(self):
+        parts, query = self._route()
+        if parts == ['health']:
+            self._send_json(200, {'status': 'ok', 'jobs': self.service.counts(),
+                                  'engines': self.service.engine_stats()})
+        elif parts == ['jobs']:
+            self._send_json(200, {'jobs': self.service.list()})
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            job = self._job(parts[1])
+            if job is not None:
+                self._send_json(200, self.service.status(job))
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'pages':
+            start = query.get('from', '0')
+            if not start.isdigit():
+                self._send_error(400, f"from 必须是非负整数: {start}")
+                return
+            job = self._job(parts[1])
+            if job is not None:
+                self._stream_pages(job, int(start))
+        elif len(parts) == 4 and parts[0] == 'jobs' and parts[2] == 'pages' and parts[3].isdigit():
+            job = self._job(parts[1])
+            if job is None:
+                return
+            result = self.service.read_page(job, int(parts[3]) - 1)
+            if result is None:
+                self._send_error(404, f"第 {parts[3]} 页尚未识别")
+            else:
+                self._send_json(200, result)
+        else:
+            self._send_error(404, f"未知的路径: {self.path}")
+
+    def _stream_pages(self, job, start):
+        """以分块传输逐行写出页面结果（JSON Lines），客户端可边识别边读取"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for result in self.service.iter_results(job, start):
+                line = json.dumps(result, ensure_ascii=False).encode('utf-8') + b'\n'
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+                self.wfile.flush()
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def do_POST(self):
+        parts, query = self._route()
+        if parts != ['jobs']:
+            self._discard_body()
+            self._send_error(404, f"未知的路径: {self.path}")
+            return
+        content_type = (self.headers.get('Content-Type') or '').split(';')[0].strip().lower()
+        try:
+            if content_type == 'application/json':
+                length = int(self.headers.get('Content-Length') or 0)
+                request = json.loads(self.rfile.read(length) or b'{}')
+                pdf_path = request.get('path')
+                if not pdf_path or not os.path.isfile(pdf_path):
+                    raise ValueError(f"文件不存在: {pdf_path}")
+                options = request_options(dict(request.get('options') or {}, **query), self.service.defaults)
+                job = self.service.submit(os.path.abspath(pdf_path), options)
+            else:
+                options = request_options(query, self.service.defaults)
+                path = self._receive_upload()
+                try:
+                    job = self.service.submit(path, options, uploaded=True)
+                except Exception:
+                    os.remove(path)
+                    raise
+        except (ValueError, TypeError, OSError) as e:
+            # 请求体可能没有读完，不能在同一连接上继续处理下一个请求
+            self.close_connection = True
+            self._send_error(400, str(e))
+            return
+        self._send_json(202, self.service.status(job))
+
+    def _receive_upload(self):
+        """把请求体中的PDF保存到上传目录，返回文件路径"""
+        length = self.headers.get('Content-Length')
+        if length is None:
+            raise ValueError("上传PDF时需要 Content-Length")
+        length = int(length)
+        path = self.service.new_upload_path()
+        with open(path, 'wb') as f:
+            remaining = length
+            while remaining > 0:
+                chunk = self.rfile.read(min(remaining, UPLOAD_CHUNK))
+                if not chunk:
+                    break
+                f.write(chunk)
+                remaining -= len(chunk)
+        if remaining or not length:
+            os.remove(path)
+            raise ValueError("上传的PDF不完整")
+        return path
+
+    def do_DELETE(self):
+        parts, _query = self._route()
+        if len(parts) != 2 or parts[0] != 'jobs':
+            self._send_error(404, f"未知的路径: {self.path}")
+            return
+        job = self._job(parts[1])
+        if job is not None:
+            self.service.cancel(job)
+            self._send_json(200, self.service.status(job))
+
+
+class LocalHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class LocalHTTP6Server(LocalHTTPServer):
+    address_family = socket.AF_INET6
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def check_loopback(host):
+    """服务只允许监听本机回环地址"""
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+    except socket.gaierror as e:
+        raise ValueError(f"无法解析监听地址 {host}: {e}") from None
+    if not all(ipaddress.ip_address(addr.split('%')[0]).is_loopback for addr in addresses):
+        raise ValueError(f"只能监听本机回环地址（如 127.0.0.1），不能监听: {host}")
+
+
+def make_server(service, host='127.0.0.1', port=DEFAULT_PORT, unix_socket=None):
+    """创建HTTP服务器（回环地址或Unix套接字），service 通过服务器对象传给请求处理器"""
+    if unix_socket:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(unix_socket)
+        # 套接字文件在 bind() 时按umask创建，先收紧umask，文件从一开始就只有当前用户可以访问
+        umask = os.umask(0o177)
+        try:
+            server = UnixHTTPServer(unix_socket, ServiceHandler)
+        finally:
+            os.umask(umask)
+    else:
+        check_loopback(host)
+        server_class = LocalHTTP6Server if ':' in host else LocalHTTPServer
+        server = server_class((host, port), ServiceHandler)
+    server.service = service
+    return server
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="离线PDF-OCR本机服务")
+    parser.add_argument('--host', default='127.0.0.1', help="监听地址（只允许回环地址）")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="监听端口")
+    parser.add_argument('--unix', help="改为监听该Unix套接字文件（仅类Unix系统）")
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help="识别线程数，每个线程持有自己的引擎（默认1）")
+    parser.add_argument('--cpu-threads', type=int,
+                        help="每个引擎的推理线程数（默认按CPU核数/识别线程数分配）")
+    parser.add_argument('--engine-mb', type=float, default=1024,
+                        help="每个识别线程的引擎池内存预算（MB），超出后卸载最久未使用的语言")
+    parser.add_argument('--preload', default=ocr_core.DEFAULT_LANG,
+                        help="启动时预先加载的语言，多个用逗号分隔（默认 ch）")
+    parser.add_argument('--state-dir', default='ocr_service_state',
+                        help="上传文件和结果日志目录")
+    parser.add_argument('--cache-dir', help="页面结果缓存目录")
+    parser.add_argument('--retention', type=float, default=3600,
+                        help="已结束的任务保留多少秒（之后删除其上传文件和结果）")
+    return parser
+
+
+def main(argv=None):
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - [%(threadName)s] %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    args = build_arg_parser().parse_args(argv)
+
+    workers = max(1, args.workers)
+    defaults = ocr_core.OcrOptions(
+        cpu_threads=args.cpu_threads or max(1, (os.cpu_count() or 1) // workers),
+        cache_dir=args.cache_dir,
+    )
+    service = OcrService(args.state_dir, workers=workers, engine_mb=args.engine_mb, defaults=defaults,
+                         retention_seconds=args.retention)
+    try:
+        server = make_server(service, args.host, args.port, args.unix)
+    except (OSError, ValueError) as e:
+        logging.error(f"无法启动服务: {e}")
+        return 2
+    preload = [lang.strip() for lang in args.preload.split(',') if lang.strip()]
+    service.start(preload)
+    logging.info(f"OCR服务已启动: {args.unix or f'http://{args.host}:{args.port}'}（{workers} 个识别线程）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("服务停止")
+    finally:
+        server.server_close()
+        service.shutdown()
+        if args.unix:
+            with contextlib.suppress(OSError):
+                os.remove(args.unix)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
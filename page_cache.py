@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+"""
+页面识别结果的磁盘缓存
+以页面内容哈希 + 影响识别结果的参数作为键，每个条目保存为一个JSON文件；
+总大小超过上限时按最近使用时间（文件mtime）淘汰最久未使用的条目
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+# 每个进程内按目录复用缓存对象，避免每个文档都重新扫描缓存目录
+_OPEN_CACHES = {}
+_OPEN_CACHES_LOCK = threading.Lock()
+
+
+def page_fingerprint(page):
+    """
+    计算页面内容的哈希，不需要渲染页面
+    覆盖页面尺寸/旋转、内容流、引用的图像和表单XObject的原始数据以及字体对象
+    """
+    doc = page.parent
+    h = hashlib.sha256()
+    h.update(repr((tuple(page.rect), page.rotation)).encode())
+    h.update(page.read_contents())
+    xrefs = set()
+    for img in page.get_images(full=True):
+        xrefs.add(img[0])
+    for xobj in page.get_xobjects():
+        xrefs.add(xobj[0])
+    for xref in sorted(xrefs):
+        h.update(doc.xref_stream_raw(xref) or b'')
+    for font in page.get_fonts(full=True):
+        h.update(doc.xref_object(font[0], compressed=True).encode())
+    return h.hexdigest()
+
+
+class PageCache:
+    """
+    大小受限的LRU磁盘缓存，线程安全
+    多个进程可以共用同一个缓存目录，各自维护索引，淘汰时容忍文件已被其他进程删除
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.total_bytes = 0
+        self._lock = threading.Lock()
+        # key -> 文件大小，按最近使用时间从旧到新排列
+        self._index = OrderedDict()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.json')
+
+    def _load_index(self):
+        entries = []
+        for root, _dirs, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    st = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, name[:-5], st.st_size))
+        for _mtime, key, size in sorted(entries):
+            self._index[key] = size
+            self.total_bytes += size
+        logging.info(f"页面缓存已加载: {self.cache_dir} ({len(self._index)} 条, "
+                     f"{self.total_bytes / 1024 / 1024:.1f} MB)")
+
+    def get(self, key):
+        """读取缓存条目，未命中返回None"""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+                size = self._index.pop(key, None)
+                if size is not None:
+                    self.total_bytes -= size
+            return None
+        with self._lock:
+            self.hits += 1
+            if key in self._index:
+                self._index.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """写入缓存条目（先写临时文件再替换，保证条目完整），必要时淘汰旧条目"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(value, ensure_ascii=False).encode('utf-8')
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"写入页面缓存失败: {e}")
+            return
+        with self._lock:
+            old_size = self._index.pop(key, None)
+            if old_size is not None:
+                self.total_bytes -= old_size
+            self._index[key] = len(data)
+            self.total_bytes += len(data)
+            self._evict()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self._index) > 1:
+            key, size = self._index.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def stats(self):
+        """返回命中统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._index),
+                'bytes': self.total_bytes,
+            }
+
+
+def open_cache(cache_dir, max_mb):
+    """获取（或创建）指定目录的缓存对象，同一进程内复用"""
+    key = os.path.abspath(cache_dir)
+    with _OPEN_CACHES_LOCK:
+        cache = _OPEN_CACHES.get(key)
+        if cache is None:
+            cache = PageCache(key, int(max_mb * 1024 * 1024))
+            _OPEN_CACHES[key] = cache
+        return cache
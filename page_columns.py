@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+
+"""
+页面结果的列式表示
+一页的文本行不再是成百上千个嵌套的小列表和字典，而是几个连续的NumPy数组：
+  boxes   - float32 (n, 4, 2)，页面坐标（pt，页面显示方向、左上角为原点）下的四个角点
+  scores  - float32 (n,)，置信度，文本层提取的行为NaN
+  offsets - uint32 (n+1,)，第i行文本为 blob[offsets[i]:offsets[i+1]]
+  blob    - 所有文本行的UTF-8编码首尾相接
+版面分析、检索高亮、可搜索PDF文字层等只需要坐标的处理可以直接对数组运算。
+
+列式结果文件（.ocrc）是只追加的二进制文件：文件头之后每页一条记录，
+记录头给出页码、行数和文本长度，随后依次是上述四个数组（按8字节对齐）。
+读取时整个文件以内存映射方式打开，数组是映射区上的视图，不复制数据；
+只扫描记录头即可建立 页码 -> 偏移 的索引，末尾写了一半的记录会被忽略。
+"""
+
+import os
+import struct
+
+import numpy as np
+
+FILE_MAGIC = b'OCRCOL1\n'
+RECORD_MAGIC = b'OCRP'
+# 记录头: 标识, 页码, 行数, 文本字节数, 文本来源
+RECORD_HEADER = struct.Struct('<4siii8s')
+
+
+def _align(n, alignment=8):
+    return (n + alignment - 1) // alignment * alignment
+
+
+def _record_size(count, blob_len):
+    return RECORD_HEADER.size + _align(count * 36 + (count + 1) * 4 + blob_len)
+
+
+class PageColumns:
+    """一页结果的列式表示，数组可以是普通数组，也可以是内存映射上的只读视图"""
+
+    __slots__ = ('page', 'source', 'boxes', 'scores', 'offsets', 'blob')
+
+    def __init__(self, page, source, boxes, scores, offsets, blob):
+        self.page = page
+        self.source = source
+        self.boxes = boxes
+        self.scores = scores
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.scores)
+
+    def text(self, i):
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+    @property
+    def texts(self):
+        blob = bytes(self.blob)
+        offsets = self.offsets.tolist()
+        return [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(self))]
+
+    def rects(self):
+        """各行的外接矩形 (n, 4): x0, y0, x1, y1"""
+        if not len(self):
+            return np.zeros((0, 4), dtype=np.float32)
+        return np.concatenate([self.boxes.min(axis=1), self.boxes.max(axis=1)], axis=1)
+
+    @classmethod
+    def from_arrays(cls, page, source, boxes, scores, texts):
+        encoded = [t.encode('utf-8') for t in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.uint32)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return cls(page, source, np.asarray(boxes, dtype=np.float32).reshape(-1, 4, 2),
+                   np.asarray(scores, dtype=np.float32).reshape(-1), offsets, b''.join(encoded))
+
+    @classmethod
+    def from_lines(cls, page, source, lines):
+        """由文本行列表（[{'box', 'text', 'score'}, ...]）构造"""
+        scores = [np.nan if line.get('score') is None else line['score'] for line in lines]
+        return cls.from_arrays(page, source, [line['box'] for line in lines], scores,
+                               [line['text'] for line in lines])
+
+    @classmethod
+    def from_result(cls, result):
+        return cls.from_lines(result['page'], result['source'], result.get('lines', []))
+
+    @classmethod
+    def from_raw(cls, page, raw, zoom, to_page=None):
+        """由PaddleOCR的原始输出构造，角点换算为页面坐标（见 to_page_coords）"""
+        boxes, texts, scores = raw_arrays(raw)
+        return cls.from_arrays(page, 'ocr', np.round(to_page_coords(boxes, zoom, to_page), 2),
+                               np.round(scores, 4), texts)
+
+    def to_lines(self):
+        """还原为文本行列表（与断点日志、jsonl输出中的格式相同）"""
+        boxes = np.round(self.boxes.astype(np.float64), 2).tolist()
+        scores = [None if s != s else round(s, 4) for s in self.scores.tolist()]
+        return [{'box': box, 'text': text, 'score': score}
+                for box, text, score in zip(boxes, self.texts, scores)]
+
+    def to_bytes(self):
+        """序列化为一条记录"""
+        body = b''.join([self.boxes.astype('<f4', copy=False).tobytes(),
+                         self.scores.astype('<f4', copy=False).tobytes(),
+                         self.offsets.astype('<u4', copy=False).tobytes(),
+                         bytes(self.blob)])
+        header = RECORD_HEADER.pack(RECORD_MAGIC, self.page, len(self), len(self.blob),
+                                    self.source.encode('ascii'))
+        return header + body + b'\0' * (_align(len(body)) - len(body))
+
+    @classmethod
+    def from_buffer(cls, buf, offset):
+        """从缓冲区（通常是内存映射）的某个偏移读取一条记录，数组为缓冲区上的视图"""
+        magic, page, count, blob_len, source = RECORD_HEADER.unpack_from(buf, offset)
+        if magic != RECORD_MAGIC:
+            raise ValueError(f"列式结果记录损坏（偏移 {offset}）")
+        pos = offset + RECORD_HEADER.size
+        boxes = np.frombuffer(buf, dtype='<f4', count=count * 8, offset=pos).reshape(count, 4, 2)
+        pos += count * 32
+        scores = np.frombuffer(buf, dtype='<f4', count=count, offset=pos)
+        pos += count * 4
+        offsets = np.frombuffer(buf, dtype='<u4', count=count + 1, offset=pos)
+        pos += (count + 1) * 4
+        return cls(page, source.rstrip(b'\0').decode('ascii'), boxes, scores, offsets,
+                   buf[pos:pos + blob_len])
+
+
+def raw_arrays(raw):
+    """把PaddleOCR的原始输出拆成 (角点数组 (n, 4, 2)，文本列表，置信度数组)，坐标为渲染图像的像素坐标"""
+    entries = raw[0] if raw and raw[0] else []
+    boxes = np.array([box for box, _ in entries], dtype=np.float64).reshape(-1, 4, 2)
+    scores = np.array([score for _, (_, score) in entries], dtype=np.float64)
+    return boxes, [text for _, (text, _) in entries], scores
+
+
+def to_page_coords(boxes, zoom, to_page=None):
+    """
+    把像素坐标下的角点一次换算为页面坐标：除以缩放比例，
+    或者对渲染时旋转/裁剪过的页面乘以 to_page 矩阵 (a, b, c, d, e, f)
+    """
+    if to_page:
+        a, b, c, d, e, f = to_page
+        return boxes @ np.array([[a, b], [c, d]]) + np.array([e, f])
+    return boxes / zoom
+
+
+def write_header(f):
+    f.write(FILE_MAGIC)
+
+
+def write_page(f, columns):
+    f.write(columns.to_bytes())
+
+
+class ColumnReader:
+    """
+    以内存映射方式读取列式结果文件
+    refresh() 索引其他线程或进程新追加的记录（文件变大时重新映射）
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._offsets = {}
+        self._end = len(FILE_MAGIC)
+        self._map = None
+        self.refresh()
+
+    def refresh(self):
+        """索引新追加的记录，返回新增的页数"""
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if size < len(FILE_MAGIC) or (self._map is not None and size == len(self._map)):
+            return 0
+        self._map = np.memmap(self.path, dtype=np.uint8, mode='r')
+        if bytes(self._map[:len(FILE_MAGIC)]) != FILE_MAGIC:
+            raise ValueError(f"不是列式结果文件: {self.path}")
+        before = len(self._offsets)
+        while self._end + RECORD_HEADER.size <= size:
+            magic, page, count, blob_len, _ = RECORD_HEADER.unpack_from(self._map, self._end)
+            record_end = self._end + _record_size(count, blob_len)
+            if magic != RECORD_MAGIC or record_end > size:
+                break
+            self._offsets[page] = self._end
+            self._end = record_end
+        return len(self._offsets) - before
+
+    @property
+    def pages(self):
+        """已记录的页码（升序）"""
+        return sorted(self._offsets)
+
+    def read_page(self, page):
+        """读取某一页，不存在时返回None；返回的数组是只读的内存映射视图"""
+        offset = self._offsets.get(page)
+        if offset is None:
+            return None
+        return PageColumns.from_buffer(self._map, offset)
+
+    def close(self):
+        self._map = None
+        self._offsets = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+"""
+页码范围与区域识别
+只需要部分页面（如第10~40页）或页面上固定位置的内容（页眉、表单字段）时，
+只渲染并识别选中页面上的指定区域，其余像素完全不处理。
+
+区域模板为JSON文件，内容是区域列表（或 {"regions": [...]}），每个区域:
+    {"name": "编号", "rect": [x0, y0, x1, y1], "pages": "1"}
+    {"name": "页眉", "ratio": [0, 0, 1, 0.12]}
+- rect 为页面坐标（pt，以页面显示方向的左上角为原点），ratio 为相对页面宽高的比例（适合尺寸不一的扫描件）
+- pages 为该区域适用的页码范围（语法同 parse_page_ranges），省略时适用于所有页面；
+  不同页面可使用不同的区域组合（逐页模板）
+- 没有任何区域适用的页面按整页识别
+"""
+
+import json
+import functools
+
+import fitz
+
+
+def parse_page_ranges(spec, page_count):
+    """
+    解析页码范围（从1开始，闭区间），返回从0开始的页码列表（升序、去重）
+    语法: "1-3,10-40"、"5"、"50-"（到最后一页）、"-3"（从第一页起）；空字符串表示全部页面
+    超出文档页数的部分被忽略，格式错误时抛出ValueError
+    """
+    if spec is None or not str(spec).strip():
+        return list(range(page_count))
+    pages = set()
+    for part in str(spec).replace('，', ',').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            if '-' in part:
+                first, last = (p.strip() for p in part.split('-', 1))
+                first = int(first) if first else 1
+                # 开放的结尾不受文档页数影响（校验时 page_count 为0），超出部分在下面忽略
+                last = int(last) if last else max(first, page_count)
+            else:
+                first = last = int(part)
+        except ValueError:
+            raise ValueError(f"无法识别的页码范围: {part}") from None
+        if first < 1 or last < first:
+            raise ValueError(f"无效的页码范围: {part}")
+        pages.update(range(first - 1, min(last, page_count)))
+    return sorted(pages)
+
+
+def load_regions(path):
+    """读取区域模板文件，检查格式后返回区域列表（可直接作为 OcrOptions.regions）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return check_regions(data)
+
+
+def check_regions(data):
+    """检查区域列表的格式，返回规范化后的列表；格式错误时抛出ValueError"""
+    if isinstance(data, dict):
+        data = data.get('regions')
+    if not isinstance(data, list):
+        raise ValueError("区域模板应为区域列表或 {\"regions\": [...]}")
+    regions = []
+    names = set()
+    for index, region in enumerate(data):
+        if not isinstance(region, dict):
+            raise ValueError(f"第 {index + 1} 个区域格式错误")
+        name = str(region.get('name') or f"区域{index + 1}")
+        units = [key for key in ('rect', 'ratio') if key in region]
+        if len(units) != 1:
+            raise ValueError(f"区域 {name} 需要且只能给出 rect 或 ratio 之一")
+        coords = region[units[0]]
+        if not isinstance(coords, (list, tuple)) or len(coords) != 4:
+            raise ValueError(f"区域 {name} 的坐标应为 [x0, y0, x1, y1]")
+        coords = [float(v) for v in coords]
+        if coords[2] <= coords[0] or coords[3] <= coords[1]:
+            raise ValueError(f"区域 {name} 的坐标为空矩形")
+        pages = region.get('pages')
+        if pages is not None:
+            pages = str(pages)
+            parse_page_ranges(pages, 1)
+        if (name, pages) in names:
+            raise ValueError(f"区域名称重复: {name}")
+        names.add((name, pages))
+        regions.append({'name': name, units[0]: coords, 'pages': pages})
+    return regions
+
+
+@functools.lru_cache(maxsize=256)
+def _page_set(spec, page_count):
+    return frozenset(parse_page_ranges(spec, page_count))
+
+
+def _applies_to(region, page_number, page_count):
+    if region['pages'] is None:
+        return True
+    return page_number in _page_set(region['pages'], page_count)
+
+
+def regions_for_page(regions, page):
+    """
+    返回该页适用的区域 [(名称, 页面坐标下的fitz.Rect), ...]；没有区域适用时返回None
+    区域裁剪到页面范围内，完全落在页面之外的区域被去掉
+    """
+    if not regions:
+        return None
+    page_count = page.parent.page_count
+    matched = [r for r in regions if _applies_to(r, page.number, page_count)]
+    if not matched:
+        return None
+    page_rect = page.rect
+    result = []
+    for region in matched:
+        if 'ratio' in region:
+            x0, y0, x1, y1 = region['ratio']
+            rect = fitz.Rect(page_rect.x0 + x0 * page_rect.width, page_rect.y0 + y0 * page_rect.height,
+                             page_rect.x0 + x1 * page_rect.width, page_rect.y0 + y1 * page_rect.height)
+        else:
+            rect = fitz.Rect(region['rect'])
+        rect &= page_rect
+        if not rect.is_empty:
+            result.append((region['name'], rect))
+    return result
+
+
+def region_result(page_number, source, parts):
+    """
+    由各区域的识别结果构造页面结果，parts 为 [(名称, 区域矩形, 文本行列表), ...]
+    页面结果额外带有 'regions': [{'name', 'rect', 'text'}, ...]，text 按区域分段并以区域名开头
+    """
+    regions = []
+    lines = []
+    for name, rect, region_lines in parts:
+        text = "\n".join(line['text'] for line in region_lines)
+        regions.append({'name': name, 'rect': [round(v, 2) for v in fitz.Rect(rect)], 'text': text})
+        lines.extend(region_lines)
+    text = "\n".join(f"[{region['name']}]\n{region['text']}" if region['text'] else f"[{region['name']}]"
+                     for region in regions)
+    return {'page': page_number, 'text': text, 'source': source, 'lines': lines, 'regions': regions}
+
+
+class RegionAssembler:
+    """在识别阶段收集同一页各区域的结果，收齐后合并为整页结果"""
+
+    def __init__(self):
+        self._parts = {}
+
+    def add(self, item, result):
+        """加入一个区域的结果；该页的最后一个区域到达时返回页面结果，否则返回None"""
+        index, count = item['region']
+        parts = self._parts.setdefault(item['page'], [None] * count)
+        parts[index] = (item['region_name'], item['clip'], result.get('lines', []))
+        if any(part is None for part in parts):
+            return None
+        del self._parts[item['page']]
+        return region_result(item['page'], 'ocr', parts)
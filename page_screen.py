@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+
+"""
+识别前的页面筛查：空白页与重复页
+扫描批次中常夹着空白分隔页、重复的封面和内容完全相同的信笺页，逐页识别会把它们都送进整套模型。
+渲染完成后，把像素按约 BLOCK_PT 见方的格子取最小值（最深的像素）缩小成筛查网格，再做两项检查：
+  空白页 - 网格中的墨迹（明显比纸色深的格子）去掉孤立的噪点后折算成面积（平方pt），低于阈值时跳过识别，
+           结果为空文本；页边内的墨迹只按较低的权重计入（扫描仪阴影、装订孔），但不会被忽略
+  重复页 - 感知哈希（差值哈希，dHash）相近、页面尺寸相同的候选页面，再用识别分辨率下的墨迹分布
+           逐像素核对（允许1像素偏移），几乎一致时直接复用之前识别的结果；
+           同一进程中识别过的页面（包括其他文档）都参与比较
+取最小值而不是按步长抽样，细笔画、小字号的单行文字不会在缩小时丢失；面积阈值与页面大小无关。
+重复页在识别分辨率下核对，表单、票据上个别字符的差异也会被区分出来；
+扫描件重新扫描得到的“重复页”通常有超过1像素的错位，不会被当作重复页（宁可重新识别，不错用结果）。
+"""
+
+import zlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# 筛查网格每格的边长（pt），与渲染的缩放比例无关
+BLOCK_PT = 2.0
+# 页边比例（扫描仪阴影、装订孔等）；页边内的墨迹按 BORDER_WEIGHT 的权重计入
+BORDER = 0.05
+BORDER_WEIGHT = 0.5
+# 比纸色深这么多灰度级的像素视为墨迹
+INK_CONTRAST = 64
+# 纸色取灰度直方图的这一分位
+PAPER_PERCENTILE = 0.9
+# 差值哈希的网格边长（HASH_SIZE × HASH_SIZE 位）
+HASH_SIZE = 16
+# 哈希候选的最大汉明距离
+HASH_MAX_BITS = 24
+# 墨迹分布核对（识别分辨率）：允许1像素偏移后仍不一致的墨迹像素，总数不超过两页墨迹像素数的这一比例，
+# 且任一 DIFF_BLOCK × DIFF_BLOCK 的方块内不超过 DIFF_BLOCK_MAX 个（扫描噪声是零散的，改动的文字是成片的）
+INK_MAX_DIFF = 0.01
+DIFF_BLOCK = 8
+DIFF_BLOCK_MAX = 4
+# 页面尺寸（pt）的容许误差
+SIZE_TOLERANCE = 1.0
+
+# 每个进程内按识别参数签名共享重复页索引，批量识别时跨文档复用结果
+_SHARED_INDEXES = {}
+_SHARED_LOCK = threading.Lock()
+
+
+class PageSignature:
+    """
+    一页的筛查特征：页面尺寸、墨迹面积（平方pt）、差值哈希，
+    以及识别分辨率下的墨迹分布（按位压缩后再用zlib压缩，只在需要查重时计算）和它的形状
+    """
+
+    __slots__ = ('size', 'ink', 'hash', 'ink_map', 'shape')
+
+    def __init__(self, size, ink, hash_bits, ink_map=None, shape=None):
+        self.size = size
+        self.ink = ink
+        self.hash = hash_bits
+        self.ink_map = ink_map
+        self.shape = shape
+
+
+def _pixels(pix):
+    """PyMuPDF Pixmap 的像素视图 (h, w, n)，不复制"""
+    arr = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.stride)
+    return arr[:, :pix.width * pix.n].reshape(pix.height, pix.width, pix.n)
+
+
+def _luminance(arr):
+    """近似亮度 (R + 2G + B) / 4，灰度图直接返回"""
+    if arr.shape[2] == 1:
+        return arr[:, :, 0]
+    arr = arr[:, :, :3].astype(np.uint16)
+    return ((arr[:, :, 0] + 2 * arr[:, :, 1] + arr[:, :, 2]) >> 2).astype(np.uint8)
+
+
+def _min_pool(arr, block, axis):
+    """沿某一轴每 block 个取最小值（末尾不足 block 个的也成一格），每次只遍历一遍数据"""
+    index = [slice(None)] * arr.ndim
+    index[axis] = slice(0, None, block)
+    out = arr[tuple(index)].copy()
+    for offset in range(1, block):
+        index[axis] = slice(offset, None, block)
+        part = arr[tuple(index)]
+        target = [slice(None)] * arr.ndim
+        target[axis] = slice(0, part.shape[axis])
+        np.minimum(out[tuple(target)], part, out=out[tuple(target)])
+    return out
+
+
+def pooled_gray(pix, block):
+    """把像素按 block × block 的格子取各通道的最小值后换算为灰度 (行, 列)，细笔画不会因缩小而丢失"""
+    return _luminance(_min_pool(_min_pool(_pixels(pix), block, 0), block, 1))
+
+
+def _ink(gray):
+    counts = np.cumsum(np.bincount(gray.ravel(), minlength=256))
+    paper = int(np.searchsorted(counts, PAPER_PERCENTILE * counts[-1]))
+    return gray < paper - INK_CONTRAST
+
+
+def _block_means(values, rows, cols):
+    """把二维数组按近似等分的网格求块均值 (rows, cols)"""
+    h, w = values.shape
+    row_edges = (np.arange(rows) * h) // rows
+    col_edges = (np.arange(cols) * w) // cols
+    sums = np.add.reduceat(np.add.reduceat(values.astype(np.float32), row_edges, axis=0), col_edges, axis=1)
+    counts = np.outer(np.diff(np.append(row_edges, h)), np.diff(np.append(col_edges, w)))
+    return sums / counts
+
+
+def _neighbours(mask):
+    """八邻域内是否有其他为真的格子（不含自身）"""
+    out = np.zeros_like(mask)
+    h, w = mask.shape
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            if dy or dx:
+                out[max(dy, 0):h + min(dy, 0), max(dx, 0):w + min(dx, 0)] |= \
+                    mask[max(-dy, 0):h + min(-dy, 0), max(-dx, 0):w + min(-dx, 0)]
+    return out
+
+
+def ink_area(ink, block_pt):
+    """
+    墨迹面积（平方pt）：去掉孤立的墨迹格（灰尘、噪点）后计数，页边内的格子按 BORDER_WEIGHT 计入
+    block_pt 为每格的边长（pt）
+    """
+    ink = ink & _neighbours(ink)
+    h, w = ink.shape
+    bh, bw = int(h * BORDER), int(w * BORDER)
+    total = int(np.count_nonzero(ink))
+    inner = int(np.count_nonzero(ink[bh:h - bh, bw:w - bw]))
+    return (inner + BORDER_WEIGHT * (total - inner)) * block_pt * block_pt
+
+
+def page_signature(pix, page_size, full_ink=False):
+    """
+    由渲染得到的Pixmap计算筛查特征；page_size 为页面尺寸 (宽, 高)，单位pt
+    full_ink 为真时另外保存识别分辨率下的墨迹分布，供查重时逐像素核对
+    """
+    # 渲染时可能额外旋转过，用面积比求缩放比例
+    zoom = (pix.width * pix.height / (page_size[0] * page_size[1])) ** 0.5
+    block = max(1, int(round(BLOCK_PT * zoom)))
+    ink = _ink(pooled_gray(pix, block))
+    # 哈希取自墨迹分布而不是灰度：大片空白处的灰度差值只是噪声，墨迹分布不受其影响
+    blocks = _block_means(ink, HASH_SIZE, HASH_SIZE + 1)
+    hash_bits = np.packbits(blocks[:, 1:] > blocks[:, :-1])
+    signature = PageSignature(tuple(page_size), ink_area(ink, block / zoom), hash_bits)
+    if full_ink:
+        full = _ink(_luminance(_pixels(pix)))
+        signature.ink_map = zlib.compress(np.packbits(full).tobytes(), 1)
+        signature.shape = full.shape
+    return signature
+
+
+def is_blank(signature, max_ink):
+    """墨迹面积低于 max_ink（平方pt）的页面视为空白页"""
+    return signature.ink < max_ink
+
+
+def _dilate(mask):
+    """3×3 膨胀（允许1像素偏移）"""
+    return mask | _neighbours(mask)
+
+
+def _unpack(signature):
+    size = signature.shape[0] * signature.shape[1]
+    bits = np.frombuffer(zlib.decompress(signature.ink_map), dtype=np.uint8)
+    return np.unpackbits(bits, count=size).reshape(signature.shape).astype(bool)
+
+
+def _same_ink(a, b):
+    """在识别分辨率下逐像素核对两页的墨迹分布：互相不被对方（膨胀后）覆盖的墨迹像素足够少"""
+    if a.ink_map is None or b.ink_map is None or a.shape != b.shape:
+        return False
+    ink_a = _unpack(a)
+    ink_b = _unpack(b)
+    diff = (ink_a & ~_dilate(ink_b)) | (ink_b & ~_dilate(ink_a))
+    if np.count_nonzero(diff) > INK_MAX_DIFF * (np.count_nonzero(ink_a) + np.count_nonzero(ink_b)):
+        return False
+    rows = np.arange(0, a.shape[0], DIFF_BLOCK)
+    cols = np.arange(0, a.shape[1], DIFF_BLOCK)
+    block_diff = np.add.reduceat(np.add.reduceat(diff.astype(np.int32), rows, axis=0), cols, axis=1)
+    return block_diff.max() <= DIFF_BLOCK_MAX
+
+
+class DuplicateIndex:
+    """
+    已识别页面的特征索引，按最近使用保留 max_entries 页，线程安全
+    查找时一次计算与所有已存页面哈希的汉明距离，只对候选页做墨迹核对
+    """
+
+    def __init__(self, max_entries=500):
+        self.max_entries = max_entries
+        self.hits = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._next_id = 0
+
+    def find(self, signature):
+        """返回 (与之重复的页面结果（副本）, 该页面登记时给出的来源)，没有时返回None"""
+        with self._lock:
+            if not self._entries:
+                return None
+            keys = list(self._entries)
+            hashes = np.stack([self._entries[k][0].hash for k in keys])
+            distances = np.unpackbits(hashes ^ signature.hash, axis=1).sum(axis=1)
+            for i in np.argsort(distances, kind='stable')[:8].tolist():
+                if distances[i] > HASH_MAX_BITS:
+                    break
+                other, result, origin = self._entries[keys[i]]
+                if (max(abs(a - b) for a, b in zip(other.size, signature.size)) <= SIZE_TOLERANCE
+                        and _same_ink(other, signature)):
+                    self._entries.move_to_end(keys[i])
+                    self.hits += 1
+                    return dict(result), origin
+        return None
+
+    def add(self, signature, result, origin=None):
+        """登记已识别的页面；origin 为该页面的来源（如 (文档路径, 页码)），查找到重复时一并返回"""
+        with self._lock:
+            self._entries[self._next_id] = (signature, result, origin)
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def shared_index(signature, max_entries=500):
+    """返回本进程内该识别参数签名对应的重复页索引"""
+    with _SHARED_LOCK:
+        index = _SHARED_INDEXES.get(signature)
+        if index is None:
+            index = _SHARED_INDEXES[signature] = DuplicateIndex(max_entries)
+        return index
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+
+"""
+流式结果输出
+每识别完一页就写出一页，不在内存中累积全文；输出先写入 .part 临时文件，全部完成后再改名，
+中途失败不会留下不完整的结果文件。
+
+支持的格式:
+  txt   - 纯文本，与界面显示一致
+  jsonl - 每行一页的JSON，包含文本行的坐标（页面坐标，pt，页面显示方向、左上角为原点）和置信度
+  md    - Markdown，每页一个二级标题
+  pdf   - 可搜索PDF：在原始页面上按文本行坐标叠加不可见文字层，逐页增量保存
+  ocrc  - 列式结果：文本行坐标和置信度保存为连续数组，可内存映射读取（见 page_columns）
+另外，参数中给出 index_path 时每页结果同时写入全文检索索引（见 search_index）。
+"""
+
+import os
+import json
+import shutil
+import sqlite3
+import logging
+
+import fitz
+
+import ocr_core
+import page_columns
+import search_index
+
+
+class ResultWriter:
+    """结果输出的基类：子类实现 write_page，可选实现 begin/end"""
+
+    extension = None
+    suffix = None
+    # 是否以二进制方式写出
+    binary = False
+
+    def __init__(self, path, options=None, pdf_path=None):
+        self.path = path
+        self.options = options or ocr_core.OcrOptions()
+        self.tmp_path = path + '.part'
+        self.pages = 0
+        if self.binary:
+            self.f = open(self.tmp_path, 'wb')
+        else:
+            self.f = open(self.tmp_path, 'w', encoding='utf-8', newline='\n')
+        self.begin()
+
+    def begin(self):
+        pass
+
+    def end(self):
+        pass
+
+    def write_page(self, result):
+        raise NotImplementedError
+
+    def write(self, result):
+        self.write_page(result)
+        self.pages += 1
+
+    def close(self):
+        """正常结束：写出结尾并把临时文件改名为正式文件"""
+        if self.f is None:
+            return
+        self.end()
+        self.f.close()
+        self.f = None
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        """异常结束：删除临时文件"""
+        if self.f is None:
+            return
+        self.f.close()
+        self.f = None
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class TextWriter(ResultWriter):
+    extension = 'txt'
+    suffix = '.txt'
+
+    def write_page(self, result):
+        source = result['source'] if self.options.hybrid or result['source'] == 'blank' else None
+        self.f.write(ocr_core.format_page_text(result['page'], result['text'], source))
+
+
+class JsonlWriter(ResultWriter):
+    extension = 'jsonl'
+    suffix = '.jsonl'
+
+    def write_page(self, result):
+        record = {
+            'page': result['page'] + 1,
+            'source': result['source'],
+            'text': result['text'],
+            'lines': result.get('lines', []),
+        }
+        if 'regions' in result:
+            record['regions'] = result['regions']
+        self.f.write(json.dumps(record, ensure_ascii=False))
+        self.f.write('\n')
+
+
+class MarkdownWriter(ResultWriter):
+    extension = 'md'
+    suffix = '.md'
+
+    def begin(self):
+        title = os.path.splitext(os.path.basename(self.path))[0]
+        self.f.write(f"# {title}\n\n")
+
+    def write_page(self, result):
+        self.f.write(f"## 第 {result['page'] + 1} 页\n\n")
+        text = result['text'].strip()
+        if text:
+            # Markdown中单个换行不会分行，行尾加两个空格保留原有的行结构
+            self.f.write("  \n".join(text.splitlines()))
+            self.f.write("\n\n")
+
+
+class ColumnarWriter(ResultWriter):
+    extension = 'ocrc'
+    suffix = '.ocrc'
+    binary = True
+
+    def begin(self):
+        page_columns.write_header(self.f)
+
+    def write_page(self, result):
+        page_columns.write_page(self.f, page_columns.PageColumns.from_result(result))
+
+
+class SearchablePdfWriter(ResultWriter):
+    """
+    可搜索PDF输出
+    复制原始PDF后在每页上按文本行的页面坐标写入不可见文字（render_mode=3），
+    每写完 pdf_save_pages 页做一次增量保存，已写入的页面不必常驻内存，写出与识别同时进行
+    文本层页面本身已可搜索，直接跳过
+    """
+
+    extension = 'pdf'
+    suffix = '.ocr.pdf'
+
+    def __init__(self, path, options=None, pdf_path=None):
+        if not pdf_path:
+            raise ValueError("输出可搜索PDF需要提供原始PDF路径")
+        self.path = path
+        self.options = options or ocr_core.OcrOptions()
+        self.tmp_path = path + '.part'
+        self.pages = 0
+        self.unsaved_pages = 0
+        self._fonts = {}
+        shutil.copyfile(pdf_path, self.tmp_path)
+        self.doc = fitz.open(self.tmp_path)
+        # 损坏修复过或加密的文档无法增量保存，只能在结束时完整保存一次
+        self.incremental = self.doc.can_save_incrementally()
+
+    def _font(self, text):
+        """纯拉丁字符使用内置Helvetica，含中日韩等字符时使用CJK字体（仅在需要时嵌入）"""
+        name = 'helv' if all(ord(c) < 256 for c in text) else 'cjk'
+        if name not in self._fonts:
+            self._fonts[name] = fitz.Font(name)
+        return self._fonts[name]
+
+    def _insert_line(self, page, rect, text):
+        """
+        按文本行的外接矩形（页面坐标，即页面显示方向下的坐标）写入一行不可见文字
+        TextWriter 在未旋转的页面上定位，带 /Rotate 的页面先把基线起点换算到未旋转页面，
+        再按页面旋转角度转动文字，使其在显示方向上仍是横排并与文本框重合
+        """
+        text = text.strip()
+        rect = fitz.Rect(rect)
+        if not text or rect.is_empty:
+            return
+        font = self._font(text)
+        # 字号使字体的上下高度正好填满文本框，再水平缩放使宽度对齐
+        fontsize = rect.height / (font.ascender - font.descender)
+        width = font.text_length(text, fontsize=fontsize)
+        if width <= 0:
+            return
+        origin = fitz.Point(rect.x0, rect.y1 + font.descender * fontsize) * page.derotation_matrix
+        writer = fitz.TextWriter(page.rect)
+        writer.append(origin, text, font=font, fontsize=fontsize)
+        writer.write_text(page, render_mode=3,
+                          morph=(origin, fitz.Matrix(rect.width / width, 1) * fitz.Matrix(page.rotation)))
+
+    def write_page(self, result):
+        if result['source'] == 'native' or not result.get('lines'):
+            return
+        page = self.doc[result['page']]
+        columns = page_columns.PageColumns.from_result(result)
+        for rect, text in zip(columns.rects().tolist(), columns.texts):
+            self._insert_line(page, rect, text)
+        self.unsaved_pages += 1
+        if self.incremental and self.unsaved_pages >= self.options.pdf_save_pages:
+            self.doc.saveIncr()
+            self.unsaved_pages = 0
+
+    def close(self):
+        if self.doc is None:
+            return
+        if self.incremental:
+            if self.unsaved_pages:
+                self.doc.saveIncr()
+            self.doc.close()
+        else:
+            full_path = self.tmp_path + '.full'
+            self.doc.save(full_path, garbage=1, deflate=True)
+            self.doc.close()
+            os.replace(full_path, self.tmp_path)
+        self.doc = None
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        if self.doc is None:
+            return
+        self.doc.close()
+        self.doc = None
+        for path in (self.tmp_path, self.tmp_path + '.full'):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+WRITERS = {cls.extension: cls for cls in (TextWriter, JsonlWriter, MarkdownWriter, SearchablePdfWriter, ColumnarWriter)}
+
+
+def output_paths(base_path, formats):
+    """返回各输出格式对应的文件路径（base_path 不含扩展名）"""
+    return [base_path + WRITERS[fmt].suffix for fmt in formats]
+
+
+class MultiWriter:
+    """把每页结果同时写入多个输出"""
+
+    def __init__(self, writers):
+        self.writers = writers
+
+    @property
+    def pages(self):
+        return self.writers[0].pages if self.writers else 0
+
+    def write(self, result):
+        for writer in self.writers:
+            writer.write(result)
+
+    def close(self):
+        for writer in self.writers:
+            writer.close()
+
+    def abort(self):
+        for writer in self.writers:
+            writer.abort()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def open_writers(base_path, formats, options=None, pdf_path=None):
+    """
+    按格式列表打开输出（base_path 不含扩展名），返回 MultiWriter
+    pdf_path 为原始PDF路径，输出可搜索PDF或写入全文检索索引时必须提供
+    """
+    writers = []
+    try:
+        for fmt in formats:
+            if fmt not in WRITERS:
+                raise ValueError(f"不支持的输出格式: {fmt}")
+            cls = WRITERS[fmt]
+            writers.append(cls(base_path + cls.suffix, options, pdf_path))
+    except BaseException:
+        for writer in writers:
+            writer.abort()
+        raise
+    if options is not None and options.index_path:
+        try:
+            writers.append(search_index.SearchIndexWriter(options.index_path, pdf_path))
+        except sqlite3.Error as e:
+            logging.warning(f"无法打开全文检索索引 {options.index_path}，本次不写入索引: {e}")
+    return MultiWriter(writers)
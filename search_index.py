@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+全文检索索引（SQLite FTS5）
+识别完成的每一页都写入本地索引：文档路径、页码、来源、全文以及各文本行的坐标。
+随识别逐页更新（结果输出的一部分，见 result_writers），可跨成千上万份扫描件检索，返回带高亮片段的匹配页面。
+
+分词使用FTS5的trigram分词器，中文没有空格也能按任意子串匹配；
+FTS5无法索引少于3个字的检索词（中文常见的双字词），这类检索词改为在候选页面的文本中直接查找。
+
+用法示例:
+  python search_index.py query "合同编号 2023" --db index.db
+  python search_index.py query 发票 --path-prefix D:\\scans\\2024 --json
+  python search_index.py stats --db index.db
+"""
+
+import os
+import sys
+import json
+import time
+import shlex
+import sqlite3
+import logging
+import argparse
+
+# FTS5 trigram 分词器能索引的最短检索词
+MIN_FTS_TERM = 3
+# 高亮片段中匹配位置前后保留的字符数
+SNIPPET_CONTEXT = 30
+# 检索结果的默认条数
+DEFAULT_LIMIT = 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER,
+    mtime_ns INTEGER,
+    indexed REAL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    doc_id INTEGER NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+    page INTEGER NOT NULL,
+    source TEXT,
+    text TEXT NOT NULL,
+    lines TEXT NOT NULL,
+    UNIQUE (doc_id, page)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(
+    text, content='pages', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS pages_ai AFTER INSERT ON pages BEGIN
+    INSERT INTO pages_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS pages_ad AFTER DELETE ON pages BEGIN
+    INSERT INTO pages_fts (pages_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+
+def _fts_phrase(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def split_query(query):
+    """把检索式拆分为检索词（空格分隔，双引号括起的部分作为一个词），所有词都需出现在同一页中"""
+    try:
+        terms = shlex.split(query)
+    except ValueError:
+        terms = query.split()
+    return [term for term in terms if term.strip()]
+
+
+def make_snippet(text, terms, start_mark='[', end_mark=']', context=SNIPPET_CONTEXT):
+    """截取第一个匹配位置附近的文字，并用标记括起其中所有检索词（不区分大小写）"""
+    flat = " ".join(text.split())
+    lower = flat.lower()
+    lowered = [t.lower() for t in terms]
+    hits = [lower.find(t) for t in lowered if t]
+    hits = [h for h in hits if h >= 0]
+    first = min(hits) if hits else 0
+    begin = max(0, first - context)
+    end = min(len(flat), first + context * 2)
+    window = flat[begin:end]
+    lower_window = lower[begin:end]
+    marked = []
+    pos = 0
+    while pos < len(window):
+        match = max((t for t in lowered if t and lower_window.startswith(t, pos)), key=len, default=None)
+        if match:
+            marked.append(start_mark + window[pos:pos + len(match)] + end_mark)
+            pos += len(match)
+        else:
+            marked.append(window[pos])
+            pos += 1
+    return ("…" if begin > 0 else "") + "".join(marked) + ("…" if end < len(flat) else "")
+
+
+class SearchIndex:
+    """
+    全文检索索引，可被多个进程同时写入（WAL模式，写入时等待锁）
+    文档按路径登记；文件大小或修改时间变化后，旧的页面在重新索引时被清除
+    """
+
+    def __init__(self, path, timeout=30):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=timeout)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+
+    def begin_document(self, pdf_path):
+        """登记（或重新登记）文档，返回文档ID；文件已变化时清除旧的页面"""
+        path = os.path.abspath(pdf_path)
+        try:
+            st = os.stat(path)
+            version = (st.st_size, st.st_mtime_ns)
+        except OSError:
+            version = (None, None)
+        with self.conn:
+            row = self.conn.execute("SELECT id, size, mtime_ns FROM documents WHERE path = ?", (path,)).fetchone()
+            if row is None:
+                return self.conn.execute(
+                    "INSERT INTO documents (path, size, mtime_ns, indexed) VALUES (?, ?, ?, ?)",
+                    (path, version[0], version[1], time.time())).lastrowid
+            if (row['size'], row['mtime_ns']) != version:
+                self.conn.execute("DELETE FROM pages WHERE doc_id = ?", (row['id'],))
+                self.conn.execute("UPDATE documents SET size = ?, mtime_ns = ?, indexed = ? WHERE id = ?",
+                                  (version[0], version[1], time.time(), row['id']))
+            return row['id']
+
+    def add_page(self, doc_id, result):
+        """写入（或替换）一页的结果并立即提交，识别过程中就可以检索到"""
+        lines = [{'box': line['box'], 'text': line['text']} for line in result.get('lines', [])]
+        with self.conn:
+            self.conn.execute("DELETE FROM pages WHERE doc_id = ? AND page = ?", (doc_id, result['page']))
+            self.conn.execute(
+                "INSERT INTO pages (doc_id, page, source, text, lines) VALUES (?, ?, ?, ?, ?)",
+                (doc_id, result['page'], result.get('source'), result['text'],
+                 json.dumps(lines, ensure_ascii=False)))
+            self.conn.execute("UPDATE documents SET indexed = ? WHERE id = ?", (time.time(), doc_id))
+
+    def remove_document(self, pdf_path):
+        """从索引中删除文档，返回是否存在"""
+        with self.conn:
+            return self.conn.execute("DELETE FROM documents WHERE path = ?",
+                                     (os.path.abspath(pdf_path),)).rowcount > 0
+
+    def search(self, query, limit=DEFAULT_LIMIT, path_prefix=None, start_mark='[', end_mark=']'):
+        """
+        检索包含所有检索词的页面，返回结果列表，每项为:
+        {'path': 文档路径, 'page': 页码（从1开始）, 'source': 文本来源, 'snippet': 高亮片段,
+         'boxes': 包含检索词的文本行坐标（页面坐标，pt）}
+        3个字及以上的检索词走FTS索引并按相关度排序；只有更短的检索词时按文档和页码顺序返回
+        """
+        terms = split_query(query)
+        if not terms:
+            return []
+        long_terms = [t for t in terms if len(t) >= MIN_FTS_TERM]
+        short_terms = [t for t in terms if len(t) < MIN_FTS_TERM]
+
+        where = []
+        params = []
+        if long_terms:
+            sql = ("SELECT documents.path, pages.page, pages.source, pages.text, pages.lines "
+                   "FROM pages_fts JOIN pages ON pages.id = pages_fts.rowid "
+                   "JOIN documents ON documents.id = pages.doc_id")
+            where.append("pages_fts MATCH ?")
+            params.append(" AND ".join(_fts_phrase(t) for t in long_terms))
+            order = "ORDER BY bm25(pages_fts)"
+        else:
+            sql = ("SELECT documents.path, pages.page, pages.source, pages.text, pages.lines "
+                   "FROM pages JOIN documents ON documents.id = pages.doc_id")
+            order = "ORDER BY documents.path, pages.page"
+        for term in short_terms:
+            where.append("instr(lower(pages.text), ?) > 0")
+            params.append(term.lower())
+        if path_prefix:
+            where.append("substr(documents.path, 1, ?) = ?")
+            prefix = os.path.abspath(path_prefix)
+            if os.path.isdir(prefix):
+                prefix = os.path.join(prefix, '')
+            params.extend([len(prefix), prefix])
+        sql += " WHERE " + " AND ".join(where) + f" {order} LIMIT ?"
+        params.append(limit)
+
+        results = []
+        lowered = [t.lower() for t in terms]
+        for row in self.conn.execute(sql, params):
+            boxes = [line['box'] for line in json.loads(row['lines'])
+                     if any(t in line['text'].lower() for t in lowered)]
+            results.append({
+                'path': row['path'],
+                'page': row['page'] + 1,
+                'source': row['source'],
+                'snippet': make_snippet(row['text'], terms, start_mark, end_mark),
+                'boxes': boxes,
+            })
+        return results
+
+    def stats(self):
+        row = self.conn.execute("SELECT (SELECT COUNT(*) FROM documents) AS documents, "
+                                "(SELECT COUNT(*) FROM pages) AS pages").fetchone()
+        return {'documents': row['documents'], 'pages': row['pages'],
+                'bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0}
+
+    def close(self):
+        self.conn.close()
+
+
+class SearchIndexWriter:
+    """
+    把页面结果逐页写入检索索引的输出（与 result_writers 中的输出接口相同）
+    中途失败时保留已写入的页面：它们都是有效的识别结果，重新识别时会被覆盖；
+    索引写入失败只记录警告，不中断识别任务
+    """
+
+    def __init__(self, index_path, pdf_path):
+        self.index = SearchIndex(index_path)
+        self.doc_id = self.index.begin_document(pdf_path)
+        self.pages = 0
+
+    def write(self, result):
+        try:
+            self.index.add_page(self.doc_id, result)
+        except sqlite3.Error as e:
+            logging.warning(f"第 {result['page'] + 1} 页写入全文检索索引失败: {e}")
+        self.pages += 1
+
+    def close(self):
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+
+    abort = close
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="离线PDF-OCR全文检索")
+    parser.add_argument('--db', default='index.db', help="索引数据库路径（默认 index.db）")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    query = commands.add_parser('query', help="检索")
+    query.add_argument('query', help="检索词，多个词用空格分隔（需同时出现），含空格的词用双引号括起")
+    query.add_argument('-n', '--limit', type=int, default=DEFAULT_LIMIT, help="最多返回的结果数")
+    query.add_argument('--path-prefix', help="只检索该目录下的文档")
+    query.add_argument('--json', action='store_true', help="以JSON Lines输出（包含文本行坐标）")
+
+    commands.add_parser('stats', help="索引统计")
+    remove = commands.add_parser('remove', help="从索引中删除文档")
+    remove.add_argument('pdf', nargs='+')
+    return parser
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = build_arg_parser().parse_args(argv)
+    if args.command != 'remove' and not os.path.exists(args.db):
+        logging.error(f"索引不存在: {args.db}")
+        return 1
+    try:
+        index = SearchIndex(args.db)
+    except sqlite3.Error as e:
+        logging.error(f"无法打开索引 {args.db}: {e}")
+        return 1
+    try:
+        if args.command == 'query':
+            results = index.search(args.query, args.limit, args.path_prefix)
+            for result in results:
+                if args.json:
+                    print(json.dumps(result, ensure_ascii=False))
+                else:
+                    print(f"{result['path']}  第 {result['page']} 页\n    {result['snippet']}")
+            if not args.json:
+                print(f"共 {len(results)} 条结果")
+        elif args.command == 'stats':
+            stats = index.stats()
+            print(f"文档 {stats['documents']} 个，页面 {stats['pages']} 页，"
+                  f"索引大小 {stats['bytes'] / 1024 / 1024:.1f} MB")
+        else:
+            for pdf in args.pdf:
+                if not index.remove_document(pdf):
+                    logging.warning(f"索引中没有该文档: {pdf}")
+    finally:
+        index.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -83,7 +83,7 @@ setup(
     author='EPIBoly',
     
     # 关键改动：明确告诉 setuptools 我们的项目只是一个单独的模块
-    py_modules=['main'],
+    py_modules=['main', 'ocr_core', 'batch_ocr', 'watch_folder', 'ocr_service', 'ocr_client', 'page_cache', 'batch_recognition', 'doc_orientation', 'engine_pool', 'job_journal', 'job_metrics', 'result_writers', 'tiling', 'page_regions', 'search_index', 'page_columns', 'page_layout', 'page_screen'],
 
     options={
         'py2exe': {
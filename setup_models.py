@@ -105,6 +105,8 @@ def copy_models():
             model_mapping = {
                 "PP-OCRv5_server_det": ("det", "ch", "ch_PP-OCRv4_det_infer"),
                 "PP-OCRv5_server_rec": ("rec", "ch", "ch_PP-OCRv4_rec_infer"),
+                # 英文识别模型（lang='en'），不同版本的PaddleOCR下载的模型名不同
+                ("en_PP-OCRv5_mobile_rec", "en_PP-OCRv4_mobile_rec"): ("rec", "en", "en_PP-OCRv4_rec_infer"),
                 "PP-LCNet_x1_0_textline_ori": ("cls", "", "ch_ppocr_mobile_v2.0_cls_infer")
             }
         else:
@@ -119,10 +121,12 @@ def copy_models():
         if "official_models" in source_model_dir:
             # 处理 PaddleX 结构并重新组织为旧结构
             for model_name, (target_subdir, sub_subdir, final_subdir) in model_mapping.items():
+                candidates = model_name if isinstance(model_name, tuple) else (model_name,)
+                model_name = candidates[0]
                 # 在 official_models 中查找匹配的模型目录
-                for item in os.listdir(source_model_dir):
+                for item in sorted(os.listdir(source_model_dir)):
                     item_path = os.path.join(source_model_dir, item)
-                    if os.path.isdir(item_path) and model_name in item:
+                    if os.path.isdir(item_path) and any(name in item for name in candidates):
                         # 创建目标目录结构
                         target_subdir_path = os.path.join(target_model_dir, target_subdir)
                         os.makedirs(target_subdir_path, exist_ok=True)
@@ -182,6 +186,9 @@ def verify_models():
             "rec/ch/ch_PP-OCRv4_rec_infer", 
             "cls/ch_ppocr_mobile_v2.0_cls_infer"
         ]
+        optional_paths = [
+            "rec/en/en_PP-OCRv4_rec_infer"
+        ]
         
         for path in required_paths:
             full_path = os.path.join(model_dir, path)
@@ -189,6 +196,14 @@ def verify_models():
                 print(f"✗ 缺少必需的模型目录: {full_path}")
                 return False
             print(f"✓ 找到模型目录: {full_path}")
+        
+        # 英文识别模型是可选的，缺失时“英文”选项不可用
+        for path in optional_paths:
+            full_path = os.path.join(model_dir, path)
+            if os.path.exists(full_path):
+                print(f"✓ 找到模型目录: {full_path}")
+            else:
+                print(f"! 缺少可选的模型目录: {full_path}（“英文”识别语言将不可用）")
             
         print("\n✓ 模型文件验证通过，符合旧结构!")
         return True
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+# 项目模块位于仓库根目录（平铺的顶层模块）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
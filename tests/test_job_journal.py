@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+
+import job_journal
+
+
+def test_finished_journal_is_removed(tmp_path):
+    path = str(tmp_path / 'job.jsonl')
+    journal = job_journal.JobJournal(path, header={'pdf': 'a.pdf'})
+    journal.append({'page': 0, 'text': '第一页'})
+    journal.close()
+    assert not job_journal.is_finished(path)
+
+    job_journal.mark_finished(path)
+    assert job_journal.is_finished(path)
+    # 完成记录没有页码，不影响读取页面结果
+    reader = job_journal.JournalReader(path)
+    assert reader.pages == [0]
+    assert reader.read_page(0)['text'] == '第一页'
+    reader.close()
+
+    unfinished = str(tmp_path / 'other.jsonl')
+    job_journal.JobJournal(unfinished).close()
+    assert job_journal.remove_finished(str(tmp_path)) == 1
+    assert not (tmp_path / 'job.jsonl').exists()
+    assert (tmp_path / 'other.jsonl').exists()
+
+
+def test_reopened_journal_is_no_longer_finished(tmp_path):
+    path = str(tmp_path / 'job.jsonl')
+    job_journal.JobJournal(path).close()
+    job_journal.mark_finished(path)
+    journal = job_journal.JobJournal(path)
+    journal.append({'page': 1, 'text': ''})
+    journal.close()
+    assert not job_journal.is_finished(path)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+import os
+import stat
+import threading
+
+import fitz
+import pytest
+
+import benchmark
+import ocr_client
+import ocr_service
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = str(tmp_path / 'scan.pdf')
+    doc = fitz.open()
+    for i in range(3):
+        doc.new_page().insert_text((72, 72), f"page {i + 1}")
+    doc.save(path)
+    return path
+
+
+def start_service(tmp_path, **server_args):
+    service = ocr_service.OcrService(str(tmp_path / 'state'), engine_factory=benchmark.build_stub_engine)
+    server = ocr_service.make_server(service, **server_args)
+    service.start()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return service, server
+
+
+def stop_service(service, server):
+    server.shutdown()
+    server.server_close()
+    service.shutdown()
+
+
+def test_submit_stream_and_delete(tmp_path, pdf_path):
+    service, server = start_service(tmp_path, port=0)
+    try:
+        client = ocr_client.OcrClient(f"http://127.0.0.1:{server.server_address[1]}")
+        job = client.submit(pdf_path, pages='1-2')
+        pages = list(client.pages(job['id']))
+        assert [page['page'] for page in pages] == [0, 1]
+        assert all(page['text'] == 'stub' for page in pages)
+        assert client.status(job['id'])['state'] == 'done'
+        assert client.page(job['id'], 2)['page'] == 1
+
+        for start in ('abc', '-1'):
+            with pytest.raises(ocr_client.OcrServiceError) as error:
+                list(client.pages(job['id'], start))
+            assert error.value.status == 400
+
+        assert client.cancel(job['id'])['id'] == job['id']
+        with pytest.raises(ocr_client.OcrServiceError) as error:
+            client.status('999')
+        assert error.value.status == 404
+    finally:
+        stop_service(service, server)
+
+
+@pytest.mark.skipif(not hasattr(os, 'umask') or os.name != 'posix', reason="需要Unix套接字")
+def test_unix_socket_is_private(tmp_path, pdf_path):
+    path = str(tmp_path / 'ocr.sock')
+    service, server = start_service(tmp_path, unix_socket=path)
+    try:
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+        client = ocr_client.OcrClient(unix_socket=path)
+        job = client.submit(pdf_path)
+        assert len(list(client.pages(job['id']))) == 3
+    finally:
+        stop_service(service, server)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+import math
+
+import page_columns
+import result_writers
+
+
+def page_result(page, source, lines):
+    return {'page': page, 'source': source, 'text': "\n".join(line['text'] for line in lines), 'lines': lines}
+
+
+RESULTS = [
+    page_result(0, 'ocr', [
+        {'box': [[10.5, 20.0], [110.25, 20.0], [110.25, 32.0], [10.5, 32.0]], 'text': "合同编号 2023-17", 'score': 0.9876},
+        {'box': [[10.0, 40.0], [60.0, 40.0], [60.0, 52.0], [10.0, 52.0]], 'text': "Total", 'score': 0.5},
+    ]),
+    page_result(1, 'ocr', []),
+    page_result(2, 'native', [
+        {'box': [[72.0, 72.0], [200.0, 72.0], [200.0, 84.0], [72.0, 84.0]], 'text': "文本层", 'score': None},
+    ]),
+]
+
+
+def write_columns(path):
+    with result_writers.ColumnarWriter(path) as writer:
+        for result in RESULTS:
+            writer.write(result)
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'scan.ocrc')
+    write_columns(path)
+    with page_columns.ColumnReader(path) as reader:
+        assert reader.pages == [0, 1, 2]
+        for result in RESULTS:
+            page = reader.read_page(result['page'])
+            assert page.source == result['source']
+            assert page.texts == [line['text'] for line in result['lines']]
+            assert page.to_lines() == result['lines']
+        first = reader.read_page(0)
+        assert first.rects().tolist() == [[10.5, 20.0, 110.25, 32.0], [10.0, 40.0, 60.0, 52.0]]
+        assert first.text(0) == "合同编号 2023-17"
+        assert len(reader.read_page(1)) == 0
+        assert math.isnan(float(reader.read_page(2).scores[0]))
+        assert reader.read_page(3) is None
+
+
+def test_refresh_skips_partial_record(tmp_path):
+    path = str(tmp_path / 'scan.ocrc')
+    write_columns(path)
+    record = page_columns.PageColumns.from_result(page_result(3, 'ocr', RESULTS[0]['lines'])).to_bytes()
+    with page_columns.ColumnReader(path) as reader:
+        # 写了一半的记录不被索引，写完后 refresh 才能读到
+        with open(path, 'ab') as f:
+            f.write(record[:len(record) // 2])
+        assert reader.refresh() == 0
+        assert reader.read_page(3) is None
+        with open(path, 'ab') as f:
+            f.write(record[len(record) // 2:])
+        assert reader.refresh() == 1
+        assert reader.read_page(3).to_lines() == RESULTS[0]['lines']
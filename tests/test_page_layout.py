@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+import page_layout
+
+
+def box(x0, y0, x1, y1):
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]
+
+
+def layout(entries):
+    boxes = [box(*rect) for rect, _ in entries]
+    texts = [text for _, text in entries]
+    boxes, texts, scores, rows, paragraphs = page_layout.assemble(boxes, texts, np.ones(len(texts)))
+    return texts, page_layout.layout_text(texts, rows, paragraphs)
+
+
+def test_two_columns_read_column_by_column():
+    # 检测模型按行输出，两栏的行交错出现
+    entries = [((50, 30, 550, 48), "Title")]
+    for i in range(6):
+        y = 80 + 16 * i
+        entries.append(((50, y, 280, y + 12), f"L{i}"))
+        entries.append(((320, y, 550, y + 12), f"R{i}"))
+    entries.append(((50, 200, 550, 212), "Footer"))
+    texts, text = layout(entries)
+    assert texts == ["Title"] + [f"L{i}" for i in range(6)] + [f"R{i}" for i in range(6)] + ["Footer"]
+    assert text == "\n\n".join(["Title", "\n".join(f"L{i}" for i in range(6)),
+                                "\n".join(f"R{i}" for i in range(6)), "Footer"])
+
+
+def test_split_line_is_merged():
+    texts, text = layout([((120, 10, 200, 22), "world"), ((10, 10, 110, 22), "Hello"),
+                          ((10, 30, 60, 42), "合同"), ((64, 30, 110, 42), "编号")])
+    assert texts == ["Hello world", "合同编号"]
+    assert text == "Hello world\n合同编号"
+
+
+def test_empty_page():
+    boxes, texts, scores, rows, paragraphs = page_layout.assemble([], [], [])
+    assert texts == [] and len(rows) == 0
+    assert page_layout.layout_text(texts, rows, paragraphs) == ""
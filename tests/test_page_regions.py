@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+import page_regions
+
+
+@pytest.mark.parametrize('spec, expected', [
+    (None, list(range(12))),
+    ("", list(range(12))),
+    ("5", [4]),
+    ("1-3,10-40", [0, 1, 2, 9, 10, 11]),
+    ("3,1-2，2", [0, 1, 2]),
+    ("10-", [9, 10, 11]),
+    ("-2", [0, 1]),
+    ("50-", []),
+])
+def test_parse_page_ranges(spec, expected):
+    assert page_regions.parse_page_ranges(spec, 12) == expected
+
+
+@pytest.mark.parametrize('spec', ["0", "0-2", "5-3", "a", "1-b"])
+def test_parse_page_ranges_rejects_invalid(spec):
+    with pytest.raises(ValueError):
+        page_regions.parse_page_ranges(spec, 12)
+
+
+def test_open_ended_range_passes_validation():
+    # 命令行在打开文档之前以页数0校验页码范围
+    assert page_regions.parse_page_ranges("3-", 0) == []
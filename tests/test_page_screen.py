@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+import fitz
+import pytest
+
+import ocr_core
+import page_screen
+
+
+def signature(page, zoom=2.0):
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    return page_screen.page_signature(pix, (page.rect.width, page.rect.height), full_ink=True)
+
+
+def is_blank(page, zoom=2.0):
+    return page_screen.is_blank(signature(page, zoom), ocr_core.OcrOptions.blank_max_ink)
+
+
+@pytest.mark.parametrize('width, height, zoom', [(3370, 2384, 1.0), (2400, 3000, 2.0), (595, 842, 2.0)])
+def test_single_line_is_not_blank(width, height, zoom):
+    page = fitz.open().new_page(width=width, height=height)
+    page.insert_text((200, height / 2), "A single line of 10pt text", fontsize=10)
+    assert not is_blank(page, zoom)
+
+
+def test_header_in_border_is_not_blank():
+    page = fitz.open().new_page()
+    page.insert_text((72, 30), "Header only", fontsize=10)
+    assert not is_blank(page)
+
+
+def test_empty_page_with_specks_is_blank():
+    page = fitz.open().new_page()
+    for x, y in [(100, 100), (300, 500), (400, 700)]:
+        page.draw_rect(fitz.Rect(x, y, x + 0.6, y + 0.6), color=(0, 0, 0), fill=(0, 0, 0))
+    assert is_blank(page)
+    assert is_blank(fitz.open().new_page())
+
+
+def invoice(doc, number):
+    page = doc.new_page()
+    page.insert_text((72, 60), f"Invoice 2024-{number:03d}", fontsize=14)
+    for i in range(30):
+        page.insert_text((72, 90 + i * 22), f"Item {i:02d}  quantity {i + number}  price {i * 3 + number}.00",
+                         fontsize=10)
+    return page
+
+
+def test_dedup_distinguishes_single_digits():
+    doc = fitz.open()
+    index = page_screen.DuplicateIndex()
+    index.add(signature(invoice(doc, 1)), {'text': '001'}, ('a.pdf', 0))
+    assert index.find(signature(invoice(doc, 2))) is None
+    assert index.find(signature(invoice(doc, 1))) == ({'text': '001'}, ('a.pdf', 0))
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+import fitz
+import pytest
+
+import result_writers
+
+
+@pytest.mark.parametrize('rotation', [0, 90, 180, 270])
+def test_searchable_pdf_text_on_rotated_page(tmp_path, rotation):
+    pdf_path = str(tmp_path / 'scan.pdf')
+    with fitz.open() as doc:
+        page = doc.new_page(width=400, height=600)
+        page.set_rotation(rotation)
+        doc.save(pdf_path)
+
+    # 识别结果的坐标为页面显示方向下的页面坐标
+    box = fitz.Rect(60, 40, 260, 60)
+    result = {'page': 0, 'text': 'HIDDEN LAYER', 'source': 'ocr',
+              'lines': [{'box': [list(box.tl), list(box.tr), list(box.br), list(box.bl)],
+                         'text': 'HIDDEN LAYER', 'score': 0.99}]}
+    out_path = str(tmp_path / 'scan.ocr.pdf')
+    writer = result_writers.SearchablePdfWriter(out_path, pdf_path=pdf_path)
+    writer.write(result)
+    writer.close()
+
+    with fitz.open(out_path) as doc:
+        page = doc[0]
+        unrotated = page.rect * page.derotation_matrix
+        found = page.search_for('HIDDEN LAYER')
+        assert len(found) == 1
+        assert found[0] in unrotated
+        # search_for 返回未旋转页面上的坐标，换算回显示方向后应与文本框重合
+        shown = found[0] * page.rotation_matrix
+        assert max(abs(a - b) for a, b in zip(shown, box)) < 1.0
+        words = [w for w in page.get_text('words')]
+        assert [w[4] for w in words] == ['HIDDEN', 'LAYER']
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+import search_index
+
+
+def page_result(page, *texts):
+    lines = [{'box': [[0, 20 * i], [100, 20 * i], [100, 20 * i + 12], [0, 20 * i + 12]], 'text': text}
+             for i, text in enumerate(texts)]
+    return {'page': page, 'source': 'ocr', 'text': "\n".join(texts), 'lines': lines}
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = search_index.SearchIndex(str(tmp_path / 'index.db'))
+    for name, pages in [('a.pdf', [page_result(0, "采购合同", "合同编号 2023-17"),
+                                   page_result(1, "付款方式 银行转账")]),
+                        ('b.pdf', [page_result(0, "增值税发票", "发票号码 0042")])]:
+        pdf_path = str(tmp_path / name)
+        open(pdf_path, 'wb').close()
+        doc_id = index.begin_document(pdf_path)
+        for result in pages:
+            index.add_page(doc_id, result)
+    yield index
+    index.close()
+
+
+def found(results):
+    return [(os.path.basename(r['path']), r['page']) for r in results]
+
+
+def test_query_long_terms(index):
+    results = index.search("合同编号 2023")
+    assert found(results) == [('a.pdf', 1)]
+    assert results[0]['snippet'] == "采购合同 [合同编号] [2023]-17"
+    assert results[0]['boxes'] == [[[0, 20], [100, 20], [100, 32], [0, 32]]]
+    assert index.search("合同编号 0042") == []
+
+
+def test_query_short_terms_fallback(index):
+    # 少于3个字的检索词FTS5无法索引，改为在页面文本中查找，按文档和页码排序
+    assert found(index.search("合同")) == [('a.pdf', 1)]
+    assert found(index.search("发票")) == [('b.pdf', 1)]
+    assert found(index.search("方式")) == [('a.pdf', 2)]
+    assert found(index.search("增值税 号码")) == [('b.pdf', 1)]
+    assert found(index.search("付款方式 合同")) == []
+
+
+def test_path_prefix(index, tmp_path):
+    assert found(index.search("发票", path_prefix=str(tmp_path / 'b.pdf'))) == [('b.pdf', 1)]
+    assert index.search("合同", path_prefix=str(tmp_path / 'b.pdf')) == []
+
+
+def test_remove_document(index, tmp_path):
+    assert index.remove_document(str(tmp_path / 'a.pdf'))
+    assert not index.remove_document(str(tmp_path / 'a.pdf'))
+    assert index.search("合同编号") == []
+    assert index.search("合同") == []
+    assert found(index.search("发票")) == [('b.pdf', 1)]
+    assert index.stats()['documents'] == 1
+    assert index.stats()['pages'] == 1
+
+
+def test_changed_document_is_reindexed(index, tmp_path):
+    pdf_path = str(tmp_path / 'a.pdf')
+    with open(pdf_path, 'wb') as f:
+        f.write(b'changed')
+    doc_id = index.begin_document(pdf_path)
+    assert index.search("合同") == []
+    index.add_page(doc_id, page_result(0, "补充协议"))
+    assert found(index.search("补充协议")) == [('a.pdf', 1)]
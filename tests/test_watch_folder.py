@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+
+import ocr_core
+import watch_folder
+
+
+def test_empty_file_is_reported_after_grace_period(tmp_path):
+    (tmp_path / 'empty.pdf').write_bytes(b'')
+    watcher = watch_folder.InboxWatcher([str(tmp_path)], settle_seconds=1)
+    assert watcher.poll(now=0) == []
+    assert watcher.poll(now=10) == []
+    assert watcher.settling == 1
+    ready = watcher.poll(now=10 + watch_folder.INCOMPLETE_GRACE_SECONDS)
+    assert [size for _path, size, _mtime in ready] == [0]
+    assert watcher.settling == 0
+
+
+def test_service_does_not_modify_caller_options(tmp_path):
+    options = ocr_core.OcrOptions()
+    service = watch_folder.WatchService([str(tmp_path / 'in')], str(tmp_path / 'out'), options)
+    assert options.journal_dir is None
+    assert service.options.journal_dir.startswith(str(tmp_path / 'out'))
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+"""
+超大页面的分块渲染与识别
+工程图纸、A0地图等页面按缩放比例渲染后可达数亿像素，而检测模型内部本来就会把图像缩小到较小尺寸。
+分块模式把页面切成相互重叠的小块，每块单独渲染和识别，内存占用只与块的大小有关；
+各块的文本行换算回页面坐标后合并：重叠区内的重复行去掉，被接缝切断的文本行拼接成一行。
+"""
+
+import fitz
+import numpy as np
+
+import page_columns
+import page_layout
+
+# 判定为同一行的最小纵向重叠比例（相对较矮的一行）
+SAME_ROW_OVERLAP = 0.5
+# 一行有这么大比例的面积落在另一行内时视为重复
+DUPLICATE_COVERAGE = 0.7
+
+
+def tile_clips(page_rect, zoom, tile_px, overlap_px):
+    """
+    把页面矩形（页面坐标）切分为相互重叠的裁剪区域，按从上到下、从左到右的顺序返回
+    每块渲染后不超过 tile_px × tile_px 像素，相邻块重叠 overlap_px 像素
+    """
+    tile = tile_px / zoom
+    step = max(tile - overlap_px / zoom, tile / 2)
+
+    def starts(lo, hi):
+        if hi - lo <= tile:
+            return [lo]
+        positions = []
+        pos = lo
+        while pos + tile < hi:
+            positions.append(pos)
+            pos += step
+        positions.append(hi - tile)
+        return positions
+
+    rect = fitz.Rect(page_rect)
+    return [fitz.Rect(x, y, min(x + tile, rect.x1), min(y + tile, rect.y1))
+            for y in starts(rect.y0, rect.y1) for x in starts(rect.x0, rect.x1)]
+
+
+def needs_tiling(page, zoom, options):
+    """按缩放比例渲染后的像素数超过 tile_max_mpx 时使用分块模式"""
+    if not options.tile_max_mpx:
+        return False
+    return abs(page.rect) * zoom * zoom > options.tile_max_mpx * 1e6
+
+
+def _bbox(line):
+    xs = [p[0] for p in line['box']]
+    ys = [p[1] for p in line['box']]
+    return fitz.Rect(min(xs), min(ys), max(xs), max(ys))
+
+
+def _join_text(left, right, overlap_chars):
+    """
+    拼接被接缝切断的两段文本：优先按“左段结尾 = 右段开头”的最长重复文字去重，
+    找不到时按几何上重叠的宽度估计重复的字符数
+    """
+    best = None
+    for k in range(min(len(left), len(right)), 0, -1):
+        if left.endswith(right[:k]) and (best is None or abs(k - overlap_chars) < abs(best - overlap_chars)):
+            best = k
+    if best is None:
+        best = min(max(overlap_chars, 0), len(right))
+    return left + right[best:]
+
+
+def _same_row(a, b):
+    overlap = min(a.y1, b.y1) - max(a.y0, b.y0)
+    return overlap > 0 and overlap >= SAME_ROW_OVERLAP * min(a.height, b.height)
+
+
+def _reading_order(entries):
+    """按版面还原的阅读顺序排列（见 page_layout.reading_order）"""
+    if not entries:
+        return entries
+    rects = np.array([tuple(e['rect']) for e in entries], dtype=np.float64)
+    order, _lines, _blocks = page_layout.reading_order(rects)
+    return [entries[i] for i in order.tolist()]
+
+
+def _line_from_rect(rect, text, score):
+    return {'box': [[round(rect.x0, 2), round(rect.y0, 2)], [round(rect.x1, 2), round(rect.y0, 2)],
+                    [round(rect.x1, 2), round(rect.y1, 2)], [round(rect.x0, 2), round(rect.y1, 2)]],
+            'text': text, 'score': score}
+
+
+def _merge_seam_pair(left, right):
+    """拼接同一行中被接缝切断的左右两段"""
+    overlap = left['rect'].x1 - right['rect'].x0
+    text = right['line']['text']
+    char_width = right['rect'].width / max(len(text), 1)
+    joined = _join_text(left['line']['text'], text, round(overlap / char_width))
+    rect = left['rect'] | right['rect']
+    scores = [s for s in (left['line']['score'], right['line']['score']) if s is not None]
+    return {'line': _line_from_rect(rect, joined, min(scores) if scores else None), 'rect': rect,
+            'tiles': left['tiles'] | right['tiles']}
+
+
+def merge_tile_lines(tile_lines, clips):
+    """
+    合并各块的文本行（已是页面坐标），tile_lines 为每块一个列表，clips 为各块的裁剪区域
+    只有落在其他块裁剪区域内的行（即位于重叠带中的行）才需要比较：
+    1. 一行大部分落在其他块识别出的更大的一行内时，视为重复或截断的副本，去掉
+    2. 不同块中处在同一行、水平方向相互重叠的两段，视为被竖直接缝切断的一行，拼接起来
+    """
+    inner = []
+    seam = []
+    for tile_index, tile in enumerate(tile_lines):
+        for line in tile:
+            rect = _bbox(line)
+            if rect.is_empty:
+                continue
+            entry = {'line': line, 'rect': rect, 'tiles': frozenset([tile_index])}
+            shared = any(j != tile_index and rect.intersects(clip) for j, clip in enumerate(clips))
+            (seam if shared else inner).append(entry)
+
+    kept = []
+    for entry in sorted(seam, key=lambda e: -abs(e['rect'])):
+        rect = entry['rect']
+        if any(not (other['tiles'] & entry['tiles'])
+               and abs(rect & other['rect']) >= DUPLICATE_COVERAGE * abs(rect) for other in kept):
+            continue
+        kept.append(entry)
+
+    merged = True
+    while merged:
+        merged = False
+        kept.sort(key=lambda e: e['rect'].x0)
+        for i, left in enumerate(kept):
+            for right in kept[i + 1:]:
+                if (left['tiles'] & right['tiles'] or not _same_row(left['rect'], right['rect'])
+                        or left['rect'].x1 <= right['rect'].x0):
+                    continue
+                kept = [e for e in kept if e is not left and e is not right] + [_merge_seam_pair(left, right)]
+                merged = True
+                break
+            if merged:
+                break
+
+    return [e['line'] for e in _reading_order(inner + kept)]
+
+
+class TileAssembler:
+    """在识别阶段收集同一页各块的结果，收齐后合并为整页结果；layout 为真时对合并后的整页做版面还原"""
+
+    def __init__(self, layout=False):
+        self.layout = layout
+        self._parts = {}
+
+    def add(self, item, result):
+        """加入一块的结果；该页的最后一块到达时返回合并后的页面结果，否则返回None"""
+        index, count = item['tile']
+        parts, clips = self._parts.setdefault(item['page'], ([None] * count, [None] * count))
+        parts[index] = result.get('lines', [])
+        clips[index] = fitz.Rect(item['clip'])
+        if any(part is None for part in parts):
+            return None
+        del self._parts[item['page']]
+        lines = merge_tile_lines(parts, clips)
+        if not self.layout:
+            return {'page': item['page'], 'text': "\n".join(line['text'] for line in lines),
+                    'source': 'ocr', 'lines': lines}
+        columns = page_columns.PageColumns.from_lines(item['page'], 'ocr', lines)
+        boxes, texts, scores, rows, paragraphs = page_layout.assemble(columns.boxes, columns.texts, columns.scores)
+        columns = page_columns.PageColumns.from_arrays(item['page'], 'ocr', np.round(boxes, 2), scores, texts)
+        return {'page': item['page'], 'text': page_layout.layout_text(texts, rows, paragraphs),
+                'source': 'ocr', 'lines': columns.to_lines()}
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+文件夹监视服务（无人值守识别）
+持续扫描收件目录中的新PDF：文件大小和修改时间在 --settle 秒内不再变化、且文件末尾已写入 %%EOF 后才视为写入完成，
+随后登记到磁盘上的任务队列（SQLite），由常驻OCR引擎的工作进程池依次识别；
+识别结果和每个任务的状态文件（<文件名>.status.json）写入发件目录。
+服务被中断或重启后，队列中未完成的任务重新排队，已识别的页面由断点日志恢复，不会重复识别。
+
+收件目录使用轮询而不是文件系统通知：扫描仪写入的网络共享上通知并不可靠，轮询也不需要额外的依赖。
+
+用法示例:
+  python watch_folder.py \\\\scanner\\inbox -o D:\\ocr_outbox -j 4 -f txt,pdf
+  python watch_folder.py inbox/ -o outbox/ --archive-dir processed/ --hybrid
+  python watch_folder.py inbox/ -o outbox/ --once
+"""
+
+import os
+import sys
+import copy
+import time
+import shutil
+import signal
+import logging
+import sqlite3
+import argparse
+import multiprocessing
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+
+import batch_ocr
+import job_journal
+import job_metrics
+import ocr_core
+import result_writers
+
+# 文件末尾检查 %%EOF 的字节数（增量更新过的PDF末尾可能带有少量空白）
+EOF_TAIL_BYTES = 2048
+# 文件一直没有写入 %%EOF 时，稳定这么长时间（秒）后仍然入队，由识别阶段给出明确的失败状态
+INCOMPLETE_GRACE_SECONDS = 120
+
+
+def is_complete_pdf(path, size):
+    """文件末尾是否已写入 %%EOF；文件仍被独占打开（Windows上扫描软件正在写入）时返回False"""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(max(0, size - EOF_TAIL_BYTES))
+            return b'%%EOF' in f.read()
+    except OSError:
+        return False
+
+
+class InboxWatcher:
+    """
+    轮询收件目录，找出已写入完成的PDF
+    文件的 (大小, 修改时间) 连续 settle_seconds 秒不变才算写入完成；同一版本的文件只报告一次
+    """
+
+    def __init__(self, inboxes, settle_seconds=5.0, recursive=False):
+        self.inboxes = inboxes
+        self.settle_seconds = settle_seconds
+        self.recursive = recursive
+        # 路径 -> ((大小, 修改时间), 首次观察到该版本的时间)
+        self._pending = {}
+        # 路径 -> 已报告的 (大小, 修改时间)
+        self._reported = {}
+
+    @property
+    def settling(self):
+        """尚未稳定、等待写入完成的文件数"""
+        return sum(1 for path, (version, _since) in self._pending.items()
+                   if self._reported.get(path) != version)
+
+    def poll(self, now=None):
+        """扫描一次收件目录，返回新近写入完成的文件 [(路径, 大小, 修改时间ns), ...]"""
+        now = time.monotonic() if now is None else now
+        ready = []
+        present = set()
+        for path in batch_ocr.collect_pdfs(self.inboxes, recursive=self.recursive):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            present.add(path)
+            version = (st.st_size, st.st_mtime_ns)
+            previous = self._pending.get(path)
+            if previous is None or previous[0] != version:
+                self._pending[path] = (version, now)
+                continue
+            if self._reported.get(path) == version:
+                continue
+            stable = now - previous[1]
+            if stable < self.settle_seconds:
+                continue
+            # 空文件和一直没有写入 %%EOF 的文件等待宽限期后照常入队，由识别阶段给出失败状态，
+            # 不会一直停留在“等待写入完成”中（--once 因此能够退出）
+            if ((st.st_size == 0 or not is_complete_pdf(path, st.st_size))
+                    and stable < max(INCOMPLETE_GRACE_SECONDS, self.settle_seconds)):
+                continue
+            self._reported[path] = version
+            ready.append((path, st.st_size, st.st_mtime_ns))
+        for path in list(self._pending):
+            if path not in present:
+                del self._pending[path]
+                self._reported.pop(path, None)
+        return ready
+
+
+class JobQueue:
+    """
+    持久化的任务队列（SQLite，WAL模式）
+    任务状态: queued -> running -> done / failed；失败的任务在达到最大尝试次数前重新排队
+    同一文件（路径、大小、修改时间都相同）只登记一次，文件被替换后作为新任务登记
+    """
+
+    def __init__(self, db_path, max_attempts=3):
+        self.max_attempts = max_attempts
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    enqueued REAL NOT NULL,
+                    started REAL,
+                    finished REAL,
+                    pages INTEGER,
+                    native_pages INTEGER,
+                    seconds REAL,
+                    output TEXT,
+                    error TEXT,
+                    UNIQUE (path, size, mtime_ns)
+                )""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id)")
+
+    def recover(self):
+        """把上次运行时未完成（running）的任务重新排队，返回任务数"""
+        with self.conn:
+            return self.conn.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'").rowcount
+
+    def enqueue(self, path, size, mtime_ns):
+        """登记新任务，返回任务ID；同一文件已登记过时返回None"""
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO jobs (path, size, mtime_ns, status, enqueued) VALUES (?, ?, ?, 'queued', ?)",
+                (path, size, mtime_ns, time.time()))
+        return cursor.lastrowid if cursor.rowcount else None
+
+    def claim(self):
+        """取出最早排队的任务并标记为 running，队列为空时返回None"""
+        with self.conn:
+            row = self.conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, started = ?, error = NULL "
+                "WHERE id = ?", (time.time(), row['id']))
+        return self.get(row['id'])
+
+    def complete(self, job_id, summary):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET status = 'done', finished = ?, pages = ?, native_pages = ?, seconds = ?, "
+                "output = ? WHERE id = ?",
+                (time.time(), summary['pages'], summary['native_pages'], summary['seconds'],
+                 summary['output'], job_id))
+
+    def fail(self, job_id, error):
+        """记录失败；未达到最大尝试次数时重新排队。返回任务的新状态"""
+        job = self.get(job_id)
+        status = 'queued' if job['attempts'] < self.max_attempts else 'failed'
+        with self.conn:
+            self.conn.execute("UPDATE jobs SET status = ?, finished = ?, error = ? WHERE id = ?",
+                              (status, time.time(), error, job_id))
+        return status
+
+    def get(self, job_id):
+        row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def counts(self):
+        """各状态的任务数"""
+        return {row['status']: row['n'] for row in
+                self.conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")}
+
+    def close(self):
+        self.conn.close()
+
+
+def _timestamp(t):
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(t)) if t else None
+
+
+class WatchService:
+    """
+    收件目录 -> 持久化队列 -> 常驻引擎的工作进程池 -> 发件目录
+    工作进程在启动时各自加载一次OCR引擎（与 batch_ocr 相同），之后一直常驻，每个任务不再重复加载模型
+    """
+
+    def __init__(self, inboxes, outbox, options, formats=('txt',), workers=1, state_dir=None,
+                 settle_seconds=5.0, poll_seconds=2.0, recursive=False, archive_dir=None,
+                 max_attempts=3, base_path=None, engine_factory=None):
+        self.inboxes = [os.path.abspath(p) for p in inboxes]
+        self.outbox = os.path.abspath(outbox)
+        self.formats = list(formats)
+        self.workers = max(1, workers)
+        self.state_dir = os.path.abspath(state_dir or os.path.join(self.outbox, '.watch'))
+        self.poll_seconds = poll_seconds
+        self.archive_dir = archive_dir
+        self.max_attempts = max_attempts
+        self.base_path = base_path
+        self.engine_factory = engine_factory
+        # 使用副本，不修改调用方的参数对象
+        self.options = copy.copy(options)
+        if options.journal_dir is None:
+            # 断点日志放在状态目录中，服务重启后从中断的页面继续
+            self.options.journal_dir = os.path.join(self.state_dir, 'jobs')
+        self.watcher = InboxWatcher(self.inboxes, settle_seconds, recursive)
+        self.stopping = False
+
+    def _relative_stem(self, path):
+        """相对于所在收件目录的路径（不含扩展名），发件目录中保持相同的子目录结构"""
+        for inbox in self.inboxes:
+            try:
+                relative = os.path.relpath(path, inbox)
+            except ValueError:
+                continue
+            if not relative.startswith(os.pardir):
+                return os.path.splitext(relative)[0]
+        return os.path.splitext(os.path.basename(path))[0]
+
+    def output_base(self, path):
+        return os.path.join(self.outbox, self._relative_stem(path))
+
+    def write_status(self, job, state, summary=None):
+        """写出任务状态文件 <发件目录>/<文件名>.status.json（原子替换）"""
+        out_base = self.output_base(job['path'])
+        status = {
+            'job': job['id'],
+            'pdf': job['path'],
+            'state': state,
+            'attempts': job['attempts'],
+            'enqueued': _timestamp(job['enqueued']),
+            'started': _timestamp(job['started']),
+            'finished': _timestamp(job['finished']),
+            'error': job['error'],
+        }
+        if summary is not None and not summary['error']:
+            status.update(pages=summary['pages'], native_pages=summary['native_pages'],
+                          seconds=round(summary['seconds'], 3),
+                          outputs=result_writers.output_paths(out_base, self.formats))
+        try:
+            os.makedirs(os.path.dirname(out_base), exist_ok=True)
+            job_metrics.write_json_report(out_base + '.status.json', status)
+        except OSError as e:
+            logging.error(f"写出任务状态失败: {out_base}: {e}")
+
+    def _finish_job(self, queue, job, summary):
+        """处理工作进程返回的摘要：更新队列、写状态文件，成功时清理断点日志并归档源文件"""
+        if summary['error']:
+            state = queue.fail(job['id'], summary['error'])
+            job = queue.get(job['id'])
+            self.write_status(job, 'failed' if state == 'failed' else 'retrying')
+            log = logging.error if state == 'failed' else logging.warning
+            log(f"任务 {job['id']} 失败（第 {job['attempts']} 次）: {job['path']}: {summary['error']}")
+            return
+        queue.complete(job['id'], summary)
+        job = queue.get(job['id'])
+        self.write_status(job, 'done', summary)
+        logging.info(f"任务 {job['id']} 完成: {job['path']} "
+                     f"({summary['pages']} 页, {summary['seconds']:.1f} 秒)")
+        self._cleanup(job)
+
+    def _cleanup(self, job):
+        try:
+            os.remove(job_journal.journal_path(self.options.journal_dir, job['path'],
+                                               ocr_core.job_signature(self.options)))
+        except OSError:
+            pass
+        if self.archive_dir:
+            target = os.path.join(self.archive_dir, self._relative_stem(job['path']) + '.pdf')
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+                shutil.move(job['path'], target)
+            except OSError as e:
+                logging.error(f"归档源文件失败: {job['path']}: {e}")
+
+    def stop(self, *_args):
+        """请求停止（信号处理函数）；正在识别的任务在下次启动时重新排队并从断点继续"""
+        self.stopping = True
+
+    def run(self, once=False):
+        """
+        运行服务直到 stop() 被调用；once 为真时处理完收件目录中已有的文件后退出
+        返回失败（不再重试）的任务数
+        """
+        for path in self.inboxes + [self.outbox, self.state_dir]:
+            os.makedirs(path, exist_ok=True)
+        queue = JobQueue(os.path.join(self.state_dir, 'queue.db'), self.max_attempts)
+        recovered = queue.recover()
+        if recovered:
+            logging.info(f"恢复上次未完成的任务 {recovered} 个")
+        logging.info(f"监视收件目录: {', '.join(self.inboxes)}；发件目录: {self.outbox}；"
+                     f"{self.workers} 个工作进程")
+
+        failed = 0
+        running = {}
+        pool = batch_ocr.create_worker_pool(self.workers, self.base_path, self.options, self.engine_factory)
+        try:
+            while not self.stopping:
+                for path, size, mtime_ns in self.watcher.poll():
+                    job_id = queue.enqueue(path, size, mtime_ns)
+                    if job_id is not None:
+                        logging.info(f"任务 {job_id} 入队: {path}")
+                        self.write_status(queue.get(job_id), 'queued')
+
+                for job_id, (job, future, job_pool) in list(running.items()):
+                    if future.done():
+                        del running[job_id]
+                        if job_pool is pool and isinstance(future.exception(), BrokenProcessPool):
+                            # 工作进程意外退出后进程池失效，其中的任务都按失败处理（可重试），换用新的进程池
+                            logging.error("工作进程意外退出，重建进程池")
+                            pool.shutdown(wait=False)
+                            pool = batch_ocr.create_worker_pool(self.workers, self.base_path, self.options,
+                                                                self.engine_factory)
+                        self._finish_job(queue, job, batch_ocr.task_summary(future, job['path'],
+                                                                            self.output_base(job['path'])))
+                        failed += queue.get(job_id)['status'] == 'failed'
+
+                while len(running) < self.workers:
+                    job = queue.claim()
+                    if job is None:
+                        break
+                    self.write_status(job, 'running')
+                    task = (job['path'], self.output_base(job['path']), self.formats)
+                    os.makedirs(os.path.dirname(task[1]), exist_ok=True)
+                    try:
+                        future = pool.submit(batch_ocr._ocr_one_pdf, task)
+                    except BrokenProcessPool as e:
+                        # 进程池刚刚失效，下一轮检查时按失败处理并重建进程池
+                        future = concurrent.futures.Future()
+                        future.set_exception(e)
+                    running[job['id']] = (job, future, pool)
+
+                if once and not running and not self.watcher.settling and not queue.counts().get('queued'):
+                    break
+                time.sleep(self.poll_seconds)
+        finally:
+            batch_ocr.shutdown_pool(pool)
+            if running:
+                logging.info(f"服务停止，{len(running)} 个未完成的任务将在下次启动时继续")
+            queue.recover()
+            queue.close()
+        return failed
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="离线PDF-OCR文件夹监视服务")
+    parser.add_argument('inboxes', nargs='+', help="收件目录（扫描仪投放PDF的目录或共享）")
+    parser.add_argument('-o', '--outbox', required=True, help="发件目录：识别结果和任务状态文件")
+    batch_ocr.add_ocr_arguments(parser)
+    parser.add_argument('--state-dir', help="队列数据库和断点日志目录（默认为发件目录下的 .watch）")
+    parser.add_argument('--archive-dir', help="识别成功后把源文件移动到该目录（默认留在收件目录）")
+    parser.add_argument('--settle', type=float, default=5.0,
+                        help="文件大小和修改时间保持不变多少秒后才视为写入完成")
+    parser.add_argument('--poll', type=float, default=2.0, help="扫描收件目录的间隔（秒）")
+    parser.add_argument('--max-attempts', type=int, default=3, help="每个任务的最大尝试次数")
+    parser.add_argument('-r', '--recursive', action='store_true', help="同时监视收件目录的子目录")
+    parser.add_argument('--once', action='store_true', help="处理完收件目录中已有的文件后退出")
+    return parser
+
+
+def main(argv=None):
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - [%(processName)s] %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    args = build_arg_parser().parse_args(argv)
+
+    workers = max(1, args.workers)
+    try:
+        formats = batch_ocr.parse_formats(args)
+        options = batch_ocr.options_from_args(args, workers)
+    except (OSError, ValueError) as e:
+        logging.error(f"参数无效: {e}")
+        return 2
+
+    service = WatchService(args.inboxes, args.outbox, options, formats, workers, args.state_dir,
+                           args.settle, args.poll, args.recursive, args.archive_dir, args.max_attempts)
+    signal.signal(signal.SIGINT, service.stop)
+    signal.signal(signal.SIGTERM, service.stop)
+    failed = service.run(once=args.once)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())